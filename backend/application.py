@@ -17,6 +17,10 @@ from routes.order_routes import order_bp
 from routes.dasher_routes import dasher_bp
 from routes.admin_routes import admin_bp
 from routes.ai_routes import ai_bp
+from utils.email_queue import start_email_workers
+from utils.scrape_jobs import start_scrape_scheduler
+from utils.dispatch import start_dispatch_escalator
+from utils.order_events import start_order_events
 
 load_dotenv()
 
@@ -80,6 +84,21 @@ app.register_blueprint(dasher_bp, url_prefix='/api/dasher')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(ai_bp, url_prefix='/api/ai')
 
+# Background work runs in serving processes only, not in the debug reloader's
+# parent, which just watches files and restarts its child
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    # Deliver queued emails in the background
+    start_email_workers()
+
+    # Notify more dashers about orders nobody has accepted
+    start_dispatch_escalator()
+
+    # Refresh the menu on the SCRAPE_SCHEDULE cron schedule
+    start_scrape_scheduler()
+
+    # Hear order changes from every process, for the order cache and tracking streams
+    start_order_events()
+
 # Health check
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -0,0 +1,66 @@
+"""
+Drive LLMClient with a local fake model to check its limits without calling
+Gemini: concurrent callers against a healthy, a slow and a failing model.
+Reports how long callers waited and how many got an answer, hit the
+deadline, or were turned away by the concurrency bound or circuit breaker.
+
+Run from backend/:  python -m benchmarks.ai_chat_resilience [callers]
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+from utils.llm_client import CircuitBreaker, LLMClient, LLMUnavailableError
+
+
+def fake_model(latency, fail=False):
+    def generate(prompt):
+        time.sleep(latency)
+        if fail:
+            raise RuntimeError('upstream 503')
+        return '{"results": []}'
+    return generate
+
+
+def run(name, generate, callers):
+    client = LLMClient(
+        generate, max_concurrency=4, timeout=0.5, queue_timeout=0.2,
+        breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+    )
+    outcomes = Counter()
+    waits = []
+    lock = threading.Lock()
+
+    def call():
+        start = time.perf_counter()
+        try:
+            client.complete('prompt')
+            outcome = 'answered'
+        except LLMUnavailableError as e:
+            outcome = type(e).__name__
+        with lock:
+            outcomes[outcome] += 1
+            waits.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:>8}: {elapsed:5.2f}s total, max wait {max(waits):4.2f}s, "
+          f"{dict(outcomes)}, circuit {client.breaker.state}")
+
+
+def main():
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    run('healthy', fake_model(0.05), callers)
+    run('slow', fake_model(5.0), callers)
+    run('failing', fake_model(0.01, fail=True), callers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Simulate dasher dispatch to compare broadcasting every order to every active
+dasher with AssignmentPolicy's targeted waves, without a database.
+
+Orders arrive at random dining halls; each notified dasher answers after a
+random delay and accepts if the order is still pending, they are below their
+capacity, and they feel like it (less likely for a hall they are not near).
+Unaccepted orders escalate every DISPATCH_ESCALATE_AFTER simulated seconds.
+Reports notifications sent per order and time from order to accept.
+
+Run from backend/:  python -m benchmarks.dasher_dispatch_sim [dashers] [orders_per_hour] [hours]
+"""
+import heapq
+import random
+import sys
+
+from utils.assignment import AssignmentPolicy
+
+HALLS = ['Berkshire', 'Franklin', 'Hampshire', 'Worcester']
+ESCALATE_AFTER = 120.0
+MEAN_RESPONSE = 45.0  # seconds for a notified dasher to look at the email
+DELIVERY_TIME = (900.0, 1800.0)
+CAPACITY = 2  # open orders a dasher will carry at once
+AWAY_FACTOR = 0.6  # how much less likely a dasher is to take an order from another hall
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def simulate(policy, dashers, orders_per_hour, hours, seed):
+    rng = random.Random(seed)
+    state = {
+        f'dasher{i}@umass.edu': {
+            'email': f'dasher{i}@umass.edu',
+            'last_pickup': rng.choice(HALLS),
+            'willingness': rng.uniform(0.2, 0.9),
+            'open_orders': 0,
+            'notified': 0,
+            'accepted': 0,
+        }
+        for i in range(dashers)
+    }
+
+    events = []  # (time, sequence, kind, payload)
+    sequence = 0
+
+    def schedule(when, kind, payload):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (when, sequence, kind, payload))
+
+    now = 0.0
+    order_count = 0
+    while True:
+        now += rng.expovariate(orders_per_hour / 3600.0)
+        if now > hours * 3600:
+            break
+        order_count += 1
+        schedule(now, 'order', {'id': order_count, 'hall': rng.choice(HALLS), 'created': now})
+
+    orders = {}
+    notifications = 0
+    waits = []
+
+    def notify(order, wave, when):
+        nonlocal notifications
+        candidates = [
+            {key: d[key] for key in ('email', 'last_pickup', 'open_orders', 'notified', 'accepted')}
+            for email, d in state.items() if email not in order['notified']
+        ]
+        chosen = policy.choose(candidates, order['hall'], wave)
+        for candidate in chosen:
+            order['notified'].add(candidate['email'])
+            state[candidate['email']]['notified'] += 1
+            schedule(when + rng.expovariate(1 / MEAN_RESPONSE), 'response', (order['id'], candidate['email']))
+        notifications += len(chosen)
+        order['waves'] = wave + 1
+        if len(candidates) > len(chosen):
+            schedule(when + ESCALATE_AFTER, 'escalate', (order['id'], wave + 1))
+
+    while events:
+        when, _, kind, payload = heapq.heappop(events)
+        if kind == 'order':
+            order = dict(payload, notified=set(), accepted_at=None, waves=0)
+            orders[order['id']] = order
+            notify(order, 0, when)
+        elif kind == 'escalate':
+            order_id, wave = payload
+            order = orders[order_id]
+            if order['accepted_at'] is None:
+                notify(order, wave, when)
+        elif kind == 'response':
+            order_id, email = payload
+            order, dasher = orders[order_id], state[email]
+            if order['accepted_at'] is not None or dasher['open_orders'] >= CAPACITY:
+                continue
+            willingness = dasher['willingness'] * (1.0 if dasher['last_pickup'] == order['hall'] else AWAY_FACTOR)
+            if rng.random() < willingness:
+                order['accepted_at'] = when
+                waits.append(when - order['created'])
+                dasher['open_orders'] += 1
+                dasher['accepted'] += 1
+                dasher['last_pickup'] = order['hall']
+                schedule(when + rng.uniform(*DELIVERY_TIME), 'delivered', email)
+        elif kind == 'delivered':
+            state[payload]['open_orders'] -= 1
+
+    accepted = sum(1 for order in orders.values() if order['accepted_at'] is not None)
+    return {
+        'orders': len(orders),
+        'notifications': notifications,
+        'per_order': notifications / max(len(orders), 1),
+        'accepted': accepted,
+        'p50': percentile(waits, 50),
+        'p90': percentile(waits, 90),
+        'p99': percentile(waits, 99),
+        'max_waves': max((order['waves'] for order in orders.values()), default=0),
+    }
+
+
+def main():
+    dashers = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    orders_per_hour = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    hours = float(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    policies = [
+        ('broadcast', AssignmentPolicy(initial_k=dashers)),
+        ('top-3 x2', AssignmentPolicy(initial_k=3, escalation_factor=2)),
+        ('top-5 x2', AssignmentPolicy(initial_k=5, escalation_factor=2)),
+    ]
+    print(f"{dashers} dashers, {orders_per_hour:g} orders/hour for {hours:g}h, "
+          f"escalating every {ESCALATE_AFTER:g}s")
+    for name, policy in policies:
+        r = simulate(policy, dashers, orders_per_hour, hours, seed=7)
+        print(f"{name:>10}: {r['notifications']:6d} notifications ({r['per_order']:5.1f}/order) | "
+              f"accepted {r['accepted']}/{r['orders']} | time to accept "
+              f"p50 {r['p50']:6.0f}s p90 {r['p90']:6.0f}s p99 {r['p99']:6.0f}s | "
+              f"up to {r['max_waves']} waves")
+
+
+if __name__ == '__main__':
+    main()
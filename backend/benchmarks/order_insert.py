@@ -0,0 +1,86 @@
+"""
+Measure create_order's insert latency as the cart grows: one INSERT per line
+item (the old path) versus the single-statement insert_order. Every order is
+rolled back, so this can run against a development database.
+
+Run from backend/:  python -m benchmarks.order_insert [repeats]
+"""
+import statistics
+import sys
+import time
+
+from utils.database import create_db_connection
+from utils.helpers import generate_order_number
+from utils.orders import insert_order
+
+CART_SIZES = [1, 5, 10, 20, 50, 100]
+
+
+def make_order(cart_size):
+    return {
+        'customer_name': 'Bench Customer',
+        'customer_email': 'bench@umass.edu',
+        'customer_phone': '4135550100',
+        'delivery_address': 'Southwest Tower 1',
+        'pickup_location': 'Worcester Dining Commons',
+        'items': [
+            {'name': f'Item {i}', 'category': 'Grill', 'quantity': 1, 'price': 5.0}
+            for i in range(cart_size)
+        ]
+    }
+
+
+def insert_per_row(cur, order_number, data, total_amount):
+    cur.execute('''
+        INSERT INTO orders (
+            order_number, customer_name, customer_email, customer_phone,
+            delivery_address, special_instructions, pickup_location,
+            total_amount
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id, order_number, created_at
+    ''', (
+        order_number, data['customer_name'], data['customer_email'],
+        data['customer_phone'], data['delivery_address'],
+        data.get('special_instructions'), data['pickup_location'],
+        total_amount
+    ))
+    order_id = cur.fetchone()['id']
+    for item in data['items']:
+        cur.execute('''
+            INSERT INTO order_items (order_id, item_name, category, quantity, price, special_instructions)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        ''', (
+            order_id, item['name'], item.get('category'),
+            item.get('quantity', 1), item.get('price', 5.0),
+            item.get('special_instructions')
+        ))
+
+
+def time_insert(conn, insert, data, repeats):
+    samples = []
+    with conn.cursor() as cur:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            insert(cur, generate_order_number(), data, 0)
+            samples.append((time.perf_counter() - start) * 1000)
+            conn.rollback()
+    return statistics.median(samples)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    conn = create_db_connection()
+    try:
+        print(f"{'items':>6} {'per-row ms':>12} {'batched ms':>12} {'speedup':>8}")
+        for size in CART_SIZES:
+            data = make_order(size)
+            per_row = time_insert(conn, insert_per_row, data, repeats)
+            batched = time_insert(conn, insert_order, data, repeats)
+            print(f"{size:>6} {per_row:>12.2f} {batched:>12.2f} {per_row / batched:>7.1f}x")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Stress-test generate_order_number's generator: millions of order numbers
+from several forked processes, each with several threads, plus a frozen and
+a backwards-stepping clock. Checks that every number is unique and that each
+thread sees strictly increasing numbers, and compares collisions with the
+old timestamp-plus-random-suffix format under the same burst. No database
+is needed; node ids are leased from a shared counter instead.
+
+Run from backend/:  python -m benchmarks.order_numbers [processes] [threads] [per_thread]
+"""
+import multiprocessing
+import random
+import string
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from utils.helpers import BASE32_ALPHABET, OrderNumberGenerator
+
+DIGITS = {char: value for value, char in enumerate(BASE32_ALPHABET)}
+
+
+def legacy_order_number():
+    """The previous format: second timestamp and four random characters"""
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+    return f"ORD-{timestamp}-{random_suffix}"
+
+
+def decode(order_number):
+    value = 0
+    for char in order_number[4:]:
+        value = value * 32 + DIGITS[char]
+    return value
+
+
+def generate(generator, count, results, index):
+    numbers = [generator.next() for _ in range(count)]
+    increasing = all(a < b for a, b in zip(numbers, numbers[1:]))
+    results[index] = (increasing, array('Q', map(decode, numbers)))
+
+
+def run_process(generator, threads, per_thread, queue):
+    results = [None] * threads
+    workers = [threading.Thread(target=generate, args=(generator, per_thread, results, i)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    ids = array('Q')
+    for _, thread_ids in results:
+        ids.extend(thread_ids)
+    queue.put((generator.node_id, all(increasing for increasing, _ in results), ids.tobytes()))
+
+
+def stress(processes, threads, per_thread):
+    context = multiprocessing.get_context('fork')
+    next_node = context.Value('i', 0)
+
+    def lease():
+        with next_node.get_lock():
+            next_node.value += 1
+            return next_node.value - 1
+
+    # Used once in the parent, so every child inherits a generator that already has a node id
+    generator = OrderNumberGenerator(lease_node_id=lease)
+    generator.next()
+
+    queue = context.Queue()
+    children = [
+        context.Process(target=run_process, args=(generator, threads, per_thread, queue))
+        for _ in range(processes)
+    ]
+    start = time.perf_counter()
+    for child in children:
+        child.start()
+    reports = [queue.get() for _ in children]
+    for child in children:
+        child.join()
+    elapsed = time.perf_counter() - start
+
+    seen = set()
+    total = 0
+    for _, _, raw in reports:
+        ids = array('Q')
+        ids.frombytes(raw)
+        total += len(ids)
+        seen.update(ids)
+    node_ids = sorted(node_id for node_id, _, _ in reports)
+    increasing = all(ok for _, ok, _ in reports)
+    print(f"{processes} processes x {threads} threads: {total:,} numbers in {elapsed:.2f}s "
+          f"({total / elapsed:,.0f}/s), {total - len(seen)} duplicates, "
+          f"per-thread order {'increasing' if increasing else 'NOT INCREASING'}, node ids {node_ids}")
+    return total == len(seen) and increasing
+
+
+def clock_check(name, clock, count):
+    generator = OrderNumberGenerator(node_id=1, clock=clock)
+    numbers = [generator.next() for _ in range(count)]
+    ok = len(set(numbers)) == count and all(a < b for a, b in zip(numbers, numbers[1:]))
+    print(f"{name}: {count:,} numbers, {'unique and increasing' if ok else 'FAILED'}")
+    return ok
+
+
+def legacy_collisions(count):
+    numbers = [legacy_order_number() for _ in range(count)]
+    print(f"old format: {count:,} numbers, {count - len(set(numbers)):,} duplicates")
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    per_thread = int(sys.argv[3]) if len(sys.argv) > 3 else 250_000
+
+    ok = stress(processes, threads, per_thread)
+
+    frozen = 1_800_000_000.0
+    ok &= clock_check('frozen clock', lambda: frozen, 100_000)
+    ticks = iter(range(10**9))
+    ok &= clock_check('clock stepping back', lambda: frozen - (next(ticks) % 1000) / 10, 100_000)
+
+    legacy_collisions(per_thread)
+
+    if not ok:
+        raise SystemExit('Order numbers collided or went backwards')
+
+
+if __name__ == '__main__':
+    main()
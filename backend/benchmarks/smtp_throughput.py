@@ -0,0 +1,64 @@
+"""
+Compare outbound email throughput against a local aiosmtpd stand-in:
+a fresh SMTP connection per message (the old send_email behaviour) versus
+one persistent session shared by a bulk send.
+
+Requires: pip install aiosmtpd
+Run from backend/:  python -m benchmarks.smtp_throughput [num_messages]
+"""
+import smtplib
+import socket
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+
+from utils.email import SMTPSession, build_message, deliver_emails
+
+
+def per_message_connections(host, port, messages):
+    for to_email, subject, body in messages:
+        with smtplib.SMTP(host, port) as server:
+            server.send_message(build_message(to_email, subject, body))
+
+
+def persistent_session(host, port, messages):
+    session = SMTPSession(host=host, port=port, use_tls=False, user=None, password=None,
+                          max_messages=len(messages))
+    errors = [e for e in deliver_emails(messages, session=session) if e is not None]
+    session.close()
+    if errors:
+        raise errors[0]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    host, port = '127.0.0.1', free_port()
+    controller = Controller(Sink(), hostname=host, port=port)
+    controller.start()
+
+    messages = [
+        (f'dasher{i}@umass.edu', f'New Delivery - ORD-{i}', '<html><body><h2>New Delivery Available</h2></body></html>')
+        for i in range(count)
+    ]
+
+    try:
+        for label, run in [('connection per message', per_message_connections),
+                           ('persistent session', persistent_session)]:
+            start = time.perf_counter()
+            run(host, port, messages)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>24}: {count} messages in {elapsed:.3f}s ({count / elapsed:,.0f} msg/s)")
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
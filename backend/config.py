@@ -9,12 +9,67 @@ DB_NAME = os.getenv('DB_NAME', 'umass_dining')
 DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
 
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))  # seconds to wait for a free connection
+DB_POOL_CHECK_IDLE = float(os.getenv('DB_POOL_CHECK_IDLE', '30'))  # ping connections idle longer than this
+
+# Menu cache configuration
+MENU_CACHE_MAX_ENTRIES = int(os.getenv('MENU_CACHE_MAX_ENTRIES', '256'))
+MENU_CACHE_REFRESH_INTERVAL = float(os.getenv('MENU_CACHE_REFRESH_INTERVAL', '60'))  # fallback generation re-check
+MENU_HTTP_MAX_AGE = int(os.getenv('MENU_HTTP_MAX_AGE', '300'))  # Cache-Control max-age for menu endpoints
+
+# Order detail cache configuration (per process; entries are also dropped on status changes)
+ORDER_CACHE_TTL = float(os.getenv('ORDER_CACHE_TTL', '5'))
+ORDER_CACHE_MAX_ENTRIES = int(os.getenv('ORDER_CACHE_MAX_ENTRIES', '4096'))
+
+# AI chat response cache (per process; keyed by normalized query and menu version)
+AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', '900'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '1024'))
+
+# Gemini call limits for the AI chat
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '4'))  # upstream calls in flight per process
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '10'))  # seconds before falling back to local results
+AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', '1'))  # seconds to wait for a free upstream slot
+AI_BREAKER_THRESHOLD = int(os.getenv('AI_BREAKER_THRESHOLD', '5'))  # consecutive failures that open the circuit
+AI_BREAKER_RESET = float(os.getenv('AI_BREAKER_RESET', '30'))  # seconds before a trial call is allowed
+
+# Seconds between keep-alive comments on order status event streams
+ORDER_EVENTS_HEARTBEAT = float(os.getenv('ORDER_EVENTS_HEARTBEAT', '15'))
+
+# Seconds an order status event stream stays open before the client must reconnect
+ORDER_EVENTS_MAX_AGE = float(os.getenv('ORDER_EVENTS_MAX_AGE', '900'))
+
 # Email configuration
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
 EMAIL_USER = os.getenv('EMAIL_USER')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 EMAIL_FROM = os.getenv('EMAIL_FROM', 'noreply@umassdining.com')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
+EMAIL_SMTP_TIMEOUT = float(os.getenv('EMAIL_SMTP_TIMEOUT', '30'))
+EMAIL_SMTP_IDLE_TIMEOUT = float(os.getenv('EMAIL_SMTP_IDLE_TIMEOUT', '60'))  # probe sessions idle longer than this
+EMAIL_SMTP_MAX_MESSAGES = int(os.getenv('EMAIL_SMTP_MAX_MESSAGES', '100'))  # reconnect after this many sends
+
+# Outbound email queue configuration
+EMAIL_QUEUE_WORKERS = int(os.getenv('EMAIL_QUEUE_WORKERS', '2'))  # 0 disables in-process workers
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv('EMAIL_QUEUE_BATCH_SIZE', '20'))
+EMAIL_QUEUE_POLL_INTERVAL = float(os.getenv('EMAIL_QUEUE_POLL_INTERVAL', '5'))
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('EMAIL_QUEUE_MAX_ATTEMPTS', '5'))
+EMAIL_QUEUE_RETRY_DELAY = float(os.getenv('EMAIL_QUEUE_RETRY_DELAY', '30'))  # doubled after each failed attempt
+
+# Dasher dispatch: who hears about a new order, and how the search widens
+DISPATCH_INITIAL_K = int(os.getenv('DISPATCH_INITIAL_K', '3'))  # dashers notified when an order is placed
+DISPATCH_ESCALATION_FACTOR = int(os.getenv('DISPATCH_ESCALATION_FACTOR', '2'))  # each wave notifies this many times more
+DISPATCH_ESCALATE_AFTER = float(os.getenv('DISPATCH_ESCALATE_AFTER', '120'))  # seconds without an accept before the next wave
+DISPATCH_POLL_INTERVAL = float(os.getenv('DISPATCH_POLL_INTERVAL', '15'))  # 0 disables in-process escalation
+DISPATCH_STATS_DAYS = int(os.getenv('DISPATCH_STATS_DAYS', '7'))  # window for dasher acceptance rates
+
+# Menu scrape jobs
+SCRAPER_DIR = os.getenv('SCRAPER_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scrapy_folder'))
+SCRAPE_SCHEDULE = os.getenv('SCRAPE_SCHEDULE', '')  # cron expression, e.g. '*/15 6-21 * * *'; empty disables
+SCRAPE_TIMEOUT = float(os.getenv('SCRAPE_TIMEOUT', '600'))  # seconds before a scrape is abandoned
 
 # Frontend URL for email links
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
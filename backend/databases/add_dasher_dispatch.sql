@@ -0,0 +1,20 @@
+-- Migration: Targeted dasher notification
+-- New orders are announced to the few best-placed dashers, then to wider
+-- waves while nobody accepts. Each notification is recorded so later waves
+-- skip dashers already asked and acceptance rates can be ranked on.
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS dispatch_wave INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS next_escalation_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS dasher_notifications (
+    id BIGSERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    dasher_email VARCHAR(255) NOT NULL,
+    wave INTEGER NOT NULL DEFAULT 0,
+    notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    accepted_at TIMESTAMP,
+    UNIQUE (order_id, dasher_email)
+);
+
+CREATE INDEX IF NOT EXISTS idx_dasher_notifications_dasher ON dasher_notifications(dasher_email, notified_at);
+CREATE INDEX IF NOT EXISTS idx_orders_escalation ON orders(next_escalation_at) WHERE status = 'pending';
@@ -0,0 +1,51 @@
+-- Migration: Track menu reloads with a generation counter
+-- Any write to menu_items that changes rows bumps the counter and notifies
+-- the menu_changed channel on commit, which invalidates the backend's
+-- in-process menu cache.
+
+CREATE TABLE IF NOT EXISTS menu_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO menu_generation (id, generation) VALUES (true, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_menu_generation() RETURNS trigger AS $$
+DECLARE
+    new_generation BIGINT;
+BEGIN
+    -- Statements that changed no rows leave the menu, and its caches, alone
+    IF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    UPDATE menu_generation
+    SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id
+    RETURNING generation INTO new_generation;
+    PERFORM pg_notify('menu_changed', new_generation::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS menu_items_changed ON menu_items;
+DROP TRIGGER IF EXISTS menu_items_inserted ON menu_items;
+DROP TRIGGER IF EXISTS menu_items_updated ON menu_items;
+DROP TRIGGER IF EXISTS menu_items_deleted ON menu_items;
+DROP TRIGGER IF EXISTS menu_items_truncated ON menu_items;
+-- Transition tables allow one event per trigger, hence four triggers
+CREATE TRIGGER menu_items_inserted
+    AFTER INSERT ON menu_items REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+CREATE TRIGGER menu_items_updated
+    AFTER UPDATE ON menu_items REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+CREATE TRIGGER menu_items_deleted
+    AFTER DELETE ON menu_items REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+CREATE TRIGGER menu_items_truncated
+    AFTER TRUNCATE ON menu_items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
@@ -0,0 +1,4 @@
+-- Migration: Index for diffing a fresh scrape against the live menu
+-- The menu reload matches scraped rows to menu_items by (location, category, item_name).
+
+CREATE INDEX IF NOT EXISTS idx_menu_items_key ON menu_items(location, category, item_name);
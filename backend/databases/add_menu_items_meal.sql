@@ -0,0 +1,9 @@
+-- Migration: Store the meal period of each menu item
+-- The scraper tags items with their meal (Breakfast, Lunch, ...); a dish served
+-- at several meals is one row per meal. The menu reload matches scraped rows by
+-- (location, category, item_name, meal), so the key index gains the column.
+
+ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS meal VARCHAR(50);
+
+DROP INDEX IF EXISTS idx_menu_items_key;
+CREATE INDEX idx_menu_items_key ON menu_items(location, category, item_name, meal);
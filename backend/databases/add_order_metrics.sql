@@ -0,0 +1,87 @@
+-- Migration: Order lifecycle event log and delivery-time metrics
+-- Every status change of an order appends to order_tracking_events and, for
+-- accepts, pickups and deliveries, counts the time since the order was placed
+-- into a per-hall, per-hour histogram. Both happen in a trigger, so they
+-- commit or roll back with the change itself whichever code path makes it.
+--
+-- Histogram bucket b holds times in [exp(b/10) - 1, exp((b+1)/10) - 1)
+-- seconds, about 10% wide, so percentiles can be read from a few hundred
+-- rows instead of the orders table. The backend's utils/delivery_metrics.py
+-- must use the same bucket width.
+
+CREATE INDEX IF NOT EXISTS idx_tracking_events_order ON order_tracking_events(order_id, created_at);
+
+CREATE TABLE IF NOT EXISTS order_metrics (
+    pickup_location VARCHAR(255) NOT NULL,
+    hour TIMESTAMP NOT NULL,  -- hour the orders were placed
+    metric VARCHAR(20) NOT NULL CHECK (metric IN ('accept', 'pickup', 'deliver')),
+    bucket INTEGER NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (pickup_location, hour, metric, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_metrics_hour ON order_metrics(hour);
+
+-- Backfill what the orders table still knows. Pickup times of orders already
+-- delivered were overwritten, so only their accept and delivery are counted.
+INSERT INTO order_tracking_events (order_id, status, notes, created_at)
+SELECT o.id, e.status, 'backfilled', e.at
+FROM orders o
+CROSS JOIN LATERAL (VALUES
+    ('pending', o.created_at),
+    ('confirmed', o.accepted_at),
+    (CASE WHEN o.status IN ('picked_up', 'delivered') THEN o.status END, o.updated_at)
+) AS e(status, at)
+WHERE e.status IS NOT NULL AND e.at IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM order_tracking_events t WHERE t.order_id = o.id);
+
+INSERT INTO order_metrics (pickup_location, hour, metric, bucket, count, total_seconds)
+SELECT pickup_location, hour, metric, floor(ln(1 + seconds) * 10)::int, COUNT(*), SUM(seconds)
+FROM (
+    SELECT o.pickup_location, date_trunc('hour', o.created_at) AS hour, m.metric,
+           GREATEST(EXTRACT(EPOCH FROM (m.at - o.created_at)), 0) AS seconds
+    FROM orders o
+    CROSS JOIN LATERAL (VALUES
+        ('accept', o.accepted_at),
+        ('pickup', CASE WHEN o.status = 'picked_up' THEN o.updated_at END),
+        ('deliver', CASE WHEN o.status = 'delivered' THEN o.updated_at END)
+    ) AS m(metric, at)
+    WHERE m.at IS NOT NULL
+) timings
+WHERE NOT EXISTS (SELECT 1 FROM order_metrics)
+GROUP BY 1, 2, 3, 4;
+
+CREATE OR REPLACE FUNCTION record_order_transition() RETURNS trigger AS $$
+DECLARE
+    metric_name TEXT;
+    seconds DOUBLE PRECISION;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO order_tracking_events (order_id, status) VALUES (NEW.id, NEW.status);
+
+    metric_name := CASE NEW.status
+        WHEN 'confirmed' THEN 'accept'
+        WHEN 'picked_up' THEN 'pickup'
+        WHEN 'delivered' THEN 'deliver'
+    END;
+    IF metric_name IS NOT NULL THEN
+        seconds := GREATEST(EXTRACT(EPOCH FROM (LOCALTIMESTAMP - NEW.created_at)), 0);
+        INSERT INTO order_metrics (pickup_location, hour, metric, bucket, count, total_seconds)
+        VALUES (NEW.pickup_location, date_trunc('hour', NEW.created_at), metric_name,
+                floor(ln(1 + seconds) * 10)::int, 1, seconds)
+        ON CONFLICT (pickup_location, hour, metric, bucket) DO UPDATE
+        SET count = order_metrics.count + 1,
+            total_seconds = order_metrics.total_seconds + EXCLUDED.total_seconds;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS order_status_changed ON orders;
+CREATE TRIGGER order_status_changed
+    AFTER INSERT OR UPDATE OF status ON orders
+    FOR EACH ROW EXECUTE FUNCTION record_order_transition();
@@ -0,0 +1,6 @@
+-- Migration: Collision-free order numbers
+-- Each backend process takes a node id from this sequence (modulo 1024) the
+-- first time it generates an order number; numbers are built from the time,
+-- that node id and a per-process counter, so processes never collide.
+
+CREATE SEQUENCE IF NOT EXISTS order_node_seq;
@@ -0,0 +1,6 @@
+-- Migration: Indexes for keyset pagination of the admin and dasher order lists
+-- Pages are read newest first on (created_at, id), optionally per status or dasher.
+
+CREATE INDEX IF NOT EXISTS idx_orders_created_id ON orders(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_id ON orders(status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_dasher_created_id ON orders(dasher_email, created_at DESC, id DESC);
@@ -0,0 +1,8 @@
+-- Migration: Restrict orders.status to the lifecycle in utils/order_states.py
+-- Transitions are enforced by the backend's conditional updates; this keeps
+-- anything else from writing a status outside the state machine. NOT VALID
+-- skips checking existing rows, so the migration never fails on old data.
+
+ALTER TABLE orders DROP CONSTRAINT IF EXISTS orders_status_check;
+ALTER TABLE orders ADD CONSTRAINT orders_status_check
+    CHECK (status IN ('pending', 'confirmed', 'picked_up', 'delivered', 'cancelled')) NOT VALID;
@@ -0,0 +1,21 @@
+-- Migration: Shared menu scrape jobs
+-- Every backend process reads and writes jobs here, so a job id is valid on
+-- any of them. At most one job is queued or running at a time, and a cron
+-- tick creates one job however many processes run the scheduler.
+
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed', 'skipped')),
+    trigger VARCHAR(20) NOT NULL,
+    force BOOLEAN NOT NULL DEFAULT false,
+    scheduled_for TIMESTAMP UNIQUE,
+    queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    result JSONB,
+    error TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_scrape_jobs_single_active ON scrape_jobs((true))
+    WHERE status IN ('queued', 'running');
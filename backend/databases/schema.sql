@@ -1,7 +1,10 @@
 -- UMass Dining Delivery Database Schema
 
 -- Drop existing tables if they exist
+DROP TABLE IF EXISTS scrape_jobs CASCADE;
 DROP TABLE IF EXISTS dasher_tokens CASCADE;
+DROP TABLE IF EXISTS dasher_notifications CASCADE;
+DROP TABLE IF EXISTS order_metrics CASCADE;
 DROP TABLE IF EXISTS order_items CASCADE;
 DROP TABLE IF EXISTS orders CASCADE;
 DROP TABLE IF EXISTS dashers CASCADE;
@@ -56,6 +59,7 @@ CREATE TABLE menu_items (
     location VARCHAR(255) NOT NULL,
     category VARCHAR(255),
     item_name VARCHAR(255) NOT NULL,
+    meal VARCHAR(50),
     price DECIMAL(10, 2) DEFAULT 1.00,
     dietary_info TEXT[],
     available BOOLEAN DEFAULT true,
@@ -63,6 +67,49 @@ CREATE TABLE menu_items (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Menu generation counter (bumped by every menu_items write that changes rows, used for cache invalidation)
+CREATE TABLE IF NOT EXISTS menu_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO menu_generation (id, generation) VALUES (true, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_menu_generation() RETURNS trigger AS $$
+DECLARE
+    new_generation BIGINT;
+BEGIN
+    -- Statements that changed no rows leave the menu, and its caches, alone
+    IF TG_OP <> 'TRUNCATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    UPDATE menu_generation
+    SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE id
+    RETURNING generation INTO new_generation;
+    PERFORM pg_notify('menu_changed', new_generation::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables allow one event per trigger, hence four triggers
+CREATE TRIGGER menu_items_inserted
+    AFTER INSERT ON menu_items REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+CREATE TRIGGER menu_items_updated
+    AFTER UPDATE ON menu_items REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+CREATE TRIGGER menu_items_deleted
+    AFTER DELETE ON menu_items REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+CREATE TRIGGER menu_items_truncated
+    AFTER TRUNCATE ON menu_items
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_menu_generation();
+
 -- Dashers table
 CREATE TABLE dashers (
     id SERIAL PRIMARY KEY,
@@ -84,15 +131,21 @@ CREATE TABLE orders (
     pickup_location VARCHAR(255) NOT NULL,
     special_instructions TEXT,
     total_amount DECIMAL(10, 2) NOT NULL,
-    status VARCHAR(50) DEFAULT 'pending',
+    status VARCHAR(50) DEFAULT 'pending'
+        CHECK (status IN ('pending', 'confirmed', 'picked_up', 'delivered', 'cancelled')),
     dasher_email VARCHAR(255),
     dasher_name VARCHAR(255),
     dasher_phone VARCHAR(20),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     accepted_at TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    dispatch_wave INTEGER NOT NULL DEFAULT 0,
+    next_escalation_at TIMESTAMP
 );
 
+-- Node ids for order number generators, one per backend process (see utils/helpers.py)
+CREATE SEQUENCE IF NOT EXISTS order_node_seq;
+
 -- Order items table
 CREATE TABLE order_items (
     id SERIAL PRIMARY KEY,
@@ -105,6 +158,47 @@ CREATE TABLE order_items (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Dashers told about each order (one row per dasher per order, by escalation wave)
+CREATE TABLE dasher_notifications (
+    id BIGSERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    dasher_email VARCHAR(255) NOT NULL,
+    wave INTEGER NOT NULL DEFAULT 0,
+    notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    accepted_at TIMESTAMP,
+    UNIQUE (order_id, dasher_email)
+);
+
+-- Outbound email queue (delivered by background workers)
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    to_email VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    body TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Menu scrape jobs, shared by every backend process (at most one active at a time)
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed', 'skipped')),
+    trigger VARCHAR(20) NOT NULL,
+    force BOOLEAN NOT NULL DEFAULT false,
+    scheduled_for TIMESTAMP UNIQUE,
+    queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    result JSONB,
+    error TEXT
+);
+
 -- Driver availability table
 CREATE TABLE IF NOT EXISTS driver_availability (
     id SERIAL PRIMARY KEY,
@@ -126,6 +220,54 @@ CREATE TABLE IF NOT EXISTS order_tracking_events (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Delivery-time histograms per pickup location and hour the orders were placed,
+-- maintained by the order_status_changed trigger. Bucket b holds times in
+-- [exp(b/10) - 1, exp((b+1)/10) - 1) seconds since the order was placed.
+CREATE TABLE order_metrics (
+    pickup_location VARCHAR(255) NOT NULL,
+    hour TIMESTAMP NOT NULL,
+    metric VARCHAR(20) NOT NULL CHECK (metric IN ('accept', 'pickup', 'deliver')),
+    bucket INTEGER NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (pickup_location, hour, metric, bucket)
+);
+
+-- Log every order status change and count accept/pickup/delivery times, in the
+-- same transaction as the change
+CREATE OR REPLACE FUNCTION record_order_transition() RETURNS trigger AS $$
+DECLARE
+    metric_name TEXT;
+    seconds DOUBLE PRECISION;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO order_tracking_events (order_id, status) VALUES (NEW.id, NEW.status);
+
+    metric_name := CASE NEW.status
+        WHEN 'confirmed' THEN 'accept'
+        WHEN 'picked_up' THEN 'pickup'
+        WHEN 'delivered' THEN 'deliver'
+    END;
+    IF metric_name IS NOT NULL THEN
+        seconds := GREATEST(EXTRACT(EPOCH FROM (LOCALTIMESTAMP - NEW.created_at)), 0);
+        INSERT INTO order_metrics (pickup_location, hour, metric, bucket, count, total_seconds)
+        VALUES (NEW.pickup_location, date_trunc('hour', NEW.created_at), metric_name,
+                floor(ln(1 + seconds) * 10)::int, 1, seconds)
+        ON CONFLICT (pickup_location, hour, metric, bucket) DO UPDATE
+        SET count = order_metrics.count + 1,
+            total_seconds = order_metrics.total_seconds + EXCLUDED.total_seconds;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER order_status_changed
+    AFTER INSERT OR UPDATE OF status ON orders
+    FOR EACH ROW EXECUTE FUNCTION record_order_transition();
+
 -- Notifications table
 CREATE TABLE IF NOT EXISTS notifications (
     id SERIAL PRIMARY KEY,
@@ -157,7 +299,17 @@ CREATE INDEX idx_orders_status ON orders(status);
 CREATE INDEX idx_orders_created_at ON orders(created_at);
 CREATE INDEX idx_menu_location ON menu_items(location);
 CREATE INDEX idx_menu_available ON menu_items(available);
+CREATE INDEX idx_menu_items_key ON menu_items(location, category, item_name, meal);
 CREATE INDEX idx_orders_number ON orders(order_number);
 CREATE INDEX idx_orders_dasher ON orders(dasher_email);
+CREATE INDEX idx_orders_created_id ON orders(created_at DESC, id DESC);
+CREATE INDEX idx_orders_status_created_id ON orders(status, created_at DESC, id DESC);
+CREATE INDEX idx_orders_dasher_created_id ON orders(dasher_email, created_at DESC, id DESC);
+CREATE INDEX idx_orders_escalation ON orders(next_escalation_at) WHERE status = 'pending';
+CREATE INDEX idx_dasher_notifications_dasher ON dasher_notifications(dasher_email, notified_at);
+CREATE INDEX idx_tracking_events_order ON order_tracking_events(order_id, created_at);
+CREATE INDEX idx_order_metrics_hour ON order_metrics(hour);
 CREATE INDEX idx_tokens_token ON dasher_tokens(token);
 CREATE INDEX idx_tokens_expires ON dasher_tokens(expires_at);
+CREATE INDEX idx_email_outbox_due ON email_outbox(next_attempt_at) WHERE status IN ('pending', 'sending');
+CREATE UNIQUE INDEX idx_scrape_jobs_single_active ON scrape_jobs((true)) WHERE status IN ('queued', 'running');
@@ -0,0 +1,17 @@
+# Gunicorn settings, read automatically when started from backend/:
+#   gunicorn application:app
+#
+# Order tracking (GET /api/orders/<order_number>/events) keeps a request open
+# per tab until the order is delivered or cancelled, or ORDER_EVENTS_MAX_AGE
+# passes. The default sync worker serves one request at a time, so a single
+# open tab would block every other request to that worker. Use threads (or
+# run with -k gevent) and size `threads` for the tabs you expect per worker.
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
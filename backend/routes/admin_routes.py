@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from utils.database import get_db_connection
+from utils.pagination import order_filters, paginate_orders, stream_orders_ndjson
+from utils.scrape_jobs import scrape_jobs
+from utils.delivery_metrics import delivery_metrics
 from psycopg2.extras import RealDictCursor
-import subprocess
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -11,21 +13,13 @@ admin_bp = Blueprint('admin', __name__)
 @admin_bp.route('/dashers', methods=['GET'])
 def get_dashers():
     """Get all dashers"""
-    conn = None
-    cur = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute('SELECT * FROM dashers ORDER BY name')
-        dashers = cur.fetchall()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT * FROM dashers ORDER BY name')
+            dashers = cur.fetchall()
         return jsonify({'dashers': dashers}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 @admin_bp.route('/dashers', methods=['POST'])
 def add_dasher():
@@ -34,64 +28,93 @@ def add_dasher():
     if not data.get('name') or not data.get('email'):
         return jsonify({'error': 'Name and email required'}), 400
 
-    conn = None
-    cur = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute('''
-            INSERT INTO dashers (name, email, phone, active)
-            VALUES (%s, %s, %s, %s)
-            RETURNING *
-        ''', (data['name'], data['email'], data.get('phone'), True))
-        dasher = cur.fetchone()
-        conn.commit()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('''
+                INSERT INTO dashers (name, email, phone, active)
+                VALUES (%s, %s, %s, %s)
+                RETURNING *
+            ''', (data['name'], data['email'], data.get('phone'), True))
+            dasher = cur.fetchone()
+            conn.commit()
         return jsonify({'dasher': dasher}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 # ----------------------
 # ORDERS ENDPOINT
 # ----------------------
 @admin_bp.route('/orders', methods=['GET'])
 def get_all_orders():
-    """Get all orders (admin view)"""
-    status = request.args.get('status')
-    conn = None
-    cur = None
+    """
+    Get orders (admin view), newest first, one page at a time.
+    Query params: status, since, until, limit, cursor (next_cursor from the
+    previous page), format=ndjson to stream every matching order instead.
+    """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        query = 'SELECT * FROM orders'
-        params = []
-        if status:
-            query += ' WHERE status = %s'
-            params.append(status)
-        query += ' ORDER BY created_at DESC'
-        cur.execute(query, params)
-        orders = cur.fetchall()
-        return jsonify({'orders': orders}), 200
+        clauses, params = order_filters(request.args)
+
+        if request.args.get('format') == 'ndjson':
+            rows = stream_orders_ndjson('SELECT * FROM orders', clauses, params)
+            return Response(stream_with_context(rows), mimetype='application/x-ndjson')
+
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            orders, next_cursor = paginate_orders(cur, 'SELECT * FROM orders', clauses, params, request.args)
+        return jsonify({'orders': orders, 'next_cursor': next_cursor}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/delivery-metrics', methods=['GET'])
+def get_delivery_metrics():
+    """
+    Time-to-accept, time-to-pickup and time-to-deliver percentiles, in seconds
+    since the order was placed, read from the precomputed order_metrics table.
+    Query params: group_by (hall, hour or "hall,hour"; default hall), hall,
+    since, until.
+    """
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            metrics = delivery_metrics(cur, request.args)
+        return jsonify({'metrics': metrics}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
 # ----------------------
 # SCRAPER ENDPOINT
 # ----------------------
 @admin_bp.route('/scrape-menu', methods=['POST'])
 def trigger_scraper():
-    """Trigger menu scraper (runs asynchronously)"""
+    """
+    Queue a menu scrape (runs asynchronously). If one is already queued or
+    running, that job is returned instead of starting another.
+    Optional JSON: { "force": true } to reload halls whose menu looks unchanged.
+    """
     try:
-        subprocess.Popen(['python', 'scraper/run_scraper.py'])
-        return jsonify({'message': 'Menu scraper started'}), 200
+        data = request.get_json(silent=True) or {}
+        job, created = scrape_jobs.submit(trigger='manual', force=bool(data.get('force')))
+        message = 'Menu scraper started' if created else 'Menu scraper already running'
+        return jsonify({'message': message, 'job': job.to_dict()}), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/scrape-jobs', methods=['GET'])
+def get_scrape_jobs():
+    """Recent scrape jobs, newest first, and the next scheduled run"""
+    next_run = scrape_jobs.next_run()
+    return jsonify({
+        'jobs': scrape_jobs.jobs(),
+        'schedule': scrape_jobs.schedule,
+        'next_run': next_run.isoformat() if next_run else None
+    }), 200
+
+@admin_bp.route('/scrape-jobs/<int:job_id>', methods=['GET'])
+def get_scrape_job(job_id):
+    """Status of one scrape job: queued, running, done, failed or skipped"""
+    job = scrape_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Scrape job not found'}), 404
+    return jsonify({'job': job}), 200
@@ -1,8 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import google.generativeai as genai
 import os
 import json
 from dotenv import load_dotenv
+from config import (
+    AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES, AI_MAX_CONCURRENCY, AI_TIMEOUT,
+    AI_QUEUE_TIMEOUT, AI_BREAKER_THRESHOLD, AI_BREAKER_RESET
+)
+from utils.json_stream import ResultsStreamParser
+from utils.llm_client import CircuitBreaker, LLMClient, LLMUnavailableError
+from utils.menu_search import answer_menu_query, fallback_menu_query, normalize_query
+from utils.menu_context import get_menu_context, is_known_location
+from utils.shared_stream import StreamCoalescer
+from utils.ttl_cache import TTLCache
 
 load_dotenv()
 
@@ -14,25 +24,25 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 # System prompt for the AI agent
-SYSTEM_PROMPT = """You are a strict data-filtering AI. Your only purpose is to analyze a provided JSON object of menu data from the UMass Worcester Dining Commons and return a list of items that match the user's specific query. You are not a recommender; you are a data-filter.
+SYSTEM_PROMPT = """You are a strict data-filtering AI. Your only purpose is to analyze the provided menu data from UMass Dining and return a list of items that match the user's specific query. You are not a recommender; you are a data-filter.
 
 Your Inputs:
-1. Verified Menu Data: The complete, raw JSON data for today's menu
+1. Verified Menu Data: Today's complete menu in a compact format. The first line is a TAGS legend mapping numbers to dietary tags. Lines starting with "@" name a location and lines starting with "#" name a station; every other line is one item at the location and station above it, written as "item_name|tag numbers"
 2. User Query: A text string (e.g., "vegetarian," "low in calories," "no nuts")
 
 Your Step-by-Step Process:
-1. Initial Scan: Read through the entire JSON data provided
+1. Initial Scan: Read through the entire menu data provided
 2. Apply Critical Filters: For every food item, check:
    - Is it being served? (This data doesn't have a "published" flag, so assume all items are available)
 3. Interpret the Query:
-   - If "vegetarian" or "vegan" or "plant based": check the "tags" array for those terms
-   - If "with chicken" or "beef": search within the "item_name" field
+   - If "vegetarian" or "vegan" or "plant based": check the item's tags for those terms
+   - If "with chicken" or "beef": search within the item_name
    - If "no nuts": exclude items with nuts mentioned in the item_name
-   - For other dietary preferences: check the "tags" array
+   - For other dietary preferences: check the item's tags
 4. Construct Response: For each matching item, create an entry with:
    - name: exact item_name from data
-   - station: exact category from data
-   - location: exact location from data
+   - station: exact station from its "#" header
+   - location: exact location from its "@" header
    - rationale: brief explanation of why it matches
 
 Final Output:
@@ -43,66 +53,233 @@ Final Output:
 
 IMPORTANT: Only return valid JSON. Do not include any explanatory text before or after the JSON."""
 
+def _gemini_generate(prompt):
+    # The HTTP timeout stops a stuck request from holding its slot forever
+    response = model.generate_content(prompt, request_options={'timeout': AI_TIMEOUT * 3})
+    return response.text
+
+
+def _gemini_generate_stream(prompt):
+    response = model.generate_content(prompt, stream=True, request_options={'timeout': AI_TIMEOUT * 3})
+    for chunk in response:
+        yield chunk.text
+
+
+# One model and client per process, shared by every request
+model = genai.GenerativeModel('gemini-2.5-flash') if GEMINI_API_KEY else None
+llm_client = LLMClient(
+    _gemini_generate,
+    _gemini_generate_stream,
+    max_concurrency=AI_MAX_CONCURRENCY,
+    timeout=AI_TIMEOUT,
+    queue_timeout=AI_QUEUE_TIMEOUT,
+    breaker=CircuitBreaker(failure_threshold=AI_BREAKER_THRESHOLD, reset_timeout=AI_BREAKER_RESET)
+)
+
+# Model answers, keyed by (normalized query, location, menu version)
+ai_cache = TTLCache(max_entries=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL)
+
+# Model streams in flight, under the same keys
+model_streams = StreamCoalescer()
+
+
+def _build_prompt(user_query, menu):
+    """Prepare the prompt with menu data and user query"""
+    return f"""{SYSTEM_PROMPT}
+
+Menu Data:
+{menu.prompt}
+
+User Query: {user_query}
+
+Analyze the menu data and return matching items in the specified JSON format."""
+
+
+def _ask_model(user_query, menu):
+    """
+    Ask the model to filter the menu and return the parsed response body.
+    Raises LLMUnavailableError if it is slow, failing or overloaded.
+    """
+    # Generate response
+    ai_response = llm_client.complete(_build_prompt(user_query, menu)).strip()
+    
+    # Try to extract JSON from the response
+    try:
+        # Remove markdown code blocks if present
+        if '```json' in ai_response:
+            ai_response = ai_response.split('```json')[1].split('```')[0].strip()
+        elif '```' in ai_response:
+            ai_response = ai_response.split('```')[1].split('```')[0].strip()
+        
+        result = json.loads(ai_response)
+        
+        # Ensure the result has the expected structure
+        if 'results' not in result:
+            result = {'results': []}
+        
+        return result
+        
+    except json.JSONDecodeError:
+        # If JSON parsing fails, return the raw response
+        return {
+            'results': [],
+            'raw_response': ai_response,
+            'error': 'Failed to parse AI response as JSON'
+        }
+
 @ai_bp.route('/chat', methods=['POST'])
 def chat():
     """Handle AI chatbot queries for menu filtering"""
     try:
         data = request.get_json()
         user_query = data.get('query', '')
-        menu_data = data.get('menu_data', [])
+        location = data.get('location') or None
         
         if not user_query:
             return jsonify({'error': 'Query is required'}), 400
         
-        if not menu_data:
-            return jsonify({'error': 'Menu data is required'}), 400
+        if not is_known_location(location):
+            return jsonify({'error': 'Unknown location'}), 400
+        
+        # The menu comes from our own store, cached until the next scrape
+        menu = get_menu_context(location)
+        if not menu.items:
+            return jsonify({'error': 'Menu data is not available'}), 503
+        
+        # Common dietary and ingredient questions are answered from a local
+        # index; only queries it cannot parse go to the model
+        local_result = answer_menu_query(user_query, menu.index)
+        if local_result is not None:
+            return jsonify(local_result), 200
         
         if not GEMINI_API_KEY:
             return jsonify({'error': 'Gemini API key not configured'}), 500
         
-        # Create the model
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        # Identical questions against the same menu share one model call,
+        # including concurrent ones that arrive while it is in flight
+        cache_key = (normalize_query(user_query), location, menu.version)
+        try:
+            result = ai_cache.get_or_compute(
+                cache_key,
+                lambda: _ask_model(user_query, menu),
+                should_cache=lambda r: 'error' not in r
+            )
+        except LLMUnavailableError as e:
+            # Answer from the local index rather than making the user wait
+            print(f"AI chat falling back to local search: {e}")
+            result = fallback_menu_query(user_query, menu.index)
+        return jsonify(result), 200
         
-        # Prepare the prompt with menu data and user query
-        prompt = f"""{SYSTEM_PROMPT}
+    except Exception as e:
+        print(f"Error in AI chat: {e}")
+        return jsonify({'error': str(e)}), 500
 
-Menu Data (JSON):
-{json.dumps(menu_data, indent=2)}
 
-User Query: {user_query}
+def _ndjson(event):
+    return json.dumps(event) + '\n'
+
+
+def _stream_results(user_query, location, menu):
+    """
+    Yield NDJSON events for a chat query: one {"type": "result"} line per
+    matching item as soon as it is known, then a {"type": "done"} line.
+    """
+    try:
+        cache_key = (normalize_query(user_query), location, menu.version)
+        result = answer_menu_query(user_query, menu.index) or ai_cache.get(cache_key)
+    except Exception as e:
+        print(f"Error in AI chat stream: {e}")
+        yield _ndjson({'type': 'error', 'error': str(e)})
+        return
+
+    if result is not None:
+        for item in result['results']:
+            yield _ndjson({'type': 'result', 'item': item})
+        yield _ndjson({'type': 'done', 'count': len(result['results'])})
+        return
+
+    if not GEMINI_API_KEY:
+        yield _ndjson({'type': 'error', 'error': 'Gemini API key not configured'})
+        return
+
+    # Identical questions streamed at the same time share one model stream:
+    # later requests replay what was already sent, then follow along
+    yield from model_streams.join(cache_key, lambda: _stream_from_model(user_query, menu, cache_key))
+
+
+def _stream_from_model(user_query, menu, cache_key):
+    """Stream the model's answer as NDJSON events and cache it once complete"""
+    # Items are sent the moment the parser sees their closing brace
+    sent = []
+    parser = ResultsStreamParser()
+    try:
+        for chunk in llm_client.stream(_build_prompt(user_query, menu)):
+            for item in parser.feed(chunk):
+                sent.append(item)
+                yield _ndjson({'type': 'result', 'item': item})
+            if parser.done:
+                break
+    except LLMUnavailableError as e:
+        # Finish the answer from the local index, skipping what was already sent
+        print(f"AI chat stream falling back to local search: {e}")
+        names = {item.get('name') for item in sent}
+        extra = [item for item in fallback_menu_query(user_query, menu.index)['results']
+                 if item['name'] not in names]
+        for item in extra:
+            yield _ndjson({'type': 'result', 'item': item})
+        yield _ndjson({'type': 'done', 'count': len(sent) + len(extra), 'fallback': True})
+        return
+    except Exception as e:
+        # Headers are already sent, so errors are reported in the stream
+        print(f"Error in AI chat stream: {e}")
+        yield _ndjson({'type': 'error', 'error': str(e)})
+        return
+
+    if parser.done:
+        ai_cache.set(cache_key, {'results': sent})
+    yield _ndjson({'type': 'done', 'count': len(sent)})
+
+
+@ai_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /chat. Responds with NDJSON: a {"type": "result",
+    "item": {...}} line per matching item as soon as the model has produced
+    it, then {"type": "done", "count": n}, or {"type": "error"} on failure.
+    """
+    try:
+        data = request.get_json()
+        user_query = data.get('query', '')
+        location = data.get('location') or None
+
+        if not user_query:
+            return jsonify({'error': 'Query is required'}), 400
+
+        if not is_known_location(location):
+            return jsonify({'error': 'Unknown location'}), 400
+
+        menu = get_menu_context(location)
+        if not menu.items:
+            return jsonify({'error': 'Menu data is not available'}), 503
 
-Analyze the menu data and return matching items in the specified JSON format."""
-        
-        # Generate response
-        response = model.generate_content(prompt)
-        
-        # Parse the AI response
-        ai_response = response.text.strip()
-        
-        # Try to extract JSON from the response
-        try:
-            # Remove markdown code blocks if present
-            if '```json' in ai_response:
-                ai_response = ai_response.split('```json')[1].split('```')[0].strip()
-            elif '```' in ai_response:
-                ai_response = ai_response.split('```')[1].split('```')[0].strip()
-            
-            result = json.loads(ai_response)
-            
-            # Ensure the result has the expected structure
-            if 'results' not in result:
-                result = {'results': []}
-            
-            return jsonify(result), 200
-            
-        except json.JSONDecodeError:
-            # If JSON parsing fails, return the raw response
-            return jsonify({
-                'results': [],
-                'raw_response': ai_response,
-                'error': 'Failed to parse AI response as JSON'
-            }), 200
-        
     except Exception as e:
         print(f"Error in AI chat: {e}")
         return jsonify({'error': str(e)}), 500
+
+    response = Response(
+        stream_with_context(_stream_results(user_query, location, menu)),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@ai_bp.route('/stats', methods=['GET'])
+def stats():
+    """Cache counters for the AI chat: hits and coalesced requests are model calls saved"""
+    return jsonify({
+        'response_cache': ai_cache.stats(),
+        'model_streams': model_streams.stats(),
+        'model': llm_client.stats()
+    }), 200
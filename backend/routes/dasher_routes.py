@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from psycopg2.extras import RealDictCursor
 from utils.database import get_db_connection
-from utils.email import send_email
+from utils.pagination import order_filters, paginate_orders, stream_orders_ndjson
+from utils.email_queue import enqueue_email
+from utils.dispatch import claim_order, available_orders
+from utils.order_states import PICKED_UP, DELIVERED, TransitionError, transition
+from utils.orders import order_cache
+from utils.order_events import notify_order_changed
 from config import FRONTEND_URL
 
 dasher_bp = Blueprint('dasher', __name__)
@@ -11,30 +16,56 @@ dasher_bp = Blueprint('dasher', __name__)
 # -------------------------------
 @dasher_bp.route('/orders', methods=['GET'])
 def get_dasher_orders():
-    """Get all orders for a specific dasher by email"""
+    """
+    Get orders for a specific dasher by email, newest first, one page at a time.
+    Query params: email (required), status, since, until, limit, cursor,
+    format=ndjson to stream every matching order instead.
+    """
     dasher_email = request.args.get('email')
     if not dasher_email:
         return jsonify({'error': 'Email parameter required'}), 400
 
+    select_sql = '''
+        SELECT id, order_number, customer_name, customer_phone, delivery_address,
+               pickup_location, total_amount, status, created_at, accepted_at,
+               dasher_name, dasher_phone
+        FROM orders
+    '''
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        clauses, params = order_filters(request.args, ['dasher_email = %s'], [dasher_email])
 
-        cur.execute('''
-            SELECT order_number, customer_name, customer_phone, delivery_address,
-                   pickup_location, total_amount, status, created_at, accepted_at,
-                   dasher_name, dasher_phone
-            FROM orders
-            WHERE dasher_email = %s
-            ORDER BY created_at DESC
-        ''', (dasher_email,))
+        if request.args.get('format') == 'ndjson':
+            rows = stream_orders_ndjson(select_sql, clauses, params)
+            return Response(stream_with_context(rows), mimetype='application/x-ndjson')
 
-        orders = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            orders, next_cursor = paginate_orders(cur, select_sql, clauses, params, request.args)
 
-        return jsonify({'orders': orders}), 200
+        return jsonify({'orders': orders, 'next_cursor': next_cursor}), 200
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# -------------------------------
+# Available Orders
+# -------------------------------
+@dasher_bp.route('/available', methods=['GET'])
+def get_available_orders():
+    """
+    Pending orders waiting for a dasher, oldest first, one page at a time.
+    Query params: limit, cursor.
+    """
+    try:
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            orders, next_cursor = available_orders(cur, request.args)
+
+        return jsonify({'orders': orders, 'next_cursor': next_cursor}), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -55,58 +86,34 @@ def accept_order():
         return jsonify({'error': 'dasher_email and order_number are required'}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Verify dasher exists
-        cur.execute('SELECT name, phone FROM dashers WHERE email = %s', (dasher_email,))
-        dasher = cur.fetchone()
-        if not dasher:
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Dasher not found'}), 404
-
-        # Verify order exists and is pending
-        cur.execute('SELECT id, customer_name, customer_email, pickup_location, delivery_address, status FROM orders WHERE order_number = %s', (order_number,))
-        order = cur.fetchone()
-        if not order:
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Order not found'}), 404
-        if order['status'] != 'pending':
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Order already accepted'}), 400
-
-        # Accept the order
-        cur.execute('''
-            UPDATE orders
-            SET status = 'confirmed', dasher_email = %s, dasher_name = %s,
-                dasher_phone = %s, accepted_at = CURRENT_TIMESTAMP
-            WHERE id = %s AND status = 'pending'
-        ''', (dasher_email, dasher['name'], dasher['phone'], order['id']))
-        conn.commit()
-
-        # Notify customer
-        customer_email_body = f"""
-        <html>
-        <body>
-            <h2>Dasher Assigned!</h2>
-            <p>Hi {order['customer_name']},</p>
-            <p>Your order {order_number} has been accepted by a dasher.</p>
-            <p><strong>Dasher:</strong> {dasher['name']}</p>
-            <p><strong>Dasher Phone:</strong> {dasher['phone']}</p>
-            <p>Pickup: {order['pickup_location']} | Delivery: {order['delivery_address']}</p>
-            <p>Track your order: <a href="{FRONTEND_URL}/order/{order_number}">View Order Status</a></p>
-        </body>
-        </html>
-        """
-        send_email(order['customer_email'], f'Dasher Assigned - {order_number}', customer_email_body)
-
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Claim the order; a dasher who loses the race gets a 409 and no email is sent
+            order = claim_order(cur, order_number, dasher_email)
+
+            # Notify customer
+            customer_email_body = f"""
+            <html>
+            <body>
+                <h2>Dasher Assigned!</h2>
+                <p>Hi {order['customer_name']},</p>
+                <p>Your order {order_number} has been accepted by a dasher.</p>
+                <p><strong>Dasher:</strong> {order['dasher_name']}</p>
+                <p><strong>Dasher Phone:</strong> {order['dasher_phone']}</p>
+                <p>Pickup: {order['pickup_location']} | Delivery: {order['delivery_address']}</p>
+                <p>Track your order: <a href="{FRONTEND_URL}/order/{order_number}">View Order Status</a></p>
+            </body>
+            </html>
+            """
+            enqueue_email(cur, order['customer_email'], f'Dasher Assigned - {order_number}', customer_email_body)
+            notify_order_changed(cur, order_number)
+            conn.commit()
+
+        order_cache.invalidate(order_number)
+
         return jsonify({'message': 'Order accepted successfully'}), 200
 
+    except TransitionError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -127,56 +134,45 @@ def update_order_status():
     if not dasher_email or not order_number or not new_status:
         return jsonify({'error': 'dasher_email, order_number, and status are required'}), 400
 
-    valid_statuses = ['confirmed', 'picked_up', 'delivered']
+    # Dashers move their orders forward; accepting goes through /accept
+    valid_statuses = [PICKED_UP, DELIVERED]
     if new_status not in valid_statuses:
         return jsonify({'error': f'Invalid status. Must be one of {valid_statuses}'}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Verify order exists and belongs to dasher
-        cur.execute('''
-            SELECT id, customer_name, customer_email, status
-            FROM orders
-            WHERE order_number = %s AND dasher_email = %s
-        ''', (order_number, dasher_email))
-        order = cur.fetchone()
-        if not order:
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Order not found or does not belong to this dasher'}), 404
-
-        # Update status
-        cur.execute('''
-            UPDATE orders
-            SET status = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        ''', (new_status, order['id']))
-        conn.commit()
-
-        # Notify customer
-        status_messages = {
-            'confirmed': 'Your order has been confirmed by the dasher.',
-            'picked_up': 'Your order has been picked up and is on the way.',
-            'delivered': 'Your order has been delivered!'
-        }
-        customer_email_body = f"""
-        <html>
-        <body>
-            <h2>Order Update</h2>
-            <p>Hi {order['customer_name']},</p>
-            <p><strong>Order:</strong> {order_number}</p>
-            <p><strong>Status:</strong> {status_messages[new_status]}</p>
-            <p>Track your order: <a href="{FRONTEND_URL}/order/{order_number}">View Order Status</a></p>
-        </body>
-        </html>
-        """
-        send_email(order['customer_email'], f'Order Update - {order_number}', customer_email_body)
-
-        cur.close()
-        conn.close()
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # One conditional update: the order must be this dasher's and in the status before new_status
+            order = transition(
+                cur, order_number, new_status,
+                conditions=[('dasher_email = %s', (dasher_email,))],
+                not_found='Order not found or does not belong to this dasher'
+            )
+
+            # Notify customer
+            status_messages = {
+                PICKED_UP: 'Your order has been picked up and is on the way.',
+                DELIVERED: 'Your order has been delivered!'
+            }
+            customer_email_body = f"""
+            <html>
+            <body>
+                <h2>Order Update</h2>
+                <p>Hi {order['customer_name']},</p>
+                <p><strong>Order:</strong> {order_number}</p>
+                <p><strong>Status:</strong> {status_messages[new_status]}</p>
+                <p>Track your order: <a href="{FRONTEND_URL}/order/{order_number}">View Order Status</a></p>
+            </body>
+            </html>
+            """
+            enqueue_email(cur, order['customer_email'], f'Order Update - {order_number}', customer_email_body)
+            notify_order_changed(cur, order_number)
+            conn.commit()
+
+        order_cache.invalidate(order_number)
+
         return jsonify({'message': 'Status updated successfully'}), 200
 
+    except TransitionError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,34 +1,71 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from utils.database import get_db_connection
+from utils.menu_cache import menu_cache
+from utils.menu_context import fetch_locations, fetch_menu_items, is_known_location
+from config import MENU_HTTP_MAX_AGE
 import psycopg2.extras
 
 menu_bp = Blueprint('menu', __name__)
 
+
+def _cached_response(key, loader):
+    """
+    Serve a cached menu payload with an ETag, answering a matching
+    If-None-Match with 304 so browsers and CDNs can reuse their copy.
+    """
+    body, etag = menu_cache.get_or_load(key, loader)
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = MENU_HTTP_MAX_AGE
+    return response
+
+
+def _serialize(payload):
+    """Serialize a payload the same way jsonify would, as bytes"""
+    return current_app.json.dumps(payload).encode('utf-8')
+
+
+def _load_menu(location):
+    return _serialize({'menu_items': fetch_menu_items(location)})
+
+
+def _load_locations():
+    return _serialize({'locations': fetch_locations()})
+
+
+def _load_categories(location):
+    query = 'SELECT DISTINCT category FROM menu_items WHERE available = true'
+    params = []
+    
+    if location:
+        query += ' AND location = %s'
+        params.append(location)
+    
+    query += ' ORDER BY category'
+    
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(query, params)
+        categories = cur.fetchall()
+    
+    return _serialize({'categories': [cat['category'] for cat in categories]})
+
+
 @menu_bp.route('/menu', methods=['GET'])
 def get_menu():
     """Get all menu items, optionally filtered by location"""
-    location = request.args.get('location')
+    location = request.args.get('location') or None
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        query = 'SELECT * FROM menu_items WHERE available = true'
-        params = []
-        
-        if location:
-            query += ' AND location = %s'
-            params.append(location)
+        if not is_known_location(location):
+            return jsonify({'error': 'Unknown location'}), 400
         
-        query += ' ORDER BY category, item_name'
-        
-        cur.execute(query, params)
-        menu_items = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
-        return jsonify({'menu_items': menu_items}), 200
+        return _cached_response(('menu', location), lambda: _load_menu(location))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -37,16 +74,7 @@ def get_menu():
 def get_locations():
     """Get all unique dining hall locations"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        cur.execute('SELECT DISTINCT location FROM menu_items ORDER BY location')
-        locations = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
-        return jsonify({'locations': [loc['location'] for loc in locations]}), 200
+        return _cached_response(('locations', None), _load_locations)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -54,28 +82,13 @@ def get_locations():
 @menu_bp.route('/categories', methods=['GET'])
 def get_categories():
     """Get all unique menu categories, optionally filtered by location"""
-    location = request.args.get('location')
+    location = request.args.get('location') or None
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        query = 'SELECT DISTINCT category FROM menu_items'
-        params = []
-        
-        if location:
-            query += ' WHERE location = %s'
-            params.append(location)
-        
-        query += ' ORDER BY category'
-        
-        cur.execute(query, params)
-        categories = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        if not is_known_location(location):
+            return jsonify({'error': 'Unknown location'}), 400
         
-        return jsonify({'categories': [cat['category'] for cat in categories]}), 200
+        return _cached_response(('categories', location), lambda: _load_categories(location))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
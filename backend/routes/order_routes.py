@@ -1,14 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from utils.database import get_db_connection
-from utils.email import send_email
+from utils.email_queue import enqueue_emails
 from utils.helpers import generate_order_number
-from config import FRONTEND_URL
+from utils.orders import insert_order, get_order_json
+from utils.dispatch import notify_dashers
+from utils.order_events import order_events
+from utils.order_states import CANCELLED, DELIVERED
+from config import FRONTEND_URL, ORDER_EVENTS_HEARTBEAT, ORDER_EVENTS_MAX_AGE
 from datetime import datetime
+import json
+import queue
+import time
 
 from psycopg2.extras import RealDictCursor
 
 order_bp = Blueprint('order', __name__)
 
+# Statuses after which an order never changes again
+FINAL_STATUSES = {DELIVERED, CANCELLED}
+
 @order_bp.route('/orders', methods=['POST'])
 def create_order():
     """Create a new order (no authentication required)"""
@@ -24,85 +34,38 @@ def create_order():
         return jsonify({'error': 'Order must contain at least one item'}), 400
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
         order_number = generate_order_number()
         total_amount = data.get('total_amount', 0)
 
-        # Insert order
-        cur.execute('''
-            INSERT INTO orders (
-                order_number, customer_name, customer_email, customer_phone,
-                delivery_address, special_instructions, pickup_location,
-                total_amount
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id, order_number, created_at
-        ''', (
-            order_number, data['customer_name'], data['customer_email'],
-            data['customer_phone'], data['delivery_address'],
-            data.get('special_instructions'), data['pickup_location'],
-            total_amount
-        ))
-
-        order = cur.fetchone()
-        order_id = order['id']
-
-        # Insert order items
-        for item in data['items']:
-            cur.execute('''
-                INSERT INTO order_items (order_id, item_name, category, quantity, price, special_instructions)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (
-                order_id, item['name'], item.get('category'),
-                item.get('quantity', 1), item.get('price', 5.0),
-                item.get('special_instructions')
-            ))
-
-        conn.commit()
-
-        # Send confirmation email to customer
-        customer_email_body = f"""
-        <html>
-        <body>
-            <h2>Order Confirmation</h2>
-            <p>Thank you for your order, {data['customer_name']}!</p>
-            <p><strong>Order Number:</strong> {order_number}</p>
-            <p><strong>Pickup Location:</strong> {data['pickup_location']}</p>
-            <p><strong>Delivery Address:</strong> {data['delivery_address']}</p>
-            <p><strong>Total:</strong> ${total_amount:.2f}</p>
-            <p>You will receive an email when a dasher accepts your order.</p>
-            <p>Track your order at: <a href="{FRONTEND_URL}/order/{order_number}">View Order Status</a></p>
-        </body>
-        </html>
-        """
-        send_email(data['customer_email'], f'Order Confirmation - {order_number}', customer_email_body)
-
-        # Get active dashers and send notification emails
-        cur.execute('SELECT email, name FROM dashers WHERE active = true')
-        dashers = cur.fetchall()
-
-        for dasher in dashers:
-            dasher_email_body = f"""
+        with get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Insert order and its items in one round trip
+            order = insert_order(cur, order_number, data, total_amount)
+
+            # Queue confirmation email to customer
+            customer_email_body = f"""
             <html>
             <body>
-                <h2>New Delivery Available</h2>
-                <p>Hi {dasher['name']},</p>
-                <p>A new delivery order is available:</p>
+                <h2>Order Confirmation</h2>
+                <p>Thank you for your order, {data['customer_name']}!</p>
                 <p><strong>Order Number:</strong> {order_number}</p>
-                <p><strong>Pickup:</strong> {data['pickup_location']}</p>
-                <p><strong>Deliver to:</strong> {data['delivery_address']}</p>
-                <p><strong>Order Total:</strong> ${total_amount:.2f}</p>
-                <p>Check the orders dashboard to accept this delivery.</p>
+                <p><strong>Pickup Location:</strong> {data['pickup_location']}</p>
+                <p><strong>Delivery Address:</strong> {data['delivery_address']}</p>
+                <p><strong>Total:</strong> ${total_amount:.2f}</p>
+                <p>You will receive an email when a dasher accepts your order.</p>
+                <p>Track your order at: <a href="{FRONTEND_URL}/order/{order_number}">View Order Status</a></p>
             </body>
             </html>
             """
-            send_email(dasher['email'], f'New Delivery - {order_number}', dasher_email_body)
+            enqueue_emails(cur, [(data['customer_email'], f'Order Confirmation - {order_number}', customer_email_body)])
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            # Tell the best-placed dashers; more are asked if nobody accepts in time
+            notify_dashers(cur, {
+                **order,
+                'pickup_location': data['pickup_location'],
+                'delivery_address': data['delivery_address'],
+                'total_amount': total_amount
+            })
+            conn.commit()
 
         return jsonify({
             'order_number': order_number,
@@ -117,31 +80,55 @@ def create_order():
 def get_order(order_number):
     """Get order details by order number (no authentication)"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Get order details
-        cur.execute('SELECT * FROM orders WHERE order_number = %s', (order_number,))
-        order = cur.fetchone()
-
-        if not order:
+        body = get_order_json(order_number)
+        if body is None:
             return jsonify({'error': 'Order not found'}), 404
 
-        # Get order items
-        cur.execute('''
-            SELECT item_name AS name, category, quantity, price, special_instructions
-            FROM order_items
-            WHERE order_id = %s
-        ''', (order['id'],))
+        return Response(body, status=200, mimetype='application/json')
 
-        items = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        order_dict = dict(order)
-        order_dict['items'] = [dict(item) for item in items]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        return jsonify(order_dict), 200
 
+@order_bp.route('/orders/<order_number>/events', methods=['GET'])
+def stream_order_events(order_number):
+    """Stream the order document as Server-Sent Events, once now and again on every status change"""
+    events = order_events.subscribe(order_number)
+    try:
+        body = get_order_json(order_number)
     except Exception as e:
+        order_events.unsubscribe(order_number, events)
         return jsonify({'error': str(e)}), 500
+
+    if body is None:
+        order_events.unsubscribe(order_number, events)
+        return jsonify({'error': 'Order not found'}), 404
+
+    def stream():
+        # Each open stream holds a server thread, so none is kept forever: it
+        # ends once the order is final, or after ORDER_EVENTS_MAX_AGE, when
+        # EventSource reconnects with a fresh document
+        deadline = time.monotonic() + ORDER_EVENTS_MAX_AGE
+        document = body
+        try:
+            while True:
+                if document is not None:
+                    yield b'data: ' + document + b'\n\n'
+                    if json.loads(document).get('status') in FINAL_STATUSES:
+                        return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    document = events.get(timeout=min(ORDER_EVENTS_HEARTBEAT, remaining))
+                except queue.Empty:
+                    document = None
+                    # Keeps proxies from closing an idle stream
+                    yield b': keep-alive\n\n'
+        finally:
+            order_events.unsubscribe(order_number, events)
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
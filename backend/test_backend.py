@@ -0,0 +1,1017 @@
+import json
+import math
+import queue
+import socket
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from aiosmtpd.controller import Controller
+import psycopg2
+from flask import Flask
+from psycopg2 import extensions
+
+# Run from backend/:  python -m pytest -q test_backend.py
+from utils.delivery_metrics import bucket_bounds, histogram_percentile
+from utils.dispatch import notify_dashers
+from utils.email import SMTPSession, deliver_emails
+from utils.email_queue import STALE_LOCK_SECONDS, EmailQueueWorker
+from utils.helpers import MAX_SEQUENCE, ORDER_EPOCH_MS, OrderNumberGenerator
+from utils.json_stream import ResultsStreamParser
+from utils.llm_client import (
+    CircuitBreaker, CircuitOpenError, LLMBusyError, LLMClient, LLMTimeoutError,
+    LLMUnavailableError
+)
+from utils.menu_cache import MenuCache
+from utils.menu_context import is_known_location
+from utils.menu_search import MenuIndex, answer_menu_query, fallback_menu_query, tokenize
+from routes.order_routes import order_bp
+from utils import database
+from utils.database import ConnectionPool, PoolTimeoutError, get_pool
+from utils.order_states import (
+    CANCELLED, CONFIRMED, DELIVERED, PENDING, OrderNotFoundError, TransitionConflictError,
+    TransitionError, transition
+)
+from utils.pagination import decode_cursor, encode_cursor, paginate_orders, parse_datetime
+from utils.scrape_jobs import ScrapeJobManager, cron_matches, parse_cron
+from utils.shared_stream import StreamCoalescer
+from utils.ttl_cache import TTLCache
+
+
+# ====================================================================
+# TEST SUITE 1: Local menu search
+# ====================================================================
+
+MENU = [
+    {'item_name': 'Grilled Chicken', 'category': 'Grill', 'location': 'Worcester Dining Commons', 'tags': ['Halal']},
+    {'item_name': 'Veggie Burger', 'category': 'Grill', 'location': 'Worcester Dining Commons', 'tags': ['Vegetarian']},
+    {'item_name': 'Tofu Stir Fry', 'category': 'Wok', 'location': 'Worcester Dining Commons', 'tags': ['Plant Based']},
+    {'item_name': 'Peanut Noodles', 'category': 'Wok', 'location': 'Worcester Dining Commons', 'tags': ['Plant Based']},
+]
+
+
+class MenuSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = MenuIndex(MENU)
+
+    def names(self, response):
+        return sorted(result['name'] for result in response['results'])
+
+    def test_trailing_negation_is_not_understood(self):
+        """A query ending in a negation has nothing to exclude and goes to the LLM"""
+        self.assertIsNone(self.index.parse('vegan no'))
+        self.assertIsNone(answer_menu_query('anything without', self.index))
+
+    def test_trailing_negation_is_skipped_when_lenient(self):
+        response = fallback_menu_query('vegan without', self.index)
+        self.assertEqual(self.names(response), ['Peanut Noodles', 'Tofu Stir Fry'])
+
+    def test_exclusion_by_ingredient_family(self):
+        response = answer_menu_query('vegan no nuts', self.index)
+        self.assertEqual(self.names(response), ['Tofu Stir Fry'])
+
+    def test_or_unites_tag_groups(self):
+        response = answer_menu_query('vegetarian or vegan', self.index)
+        self.assertEqual(self.names(response), ['Peanut Noodles', 'Tofu Stir Fry', 'Veggie Burger'])
+
+    def test_rationale_is_not_repeated(self):
+        response = answer_menu_query('vegetarian or vegan', self.index)
+        tofu = next(r for r in response['results'] if r['name'] == 'Tofu Stir Fry')
+        self.assertEqual(tofu['rationale'], 'Tagged Plant Based')
+
+    def test_apostrophes_do_not_split_words(self):
+        self.assertEqual(tokenize("what's vegetarian?"), ['what', 'vegetarian'])
+        self.assertEqual(tokenize('I’m vegetarian'), ['im', 'vegetarian'])
+
+    def test_contractions_are_stopwords(self):
+        index = MenuIndex(MENU + [{'item_name': "BUSH's Baked Beans", 'category': 'Sides',
+                                   'location': 'Worcester Dining Commons', 'tags': []}])
+        for query in ("what's vegetarian?", "I'm vegetarian", 'what’s vegetarian'):
+            self.assertEqual(self.names(answer_menu_query(query, index)),
+                             ['Peanut Noodles', 'Tofu Stir Fry', 'Veggie Burger'], query)
+
+    def test_tag_groups_intersect_without_or(self):
+        response = answer_menu_query('halal vegetarian', self.index)
+        self.assertEqual(response['results'], [])
+
+
+# ====================================================================
+# TEST SUITE 2: LLM client limits against a local fake model
+# ====================================================================
+
+def fake_model(latency=0.0, fail=False, text='{"results": []}'):
+    def generate(prompt):
+        time.sleep(latency)
+        if fail:
+            raise RuntimeError('upstream 503')
+        return text
+    return generate
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        self.assertFalse(breaker.would_allow())
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_single_trial_after_reset_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.would_allow())
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertFalse(breaker.allow())  # only one trial at a time
+
+    def test_trial_verdict(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_released_trial_lets_the_next_caller_try(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.release_trial()
+        self.assertTrue(breaker.allow())
+
+
+class LLMClientTest(unittest.TestCase):
+
+    def client(self, generate, generate_stream=None, **kwargs):
+        options = {'max_concurrency': 2, 'timeout': 0.2, 'queue_timeout': 0.05,
+                   'breaker': CircuitBreaker(failure_threshold=2, reset_timeout=60)}
+        options.update(kwargs)
+        return LLMClient(generate, generate_stream, **options)
+
+    def test_complete_returns_the_model_text(self):
+        client = self.client(fake_model(text='hello'))
+        self.assertEqual(client.complete('prompt'), 'hello')
+        self.assertEqual(client.stats()['calls'], 1)
+
+    def test_deadline(self):
+        client = self.client(fake_model(latency=0.5))
+        with self.assertRaises(LLMTimeoutError):
+            client.complete('prompt')
+
+    def test_failures_open_the_circuit(self):
+        client = self.client(fake_model(fail=True))
+        for _ in range(2):
+            with self.assertRaises(LLMUnavailableError):
+                client.complete('prompt')
+        with self.assertRaises(CircuitOpenError):
+            client.complete('prompt')
+        self.assertEqual(client.stats()['calls'], 2)
+
+    def test_busy_when_every_slot_is_taken(self):
+        client = self.client(fake_model(latency=0.3), timeout=1.0)
+        threads = [threading.Thread(target=client.complete, args=('prompt',)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        with self.assertRaises(LLMBusyError):
+            client.complete('prompt')
+        for thread in threads:
+            thread.join()
+
+    def test_queued_callers_do_not_reach_an_opened_circuit(self):
+        """Calls waiting for a slot when the circuit opens are turned away, not sent upstream"""
+        upstream = []
+
+        def generate(prompt):
+            upstream.append(prompt)
+            time.sleep(0.1)
+            raise RuntimeError('upstream 503')
+
+        client = self.client(generate, queue_timeout=1.0,
+                             breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+        outcomes = []
+        lock = threading.Lock()
+
+        def call():
+            try:
+                client.complete('prompt')
+            except LLMUnavailableError as e:
+                with lock:
+                    outcomes.append(type(e).__name__)
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(upstream), 2)
+        self.assertEqual(outcomes.count('CircuitOpenError'), 4)
+
+    def test_stream_yields_chunks(self):
+        client = self.client(fake_model(), generate_stream=lambda prompt: iter(['{"res', 'ults": []}']))
+        self.assertEqual(list(client.stream('prompt')), ['{"res', 'ults": []}'])
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_stream_deadline_applies_per_chunk(self):
+        def slow_stream(prompt):
+            yield 'first'
+            time.sleep(0.5)
+            yield 'second'
+
+        client = self.client(fake_model(), generate_stream=slow_stream)
+        chunks = []
+        with self.assertRaises(LLMTimeoutError):
+            for chunk in client.stream('prompt'):
+                chunks.append(chunk)
+        self.assertEqual(chunks, ['first'])
+
+
+# ====================================================================
+# TEST SUITE 3: Shared model streams
+# ====================================================================
+
+class StreamCoalescerTest(unittest.TestCase):
+
+    def test_concurrent_readers_share_one_run(self):
+        runs = []
+        release = threading.Event()
+
+        def produce():
+            runs.append(1)
+            yield 'first'
+            release.wait(1)
+            yield 'second'
+
+        streams = StreamCoalescer()
+        leader = streams.join('key', produce)
+        self.assertEqual(next(leader), 'first')
+        follower = streams.join('key', produce)  # joins mid-stream
+        release.set()
+        self.assertEqual(list(leader), ['second'])
+        self.assertEqual(list(follower), ['first', 'second'])
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(streams.stats()['coalesced'], 1)
+
+    def test_finished_stream_is_not_joined(self):
+        streams = StreamCoalescer()
+        self.assertEqual(list(streams.join('key', lambda: iter(['a']))), ['a'])
+        self.assertEqual(list(streams.join('key', lambda: iter(['b']))), ['b'])
+
+    def test_failing_producer_ends_the_stream(self):
+        def produce():
+            yield 'partial'
+            raise RuntimeError('boom')
+
+        self.assertEqual(list(StreamCoalescer().join('key', produce)), ['partial'])
+
+
+# ====================================================================
+# TEST SUITE 4: TTL cache
+# ====================================================================
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_concurrent_misses_share_one_computation(self):
+        cache = TTLCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['coalesced'], 4)
+        self.assertEqual(cache.get_or_compute('key', compute), 'value')
+        self.assertEqual(len(calls), 1)
+
+    def test_waiters_see_the_error(self):
+        cache = TTLCache()
+        started = threading.Event()
+
+        def compute():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError('upstream failed')
+
+        errors = []
+
+        def call():
+            try:
+                cache.get_or_compute('key', compute)
+            except RuntimeError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(1)
+        call()
+        leader.join()
+        self.assertEqual(len(errors), 2)
+        self.assertIsNone(cache.get('key'))
+
+    def test_should_cache_rejects_values(self):
+        cache = TTLCache()
+        cache.get_or_compute('key', lambda: {'error': 'bad'}, should_cache=lambda r: 'error' not in r)
+        self.assertIsNone(cache.get('key'))
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=0.05)
+        cache.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_or_compute('key', lambda: 'fresh'), 'fresh')
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+
+# ====================================================================
+# TEST SUITE 5: Incremental results parsing
+# ====================================================================
+
+RESPONSE = json.dumps({'results': [
+    {'name': 'Veggie Burger', 'station': 'Grill', 'rationale': 'Tagged {Vegetarian}'},
+    {'name': 'Tofu "Stir" Fry', 'station': 'Wok', 'tags': ['Plant Based']},
+]})
+
+
+class ResultsStreamParserTest(unittest.TestCase):
+
+    def feed_in_chunks(self, text, size):
+        parser = ResultsStreamParser()
+        items = []
+        for start in range(0, len(text), size):
+            items.extend(parser.feed(text[start:start + size]))
+        return parser, items
+
+    def test_any_chunking_gives_the_same_items(self):
+        expected = json.loads(RESPONSE)['results']
+        for size in (1, 2, 7, len(RESPONSE)):
+            parser, items = self.feed_in_chunks(RESPONSE, size)
+            self.assertEqual(items, expected)
+            self.assertTrue(parser.done)
+
+    def test_items_arrive_as_soon_as_they_close(self):
+        parser = ResultsStreamParser()
+        self.assertEqual(parser.feed('{"results": [{"name": "A"}, {"na'), [{'name': 'A'}])
+        self.assertEqual(parser.feed('me": "B"}'), [{'name': 'B'}])
+        self.assertFalse(parser.done)
+        self.assertEqual(parser.feed(']}'), [])
+        self.assertTrue(parser.done)
+
+    def test_code_fence_and_prose_are_skipped(self):
+        parser, items = self.feed_in_chunks('Here you go:\n```json\n' + RESPONSE + '\n```', 5)
+        self.assertEqual([item['name'] for item in items], ['Veggie Burger', 'Tofu "Stir" Fry'])
+
+    def test_truncated_response_keeps_completed_items(self):
+        parser, items = self.feed_in_chunks(RESPONSE[:RESPONSE.index('Tofu')], 3)
+        self.assertEqual([item['name'] for item in items], ['Veggie Burger'])
+        self.assertFalse(parser.done)
+
+    def test_empty_results(self):
+        parser, items = self.feed_in_chunks('{"results": []}', 4)
+        self.assertEqual(items, [])
+        self.assertTrue(parser.done)
+
+
+# ====================================================================
+# TEST SUITE 6: Keyset pagination cursors
+# ====================================================================
+
+class CursorTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for created_at in (datetime(2025, 3, 1, 12, 30, 15, 123456),
+                           datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc)):
+            cursor = encode_cursor({'created_at': created_at, 'id': 42})
+            self.assertNotIn('=', cursor)
+            self.assertEqual(decode_cursor(cursor), (created_at, 42))
+
+    def test_malformed_cursor(self):
+        for cursor in ('', 'not a cursor', encode_cursor({'created_at': datetime(2025, 1, 1), 'id': 1})[:-3]):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_next_cursor_points_at_the_last_row(self):
+        rows = [{'created_at': datetime(2025, 1, 1, hour), 'id': hour} for hour in (3, 2, 1)]
+        cur = MagicMock()
+        cur.fetchall.return_value = rows
+        page, next_cursor = paginate_orders(cur, 'SELECT * FROM orders', [], [], {'limit': '2'})
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(decode_cursor(next_cursor), (rows[1]['created_at'], 2))
+
+        cur.fetchall.return_value = rows[2:]
+        page, next_cursor = paginate_orders(cur, 'SELECT * FROM orders', [], [], {'limit': '2', 'cursor': next_cursor})
+        sql, params = cur.execute.call_args.args
+        self.assertIn('(created_at, id) < (%s, %s)', sql)
+        self.assertEqual(params, [rows[1]['created_at'], 2, 3])
+        self.assertIsNone(next_cursor)
+
+
+# ====================================================================
+# TEST SUITE 7: Order status transitions
+# ====================================================================
+
+class TransitionTest(unittest.TestCase):
+
+    def cursor(self, *rows):
+        cur = MagicMock()
+        cur.fetchone.side_effect = list(rows)
+        return cur
+
+    def test_legal_transition_is_one_statement(self):
+        order = {'order_number': 'ORD-1', 'status': CONFIRMED}
+        cur = self.cursor(order)
+        self.assertEqual(transition(cur, 'ORD-1', CONFIRMED), order)
+        cur.execute.assert_called_once()
+        sql, params = cur.execute.call_args.args
+        self.assertIn('status = ANY(%s)', sql)
+        self.assertIn('accepted_at = CURRENT_TIMESTAMP', sql)
+        self.assertEqual(params, [CONFIRMED, 'ORD-1', [PENDING]])
+
+    def test_order_in_another_status_conflicts(self):
+        cur = self.cursor(None, {'status': DELIVERED})
+        with self.assertRaises(TransitionConflictError) as raised:
+            transition(cur, 'ORD-1', CANCELLED)
+        self.assertEqual(raised.exception.current_status, DELIVERED)
+        self.assertEqual(raised.exception.status_code, 409)
+
+    def test_missing_order(self):
+        with self.assertRaises(OrderNotFoundError):
+            transition(self.cursor(None, None), 'ORD-1', CANCELLED)
+
+    def test_failed_condition_reads_as_not_found(self):
+        cur = self.cursor(None, {'status': PENDING})
+        with self.assertRaises(OrderNotFoundError) as raised:
+            transition(cur, 'ORD-1', CONFIRMED, conditions=[('dasher_email = %s', ('a@b.c',))],
+                       not_found='Not your order')
+        self.assertEqual(str(raised.exception), 'Not your order')
+
+    def test_another_dashers_order_reads_as_not_found(self):
+        # The fallback read applies the conditions too, so it finds no order
+        cur = self.cursor(None, None)
+        with self.assertRaises(OrderNotFoundError):
+            transition(cur, 'ORD-1', DELIVERED, conditions=[('dasher_email = %s', ('a@b.c',))])
+        sql, params = cur.execute.call_args.args
+        self.assertIn('dasher_email = %s', sql)
+        self.assertEqual(params, ['ORD-1', 'a@b.c'])
+
+    def test_unknown_status_is_rejected_before_querying(self):
+        cur = self.cursor()
+        with self.assertRaises(TransitionError):
+            transition(cur, 'ORD-1', 'shipped')
+        cur.execute.assert_not_called()
+
+
+# ====================================================================
+# TEST SUITE 8: Order numbers
+# ====================================================================
+
+class OrderNumberGeneratorTest(unittest.TestCase):
+
+    NOW = 1_800_000_000.0
+
+    def test_format(self):
+        number = OrderNumberGenerator(node_id=1, clock=lambda: self.NOW).next()
+        self.assertRegex(number, r'^ORD-[0-9A-HJKMNP-TV-Z]{13}$')
+
+    def test_unique_and_increasing_on_a_frozen_clock(self):
+        generator = OrderNumberGenerator(node_id=1, clock=lambda: self.NOW)
+        numbers = [generator.next() for _ in range(3 * (MAX_SEQUENCE + 1))]
+        self.assertEqual(numbers, sorted(set(numbers)))
+
+    def test_clock_stepping_back(self):
+        times = iter([self.NOW, self.NOW - 5, self.NOW - 5])
+        generator = OrderNumberGenerator(node_id=1, clock=lambda: next(times))
+        ids = [generator.next_id() for _ in range(3)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_nodes_never_collide(self):
+        first = OrderNumberGenerator(node_id=1, clock=lambda: self.NOW)
+        second = OrderNumberGenerator(node_id=2, clock=lambda: self.NOW)
+        numbers = [generator.next() for _ in range(100) for generator in (first, second)]
+        self.assertEqual(len(set(numbers)), 200)
+
+    def test_id_layout(self):
+        generator = OrderNumberGenerator(node_id=5, clock=lambda: self.NOW)
+        generator.next_id()
+        ms = int(self.NOW * 1000) - ORDER_EPOCH_MS
+        self.assertEqual(generator.next_id(), (ms << 22) | (5 << 12) | 1)
+
+    def test_node_id_is_leased_once(self):
+        leases = []
+        generator = OrderNumberGenerator(lease_node_id=lambda: leases.append(1) or 7, clock=lambda: self.NOW)
+        generator.next()
+        generator.next()
+        self.assertEqual((generator.node_id, len(leases)), (7, 1))
+
+    def test_node_id_range(self):
+        with self.assertRaises(ValueError):
+            OrderNumberGenerator(node_id=1024)
+
+
+# ====================================================================
+# TEST SUITE 9: Scrape schedule and jobs
+# ====================================================================
+
+class CronTest(unittest.TestCase):
+
+    def test_fields(self):
+        minutes, hours, days, months, weekdays = parse_cron('*/15 6-8 1,15 * 1-5')
+        self.assertEqual(minutes, {0, 15, 30, 45})
+        self.assertEqual(hours, {6, 7, 8})
+        self.assertEqual(days, {1, 15})
+        self.assertEqual(months, set(range(1, 13)))
+        self.assertEqual(weekdays, {1, 2, 3, 4, 5})
+
+    def test_step_from_a_single_value_runs_to_the_field_end(self):
+        self.assertEqual(parse_cron('5/10 * * * *')[0], {5, 15, 25, 35, 45, 55})
+        self.assertEqual(parse_cron('0 20/2 * * *')[1], {20, 22})
+
+    def test_weekday_seven_is_sunday(self):
+        self.assertEqual(parse_cron('0 0 * * 7')[4], {0})
+        self.assertEqual(parse_cron('0 0 * * 5-7')[4], {0, 5, 6})
+        self.assertTrue(cron_matches(parse_cron('30 9 * * 7'), datetime(2025, 3, 2, 9, 30)))  # a Sunday
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '0 0 * * 8', '0 5-3 * * *'):
+            with self.assertRaises(ValueError):
+                parse_cron(expression)
+
+
+def job_row(job_id, status):
+    return {'id': job_id, 'status': status, 'trigger': 'manual', 'force': False,
+            'queued_at': datetime(2025, 3, 3, 9, 0), 'started_at': None, 'finished_at': None,
+            'result': None, 'error': None}
+
+
+class ScrapeJobManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cur = MagicMock()
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = self.cur
+        patcher = patch('utils.scrape_jobs.get_db_connection')
+        patcher.start().return_value.__enter__.return_value = conn
+        self.addCleanup(patcher.stop)
+        self.manager = ScrapeJobManager(command=['true'], cwd='.')
+        self.manager._ensure_runner = lambda: None  # no worker here
+
+    def statements(self):
+        return [' '.join(c.args[0].split()) for c in self.cur.execute.call_args_list]
+
+    def test_new_job_is_queued_here(self):
+        self.cur.fetchone.return_value = job_row(4, 'queued')
+        job, created = self.manager.submit()
+        self.assertTrue(created)
+        self.assertEqual(self.manager._pending.get_nowait(), 4)
+        self.assertTrue(self.statements()[1].startswith('INSERT INTO scrape_jobs'))
+
+    def test_active_job_in_any_process_is_returned(self):
+        self.cur.fetchone.side_effect = [None, job_row(3, 'running')]
+        job, created = self.manager.submit()
+        self.assertFalse(created)
+        self.assertEqual(job.to_dict()['id'], 3)
+        self.assertTrue(self.manager._pending.empty())
+
+    def test_retries_when_the_blocking_job_just_finished(self):
+        self.cur.fetchone.side_effect = [None, None, job_row(5, 'queued')]
+        job, created = self.manager.submit()
+        self.assertTrue(created)
+        self.assertEqual(job.id, 5)
+
+    def test_scheduled_ticks_are_keyed_by_time(self):
+        self.cur.fetchone.side_effect = [None, job_row(2, 'done')]
+        tick = datetime(2025, 3, 3, 9, 30)
+        job, created = self.manager.submit(trigger='schedule', scheduled_for=tick)
+        self.assertFalse(created)
+        self.assertEqual(self.cur.execute.call_args_list[1].args[1], ('schedule', False, tick))
+
+
+# ====================================================================
+# TEST SUITE 10: Dasher dispatch waves
+# ====================================================================
+
+ORDER = {'id': 7, 'order_number': 'ORD-7', 'pickup_location': 'Worcester Dining Commons',
+         'delivery_address': 'Southwest', 'total_amount': 12.5}
+
+
+def dasher(email):
+    return {'email': email, 'name': email, 'open_orders': 0, 'last_pickup': None, 'notified': 0, 'accepted': 0}
+
+
+class NotifyDashersTest(unittest.TestCase):
+
+    def cursor(self, candidates):
+        cur = MagicMock()
+        cur.fetchall.return_value = candidates
+        # Enough of a connection for execute_values to build its statement
+        cur.connection.encoding = 'UTF8'
+        cur.mogrify.return_value = b'(...)'
+        return cur
+
+    def schedule(self, cur):
+        """(dispatch_wave, escalate) from the orders UPDATE"""
+        wave, escalate, _, _ = cur.execute.call_args.args[1]
+        return wave, escalate
+
+    def test_no_eligible_dasher_retries_the_same_wave(self):
+        cur = self.cursor([])
+        self.assertEqual(notify_dashers(cur, ORDER, wave=0), [])
+        self.assertEqual(self.schedule(cur), (-1, True))
+
+    def test_next_wave_is_scheduled_while_dashers_are_left(self):
+        cur = self.cursor([dasher(f'd{i}@umass.edu') for i in range(5)])
+        self.assertEqual(len(notify_dashers(cur, ORDER, wave=0)), 3)
+        self.assertEqual(self.schedule(cur), (0, True))
+
+    def test_no_retry_once_everyone_was_asked(self):
+        cur = self.cursor([dasher('d1@umass.edu')])
+        self.assertEqual(len(notify_dashers(cur, ORDER, wave=1)), 1)
+        self.assertEqual(self.schedule(cur), (1, False))
+
+
+# ====================================================================
+# TEST SUITE 11: Menu cache keys
+# ====================================================================
+
+class KnownLocationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = MenuCache(max_entries=4)
+        self.cache._ensure_listener = lambda: None  # no database here
+        self.cache.set_generation(1)
+        self.fetches = []
+
+        def fetch_locations():
+            self.fetches.append(1)
+            return ['Worcester Dining Commons']
+
+        for target, value in [('utils.menu_context.menu_cache', self.cache),
+                              ('utils.menu_context.fetch_locations', fetch_locations)]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_known_halls_and_all_halls(self):
+        self.assertTrue(is_known_location('Worcester Dining Commons'))
+        self.assertTrue(is_known_location(None))
+
+    def test_unknown_locations_do_not_fill_the_cache(self):
+        for i in range(10):
+            self.assertFalse(is_known_location(f'Hall {i}'))
+        self.assertEqual(self.cache.stats()['entries'], 1)
+        self.assertEqual(len(self.fetches), 1)
+
+    def test_new_menu_generation_reloads_the_halls(self):
+        is_known_location('Worcester Dining Commons')
+        self.cache.set_generation(2)
+        is_known_location('Worcester Dining Commons')
+        self.assertEqual(len(self.fetches), 2)
+
+
+
+# ====================================================================
+# TEST SUITE 12: Order tracking streams
+# ====================================================================
+
+def order_document(status):
+    return json.dumps({'order_number': 'ORD-7', 'status': status}).encode()
+
+
+class OrderEventsStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.register_blueprint(order_bp, url_prefix='/api')
+        self.client = app.test_client()
+        self.hub = MagicMock()
+        self.events = self.hub.subscribe.return_value = MagicMock()
+        for target, value in [('routes.order_routes.order_events', self.hub),
+                              ('routes.order_routes.ORDER_EVENTS_HEARTBEAT', 0.01)]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, current):
+        with patch('routes.order_routes.get_order_json', return_value=current):
+            return self.client.get('/api/orders/ORD-7/events').get_data()
+
+    def test_ends_once_the_order_is_final(self):
+        self.events.get.side_effect = [order_document('picked_up'), order_document('delivered')]
+        body = self.stream(order_document('confirmed'))
+        self.assertEqual(body.count(b'data: '), 3)
+        self.assertIn(b'"delivered"', body.split(b'\n\n')[-2])
+        self.hub.unsubscribe.assert_called_once_with('ORD-7', self.events)
+
+    def test_final_order_sends_one_document(self):
+        body = self.stream(order_document('cancelled'))
+        self.assertEqual(body.count(b'data: '), 1)
+        self.events.get.assert_not_called()
+
+    def test_ends_after_the_maximum_age(self):
+        self.events.get.side_effect = queue.Empty
+        with patch('routes.order_routes.ORDER_EVENTS_MAX_AGE', 0.05):
+            body = self.stream(order_document('pending'))
+        self.assertEqual(body.count(b'data: '), 1)
+        self.assertIn(b': keep-alive', body)
+
+
+
+# ====================================================================
+# TEST SUITE 13: Email outbox
+# ====================================================================
+
+def outbox_row(message_id, attempts=1):
+    return {'id': message_id, 'to_email': f'student{message_id}@umass.edu', 'subject': 'Order update',
+            'body': '<p>On its way</p>', 'attempts': attempts}
+
+
+class EmailQueueWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cur = MagicMock()
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = self.cur
+        patcher = patch('utils.email_queue.get_db_connection')
+        patcher.start().return_value.__enter__.return_value = conn
+        self.addCleanup(patcher.stop)
+        self.sent = []
+        self.errors = {}
+        self.worker = EmailQueueWorker(send_many=self.send_many, batch_size=10, max_attempts=3, retry_delay=30.0)
+
+    def send_many(self, messages):
+        self.sent.append(messages)
+        return [self.errors.get(to_email) for to_email, _, _ in messages]
+
+    def updates(self):
+        """(sql, params) of the statements after the claim"""
+        return [(' '.join(c.args[0].split()), c.args[1]) for c in self.cur.execute.call_args_list[1:]]
+
+    def test_empty_queue_sends_nothing(self):
+        self.cur.fetchall.return_value = []
+        self.assertEqual(self.worker.run_once(), 0)
+        self.assertEqual(self.sent, [])
+
+    def test_sent_and_failed_messages_are_marked(self):
+        self.cur.fetchall.return_value = [outbox_row(1), outbox_row(2), outbox_row(3)]
+        self.errors['student2@umass.edu'] = OSError('mailbox full')
+        self.assertEqual(self.worker.run_once(), 3)
+        self.assertEqual(len(self.sent), 1)  # one batch, one session
+        (failed_sql, failed), (sent_sql, sent) = self.updates()
+        self.assertIn("status = 'sent'", sent_sql)
+        self.assertEqual(sent, ([1, 3],))
+        self.assertEqual(failed, ('pending', 'mailbox full', 30.0, 2))
+
+    def test_retries_back_off_exponentially(self):
+        self.cur.fetchall.return_value = [outbox_row(1, attempts=2)]
+        self.errors['student1@umass.edu'] = OSError('timed out')
+        self.worker.run_once()
+        self.assertEqual(self.updates()[0][1], ('pending', 'timed out', 60.0, 1))
+
+    def test_gives_up_after_max_attempts(self):
+        self.cur.fetchall.return_value = [outbox_row(1, attempts=3)]
+        self.errors['student1@umass.edu'] = OSError('rejected')
+        self.worker.run_once()
+        self.assertEqual(self.updates()[0][1][0], 'failed')
+
+    def test_stale_sending_rows_are_reclaimed(self):
+        self.cur.fetchall.return_value = [outbox_row(4, attempts=2)]
+        self.worker.run_once()
+        claim_sql = ' '.join(self.cur.execute.call_args_list[0].args[0].split())
+        self.assertIn("(status = 'sending' AND locked_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')", claim_sql)
+        self.assertIn('FOR UPDATE SKIP LOCKED', claim_sql)
+        self.assertEqual(self.cur.execute.call_args_list[0].args[1], (STALE_LOCK_SECONDS, 10))
+        self.assertEqual(self.updates()[0][1], ([4],))
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps accepted messages and refuses one recipient"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == 'nobody@umass.edu':
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return '250 Message accepted'
+
+
+class DeliverEmailsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        self.session = SMTPSession(host='127.0.0.1', port=port, use_tls=False, user=None, password=None, timeout=5)
+        self.addCleanup(self.session.close)
+
+    def test_batch_goes_out_over_one_session(self):
+        results = deliver_emails([
+            ('a@umass.edu', 'Order confirmed', '<p>1</p>'),
+            ('nobody@umass.edu', 'Order confirmed', '<p>2</p>'),
+            ('b@umass.edu', 'Order confirmed', '<p>3</p>'),
+        ], session=self.session)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], Exception)
+        self.assertIsNone(results[2])
+        self.assertEqual([rcpt for rcpt, _ in self.handler.messages], [['a@umass.edu'], ['b@umass.edu']])
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertIn(b'Subject: Order confirmed', self.handler.messages[0][1])
+
+
+
+# ====================================================================
+# TEST SUITE 14: Connection pool
+# ====================================================================
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool"""
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.autocommit = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        cur = MagicMock()
+        if self.broken:
+            cur.__enter__.return_value.execute.side_effect = psycopg2.OperationalError('server closed the connection')
+        return cur
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.opened = []
+        self.refuse = False
+
+    def connect(self):
+        if self.refuse:
+            raise psycopg2.OperationalError('could not connect to server')
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1)
+        pool.getconn()
+        started = time.monotonic()
+        with self.assertRaises(PoolTimeoutError):
+            pool.getconn(timeout=0.05)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_waiting_borrower_gets_the_returned_connection(self):
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1)
+        conn = pool.getconn()
+        threading.Timer(0.05, pool.putconn, args=(conn,)).start()
+        self.assertIs(pool.getconn(timeout=1), conn)
+
+    def test_closed_connection_is_replaced(self):
+        pool = ConnectionPool(self.connect, min_size=1, max_size=1)
+        conn = pool.getconn()
+        conn.close()
+        pool.putconn(conn)
+        replacement = pool.getconn(timeout=0)
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_idle_connection_failing_its_ping_is_replaced(self):
+        pool = ConnectionPool(self.connect, min_size=1, max_size=1, check_idle=0)
+        self.opened[0].broken = True
+        conn = pool.getconn(timeout=0)
+        self.assertIs(conn, self.opened[1])
+        self.assertTrue(self.opened[0].closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_slot_is_released_when_connect_fails(self):
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1)
+        self.refuse = True
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.getconn(timeout=0)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.refuse = False
+        self.assertIsNotNone(pool.getconn(timeout=0))
+
+    def test_returned_connection_is_rolled_back(self):
+        pool = ConnectionPool(self.connect, min_size=0, max_size=1)
+        conn = pool.getconn()
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_pool_is_recreated_after_fork(self):
+        for name in ('_pool', '_pool_pid'):
+            self.addCleanup(setattr, database, name, getattr(database, name))
+        database._pool = None
+        with patch('utils.database.create_db_connection', self.connect), \
+             patch('utils.database.os.getpid', return_value=100) as getpid:
+            parent = get_pool()
+            self.assertIs(get_pool(), parent)
+            getpid.return_value = 101
+            child = get_pool()
+        self.assertIsNot(child, parent)
+        self.assertIs(database._pool, child)
+
+
+
+# ====================================================================
+# TEST SUITE 15: Delivery time histograms
+# ====================================================================
+
+class DeliveryHistogramTest(unittest.TestCase):
+
+    def test_buckets_agree_with_the_trigger(self):
+        # record_order_transition() files a time under floor(ln(1 + seconds) * 10)
+        for seconds in (0, 0.5, 1, 59.9, 60, 300, 1799, 3600, 86400):
+            bucket = math.floor(math.log(1 + seconds) * 10)
+            low, high = bucket_bounds(bucket)
+            self.assertLessEqual(low, seconds)
+            self.assertLess(seconds, high)
+
+    def test_percentiles_of_a_known_histogram(self):
+        histogram = [(0, 50), (10, 50)]
+        self.assertAlmostEqual(histogram_percentile(histogram, 50), bucket_bounds(0)[1])
+        low, high = bucket_bounds(10)
+        self.assertAlmostEqual(histogram_percentile(histogram, 75), (low + high) / 2)
+        self.assertAlmostEqual(histogram_percentile(histogram, 100), high)
+
+    def test_percentile_of_a_single_bucket_stays_inside_it(self):
+        low, high = bucket_bounds(40)
+        for p in (1, 50, 99):
+            self.assertTrue(low <= histogram_percentile([(40, 7)], p) <= high)
+
+    def test_empty_histogram_has_no_percentiles(self):
+        self.assertIsNone(histogram_percentile([], 50))
+        self.assertIsNone(histogram_percentile([(3, 0)], 50))
+
+    def test_request_datetimes(self):
+        self.assertEqual(parse_datetime('2025-03-03T09:30', 'since'), datetime(2025, 3, 3, 9, 30))
+        with self.assertRaisesRegex(ValueError, 'Invalid until'):
+            parse_datetime('yesterday', 'until')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+class AssignmentPolicy:
+    """
+    Chooses which dashers hear about a new order.
+
+    Candidates are dicts with the dasher's `email`, `open_orders` (confirmed
+    or picked up, not yet delivered), `last_pickup` (pickup location of their
+    most recent order, the best hint of where they are) and recent `notified`
+    and `accepted` counts. They are scored as
+
+        proximity_weight * (last_pickup == pickup_location)
+      + acceptance_weight * acceptance rate
+      - load_weight * open_orders
+
+    where the acceptance rate is smoothed towards 1/2 so new dashers are not
+    ranked last. Wave 0 notifies the best `initial_k`; each escalation wave
+    notifies `escalation_factor` times as many as the one before, drawn from
+    those not yet notified.
+    """
+
+    def __init__(self, initial_k=3, escalation_factor=2, load_weight=1.0,
+                 proximity_weight=0.5, acceptance_weight=1.0):
+        if initial_k < 1 or escalation_factor < 1:
+            raise ValueError('initial_k and escalation_factor must be at least 1')
+        self.initial_k = initial_k
+        self.escalation_factor = escalation_factor
+        self.load_weight = load_weight
+        self.proximity_weight = proximity_weight
+        self.acceptance_weight = acceptance_weight
+
+    def wave_size(self, wave):
+        return self.initial_k * self.escalation_factor ** wave
+
+    def score(self, candidate, pickup_location):
+        acceptance_rate = (candidate['accepted'] + 1) / (candidate['notified'] + 2)
+        nearby = 1.0 if candidate['last_pickup'] == pickup_location else 0.0
+        return (self.proximity_weight * nearby
+                + self.acceptance_weight * acceptance_rate
+                - self.load_weight * candidate['open_orders'])
+
+    def choose(self, candidates, pickup_location, wave=0):
+        """
+        The candidates to notify in this wave, best first. Ties go to the
+        dasher notified least often lately, so notifications spread out.
+        """
+        ranked = sorted(
+            candidates,
+            key=lambda c: (-self.score(c, pickup_location), c['notified'], c['email'])
+        )
+        return ranked[:self.wave_size(wave)]
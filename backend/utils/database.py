@@ -1,14 +1,232 @@
+import os
+import select
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
-from config import DB_HOST, DB_NAME, DB_USER, DB_PASSWORD
+from psycopg2.pool import PoolError
+from config import (
+    DB_HOST, DB_NAME, DB_USER, DB_PASSWORD,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_CHECK_IDLE
+)
 
-def get_db_connection():
-    """Create and return a database connection"""
-    conn = psycopg2.connect(
+
+class PoolTimeoutError(PoolError):
+    """Raised when no pooled connection became free before the checkout timeout"""
+
+
+def create_db_connection():
+    """Open a new, unpooled database connection"""
+    return psycopg2.connect(
         host=DB_HOST,
         database=DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD,
         cursor_factory=RealDictCursor
     )
-    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Connections are opened lazily up to max_size. Borrowers block for at most
+    `timeout` seconds when the pool is exhausted. A connection that has sat
+    idle for longer than `check_idle` seconds is pinged before it is handed out,
+    and broken connections are discarded and replaced transparently.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, check_idle=30.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._idle = []  # (connection, returned_at) pairs, most recently returned last
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(min_size):
+            conn = self._connect()
+            self._size += 1
+            self._idle.append((conn, time.monotonic()))
+
+    def getconn(self, timeout=None):
+        """Borrow a healthy connection, waiting up to `timeout` seconds for one"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            conn, returned_at = self._reserve(deadline)
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            if self._is_healthy(conn, returned_at):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn):
+        """Return a borrowed connection, rolling back any open transaction"""
+        try:
+            if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+
+        if conn.closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def stats(self):
+        """Return a snapshot of pool usage"""
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def _reserve(self, deadline):
+        # Hand out an idle connection or a slot to open a new one (None)
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError('Connection pool is closed')
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError('Timed out waiting for a database connection')
+                self._cond.wait(remaining)
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._release_slot()
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle:
+            return True
+        try:
+            # Ping outside a transaction so the check leaves no state behind
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.autocommit = False
+            return True
+        except psycopg2.Error:
+            return False
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use (and after a fork)"""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # Connections inherited from a parent process must not be reused
+                _pool = ConnectionPool(
+                    create_db_connection,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    check_idle=DB_POOL_CHECK_IDLE
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def close_pool():
+    """Close the process-wide pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def get_db_connection():
+    """Borrow a pooled database connection for the duration of a `with` block"""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def listen(channel, on_notify, on_connect=None, poll_interval=60.0, stopping=None):
+    """
+    LISTEN on a channel with a dedicated connection and call on_notify(payload)
+    for every notification until `stopping` (a threading.Event) is set.
+    on_connect runs after each (re)connect, since notifications sent while
+    disconnected are lost. Reconnects with exponential backoff on failure.
+    """
+    stopping = stopping or threading.Event()
+    backoff = 1
+    while not stopping.is_set():
+        conn = None
+        try:
+            conn = create_db_connection()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {channel}')
+            if on_connect:
+                on_connect()
+            backoff = 1
+            while not stopping.is_set():
+                if select.select([conn], [], [], poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    on_notify(conn.notifies.pop(0).payload)
+        except Exception as e:
+            print(f"Listener error on {channel}: {e}")
+            stopping.wait(backoff)
+            backoff = min(backoff * 2, 60)
+        finally:
+            if conn is not None:
+                conn.close()
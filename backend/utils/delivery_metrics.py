@@ -0,0 +1,93 @@
+import math
+
+from utils.pagination import parse_datetime
+
+METRICS = ['accept', 'pickup', 'deliver']
+PERCENTILES = [50, 90, 95, 99]
+
+# Must match the bucket width used by the record_order_transition() trigger
+BUCKETS_PER_UNIT = 10
+
+GROUPINGS = {
+    'hall': ['pickup_location'],
+    'hour': ['hour'],
+    'hall,hour': ['pickup_location', 'hour'],
+}
+
+
+def bucket_bounds(bucket):
+    """Range of seconds, [low, high), counted in a histogram bucket"""
+    return math.expm1(bucket / BUCKETS_PER_UNIT), math.expm1((bucket + 1) / BUCKETS_PER_UNIT)
+
+
+def histogram_percentile(histogram, p):
+    """
+    Estimate the p-th percentile from sorted (bucket, count) pairs,
+    interpolating within the bucket it falls in (about 10% resolution).
+    """
+    total = sum(count for _, count in histogram)
+    if not total:
+        return None
+    target = p / 100 * total
+    seen = 0
+    for bucket, count in histogram:
+        if seen + count >= target:
+            low, high = bucket_bounds(bucket)
+            return low + (high - low) * (target - seen) / count
+        seen += count
+    return bucket_bounds(histogram[-1][0])[1]
+
+
+def delivery_metrics(cur, args):
+    """
+    Time-to-accept, time-to-pickup and time-to-deliver, in seconds since the
+    order was placed, from the order_metrics histograms. Query args:
+    group_by (hall, hour or "hall,hour"; default hall), hall, since and until
+    (bounds on the hour the orders were placed).
+    """
+    group_by = args.get('group_by', 'hall')
+    if group_by not in GROUPINGS:
+        raise ValueError(f'group_by must be one of {list(GROUPINGS)}')
+    columns = GROUPINGS[group_by]
+
+    clauses, params = [], []
+    if args.get('hall'):
+        clauses.append('pickup_location = %s')
+        params.append(args['hall'])
+    if args.get('since'):
+        clauses.append('hour >= %s')
+        params.append(parse_datetime(args['since'], 'since'))
+    if args.get('until'):
+        clauses.append('hour < %s')
+        params.append(parse_datetime(args['until'], 'until'))
+
+    keys = ', '.join(columns)
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    cur.execute(f'''
+        SELECT {keys}, metric, bucket, SUM(count)::bigint AS count, SUM(total_seconds) AS total_seconds
+        FROM order_metrics{where}
+        GROUP BY {keys}, metric, bucket
+        ORDER BY {keys}, metric, bucket
+    ''', params)
+
+    groups = {}
+    for row in cur.fetchall():
+        key = tuple(row[column] for column in columns)
+        group = groups.setdefault(key, {metric: [] for metric in METRICS})
+        group[row['metric']].append(row)
+
+    results = []
+    for key, group in groups.items():
+        result = {'hall' if column == 'pickup_location' else column: value for column, value in zip(columns, key)}
+        for metric, rows in group.items():
+            histogram = [(row['bucket'], row['count']) for row in rows]
+            count = sum(row['count'] for row in rows)
+            summary = {
+                'count': count,
+                'mean': sum(row['total_seconds'] for row in rows) / count if count else None,
+            }
+            for p in PERCENTILES:
+                summary[f'p{p}'] = histogram_percentile(histogram, p)
+            result[metric] = summary
+        results.append(result)
+    return results
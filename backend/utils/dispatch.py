@@ -0,0 +1,233 @@
+import threading
+
+from psycopg2.extras import execute_values
+
+from config import (
+    DISPATCH_INITIAL_K, DISPATCH_ESCALATION_FACTOR, DISPATCH_ESCALATE_AFTER,
+    DISPATCH_POLL_INTERVAL, DISPATCH_STATS_DAYS
+)
+from utils.assignment import AssignmentPolicy
+from utils.database import get_db_connection
+from utils.email_queue import enqueue_emails
+from utils.order_states import (
+    CONFIRMED, OrderNotFoundError, TransitionConflictError, transition
+)
+from utils.pagination import paginate_orders
+
+
+class DasherNotFoundError(OrderNotFoundError):
+    """Raised when the claiming dasher does not exist"""
+
+
+class OrderAlreadyClaimedError(TransitionConflictError):
+    """Raised when the order is no longer pending, usually because another dasher won it"""
+
+
+assignment_policy = AssignmentPolicy(
+    initial_k=DISPATCH_INITIAL_K,
+    escalation_factor=DISPATCH_ESCALATION_FACTOR
+)
+
+AVAILABLE_ORDERS_SQL = '''
+    SELECT id, order_number, pickup_location, delivery_address, special_instructions,
+           total_amount, created_at
+    FROM orders
+'''
+
+# Active dashers not yet told about the order, with what the assignment
+# policy ranks them on, in one statement.
+CANDIDATES_SQL = '''
+    SELECT d.email, d.name,
+           COALESCE(open_orders.count, 0) AS open_orders,
+           last_order.pickup_location AS last_pickup,
+           COALESCE(history.notified, 0) AS notified,
+           COALESCE(history.accepted, 0) AS accepted
+    FROM dashers d
+    LEFT JOIN (
+        SELECT dasher_email, COUNT(*) AS count
+        FROM orders
+        WHERE status IN ('confirmed', 'picked_up')
+        GROUP BY dasher_email
+    ) open_orders ON open_orders.dasher_email = d.email
+    LEFT JOIN LATERAL (
+        SELECT pickup_location FROM orders
+        WHERE dasher_email = d.email
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    ) last_order ON true
+    LEFT JOIN (
+        SELECT dasher_email, COUNT(*) AS notified, COUNT(accepted_at) AS accepted
+        FROM dasher_notifications
+        WHERE notified_at > CURRENT_TIMESTAMP - %(stats_days)s * INTERVAL '1 day'
+        GROUP BY dasher_email
+    ) history ON history.dasher_email = d.email
+    WHERE d.active
+      AND NOT EXISTS (
+          SELECT 1 FROM dasher_notifications n
+          WHERE n.order_id = %(order_id)s AND n.dasher_email = d.email
+      )
+'''
+
+
+def claim_order(cur, order_number, dasher_email):
+    """
+    Assign a pending order to a dasher in the caller's transaction and return
+    the claimed order. The claim is the pending -> confirmed transition, so
+    exactly one of any number of concurrent claims wins; the rest raise
+    OrderAlreadyClaimedError.
+    """
+    dasher = 'FROM dashers WHERE email = %s'
+    try:
+        order = transition(
+            cur, order_number, CONFIRMED,
+            assignments=[
+                ('dasher_email = %s', (dasher_email,)),
+                (f'dasher_name = (SELECT name {dasher})', (dasher_email,)),
+                (f'dasher_phone = (SELECT phone {dasher})', (dasher_email,)),
+            ],
+            conditions=[(f'EXISTS (SELECT 1 {dasher})', (dasher_email,))]
+        )
+    except TransitionConflictError as e:
+        raise OrderAlreadyClaimedError('Order already accepted', e.current_status)
+    except OrderNotFoundError:
+        # Only a lost claim pays for working out why
+        cur.execute('SELECT 1 FROM dashers WHERE email = %s', (dasher_email,))
+        if cur.fetchone() is None:
+            raise DasherNotFoundError('Dasher not found')
+        raise
+
+    # Feeds the acceptance rates the assignment policy ranks dashers on
+    cur.execute('''
+        UPDATE dasher_notifications SET accepted_at = CURRENT_TIMESTAMP
+        WHERE order_id = %s AND dasher_email = %s
+    ''', (order['id'], dasher_email))
+    return order
+
+
+def _new_delivery_email(dasher, order):
+    return f"""
+    <html>
+    <body>
+        <h2>New Delivery Available</h2>
+        <p>Hi {dasher['name']},</p>
+        <p>A new delivery order is available:</p>
+        <p><strong>Order Number:</strong> {order['order_number']}</p>
+        <p><strong>Pickup:</strong> {order['pickup_location']}</p>
+        <p><strong>Deliver to:</strong> {order['delivery_address']}</p>
+        <p><strong>Order Total:</strong> ${order['total_amount']:.2f}</p>
+        <p>Check the orders dashboard to accept this delivery.</p>
+    </body>
+    </html>
+    """
+
+
+def notify_dashers(cur, order, wave=0, policy=None):
+    """
+    Queue "new delivery" emails, in the caller's transaction, to the dashers
+    the policy picks for this wave, and schedule the next wave if anyone is
+    left to ask. If no dasher is eligible yet, the same wave is retried
+    later. `order` needs id, order_number, pickup_location, delivery_address
+    and total_amount. Returns the notified candidates.
+    """
+    policy = policy or assignment_policy
+    cur.execute(CANDIDATES_SQL, {'order_id': order['id'], 'stats_days': DISPATCH_STATS_DAYS})
+    candidates = cur.fetchall()
+    chosen = policy.choose(candidates, order['pickup_location'], wave)
+
+    if chosen:
+        execute_values(
+            cur,
+            'INSERT INTO dasher_notifications (order_id, dasher_email, wave) VALUES %s',
+            [(order['id'], dasher['email'], wave) for dasher in chosen]
+        )
+        enqueue_emails(cur, [
+            (dasher['email'], f"New Delivery - {order['order_number']}", _new_delivery_email(dasher, order))
+            for dasher in chosen
+        ])
+
+    # With nobody to notify, record the previous wave so the retry sends this one again
+    escalate = len(candidates) > len(chosen) or not chosen
+    if not chosen:
+        wave -= 1
+    cur.execute('''
+        UPDATE orders
+        SET dispatch_wave = %s,
+            next_escalation_at = CASE WHEN %s THEN CURRENT_TIMESTAMP + %s * INTERVAL '1 second' END
+        WHERE id = %s
+    ''', (wave, escalate, DISPATCH_ESCALATE_AFTER, order['id']))
+    return chosen
+
+
+def available_orders(cur, args):
+    """
+    Pending orders, oldest first, one keyset page at a time; returns
+    (orders, next_cursor). Customer contact details are left out until an
+    order is claimed.
+    """
+    return paginate_orders(cur, AVAILABLE_ORDERS_SQL, ["status = 'pending'"], [], args, oldest_first=True)
+
+
+class DispatchEscalator:
+    """
+    Background thread that widens the search for orders nobody has accepted.
+
+    Every `poll_interval` seconds it locks the pending orders whose next
+    escalation is due with FOR UPDATE SKIP LOCKED, so several processes can
+    each run one without notifying anyone twice, and notifies each order's
+    next wave of dashers.
+    """
+
+    def __init__(self, policy=None, poll_interval=15.0, batch_size=50):
+        self.policy = policy or assignment_policy
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='dispatch-escalator', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        """Escalate the orders that are due; return how many were escalated"""
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                SELECT id, order_number, pickup_location, delivery_address, total_amount, dispatch_wave
+                FROM orders
+                WHERE status = 'pending' AND next_escalation_at <= CURRENT_TIMESTAMP
+                ORDER BY next_escalation_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ''', (self.batch_size,))
+            orders = cur.fetchall()
+            for order in orders:
+                notify_dashers(cur, order, order['dispatch_wave'] + 1, self.policy)
+            conn.commit()
+        return len(orders)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_once() == self.batch_size:
+                    continue
+            except Exception as e:
+                print(f"Dispatch escalator error: {e}")
+            self._stopping.wait(self.poll_interval)
+
+
+dispatch_escalator = DispatchEscalator(poll_interval=DISPATCH_POLL_INTERVAL)
+
+
+def start_dispatch_escalator():
+    """Start escalating unaccepted orders unless disabled by configuration"""
+    if DISPATCH_POLL_INTERVAL > 0:
+        dispatch_escalator.start()
@@ -1,24 +1,126 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from config import EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD, EMAIL_FROM
+from config import (
+    EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD, EMAIL_FROM, EMAIL_USE_TLS,
+    EMAIL_SMTP_TIMEOUT, EMAIL_SMTP_IDLE_TIMEOUT, EMAIL_SMTP_MAX_MESSAGES
+)
+
+class SMTPSession:
+    """
+    Long-lived, authenticated SMTP connection.
+
+    The handshake (connect, STARTTLS, login) is done once and reused for
+    every message. A session idle for longer than `idle_timeout` seconds is
+    probed with NOOP before reuse, a dropped connection is re-established
+    transparently, and the session is recycled after `max_messages` sends
+    since many providers cap messages per connection.
+    """
+
+    def __init__(self, host=EMAIL_HOST, port=EMAIL_PORT, use_tls=EMAIL_USE_TLS,
+                 user=EMAIL_USER, password=EMAIL_PASSWORD, timeout=EMAIL_SMTP_TIMEOUT,
+                 idle_timeout=EMAIL_SMTP_IDLE_TIMEOUT, max_messages=EMAIL_SMTP_MAX_MESSAGES):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.server = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    def send(self, msg):
+        """Send a message, reconnecting once if the server dropped the session"""
+        self._ensure_connected()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._ensure_connected()
+            self.server.send_message(msg)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """Close the connection; the next send opens a new one"""
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self.server = None
+        self.sent = 0
+
+    def _ensure_connected(self):
+        if self.server is not None and self.sent >= self.max_messages:
+            self.close()
+        if self.server is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            # Servers silently drop idle sessions; probe before reusing one
+            try:
+                alive = self.server.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                alive = False
+            if not alive:
+                self.close()
+        if self.server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+            self.server = server
+            self.last_used = time.monotonic()
+
+# smtplib connections are not thread-safe, so each sending thread keeps its own
+_local = threading.local()
+
+def get_smtp_session():
+    """Return this thread's persistent SMTP session"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = SMTPSession()
+    return session
+
+def build_message(to_email, subject, body):
+    """Build an HTML email message"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = EMAIL_FROM
+    msg['To'] = to_email
+    
+    html_part = MIMEText(body, 'html')
+    msg.attach(html_part)
+    return msg
+
+def deliver_email(to_email, subject, body):
+    """Send an email over the persistent session, raising on failure"""
+    get_smtp_session().send(build_message(to_email, subject, body))
+
+def deliver_emails(messages, session=None):
+    """
+    Send (to_email, subject, body) tuples over one authenticated session
+    (this thread's persistent one by default). Returns a list with None for
+    each delivered message and the exception for each failed one, in input order.
+    """
+    session = session or get_smtp_session()
+    results = []
+    for to_email, subject, body in messages:
+        try:
+            session.send(build_message(to_email, subject, body))
+            results.append(None)
+        except Exception as e:
+            results.append(e)
+    return results
 
 def send_email(to_email, subject, body):
     """Send email notification"""
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_FROM
-        msg['To'] = to_email
-        
-        html_part = MIMEText(body, 'html')
-        msg.attach(html_part)
-        
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            if EMAIL_USER and EMAIL_PASSWORD:
-                server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.send_message(msg)
+        deliver_email(to_email, subject, body)
         return True
     except Exception as e:
         print(f"Error sending email: {e}")
@@ -0,0 +1,176 @@
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from config import (
+    EMAIL_QUEUE_WORKERS, EMAIL_QUEUE_BATCH_SIZE, EMAIL_QUEUE_POLL_INTERVAL,
+    EMAIL_QUEUE_MAX_ATTEMPTS, EMAIL_QUEUE_RETRY_DELAY
+)
+from utils.database import get_db_connection, listen
+from utils.email import deliver_emails
+
+EMAIL_CHANNEL = 'email_outbox'
+
+# Rows stuck in 'sending' this long belong to a crashed worker and are retried
+STALE_LOCK_SECONDS = 300
+
+
+def enqueue_email(cur, to_email, subject, body):
+    """Queue one email in the caller's transaction; it is sent after commit"""
+    enqueue_emails(cur, [(to_email, subject, body)])
+
+
+def enqueue_emails(cur, messages):
+    """Queue (to_email, subject, body) tuples in the caller's transaction"""
+    if not messages:
+        return
+    execute_values(cur, 'INSERT INTO email_outbox (to_email, subject, body) VALUES %s', messages)
+    # Delivered to LISTENing workers only when the transaction commits
+    cur.execute(f'NOTIFY {EMAIL_CHANNEL}')
+
+
+class EmailQueueWorker:
+    """
+    Background sender for the email_outbox table.
+
+    A listener thread wakes the workers when new mail is committed; each
+    worker claims a batch with FOR UPDATE SKIP LOCKED, so any number of
+    threads and processes can drain the same queue without double sending.
+    Each batch is delivered over the worker thread's persistent SMTP session.
+    Failed messages are retried with exponential backoff up to max_attempts.
+    """
+
+    def __init__(self, send_many=deliver_emails, workers=2, batch_size=20, poll_interval=5.0,
+                 max_attempts=5, retry_delay=30.0):
+        self.send_many = send_many
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the listener and worker threads"""
+        if self._threads:
+            return
+        self._threads.append(threading.Thread(target=self._listen, name='email-queue-listener', daemon=True))
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._work, name=f'email-queue-worker-{i}', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """Ask the threads to exit after their current batch"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self):
+        """Claim and deliver one batch; return the number of messages handled"""
+        batch = self._claim_batch()
+        if not batch:
+            return 0
+        # The whole batch goes out over one authenticated SMTP session
+        results = self.send_many([(m['to_email'], m['subject'], m['body']) for m in batch])
+        sent_ids = []
+        for message, error in zip(batch, results):
+            if error is None:
+                sent_ids.append(message['id'])
+            else:
+                print(f"Error sending queued email {message['id']}: {error}")
+                self._mark_failed(message, str(error))
+        self._mark_sent(sent_ids)
+        return len(batch)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_once() == self.batch_size:
+                    continue
+            except Exception as e:
+                print(f"Email queue worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _listen(self):
+        listen(
+            EMAIL_CHANNEL,
+            lambda payload: self._wakeup.set(),
+            poll_interval=self.poll_interval,
+            stopping=self._stopping
+        )
+
+    def _claim_batch(self):
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                UPDATE email_outbox
+                SET status = 'sending', attempts = attempts + 1, locked_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                       OR (status = 'sending' AND locked_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, to_email, subject, body, attempts
+            ''', (STALE_LOCK_SECONDS, self.batch_size))
+            batch = cur.fetchall()
+            conn.commit()
+        return batch
+
+    def _mark_sent(self, message_ids):
+        if not message_ids:
+            return
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                UPDATE email_outbox
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP, locked_at = NULL, last_error = NULL
+                WHERE id = ANY(%s)
+            ''', (message_ids,))
+            conn.commit()
+
+    def _mark_failed(self, message, error):
+        give_up = message['attempts'] >= self.max_attempts
+        delay = self.retry_delay * (2 ** (message['attempts'] - 1))
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('''
+                UPDATE email_outbox
+                SET status = %s, last_error = %s, locked_at = NULL,
+                    next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second'
+                WHERE id = %s
+            ''', ('failed' if give_up else 'pending', error, delay, message['id']))
+            conn.commit()
+
+
+email_worker = EmailQueueWorker(
+    workers=EMAIL_QUEUE_WORKERS,
+    batch_size=EMAIL_QUEUE_BATCH_SIZE,
+    poll_interval=EMAIL_QUEUE_POLL_INTERVAL,
+    max_attempts=EMAIL_QUEUE_MAX_ATTEMPTS,
+    retry_delay=EMAIL_QUEUE_RETRY_DELAY
+)
+
+
+def start_email_workers():
+    """Start the in-process email workers unless disabled by configuration"""
+    if EMAIL_QUEUE_WORKERS > 0:
+        email_worker.start()
+
+
+if __name__ == '__main__':
+    # Run the workers as a standalone process: python -m utils.email_queue
+    email_worker.workers = max(EMAIL_QUEUE_WORKERS, 1)
+    email_worker.start()
+    print("📧 Email queue workers running")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        email_worker.stop()
@@ -1,13 +1,95 @@
-import random
-import string
+import os
 import secrets
-from datetime import datetime
+import threading
+import time
+
+from utils.database import get_db_connection
+
+# Crockford base32: digits sort before letters, so fixed-width codes sort like the numbers they encode
+BASE32_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ORDER_NUMBER_WIDTH = 13  # base32 characters; 65 bits, enough for the 63-bit id
+ORDER_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODES = 1 << NODE_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def encode_base32(value, width=ORDER_NUMBER_WIDTH):
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 32)
+        chars.append(BASE32_ALPHABET[digit])
+    if value:
+        raise ValueError('Value does not fit in the requested width')
+    return ''.join(reversed(chars))
+
+
+def lease_node_id():
+    """Take a node id from the database, unique among the last MAX_NODES processes to ask"""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT nextval('order_node_seq') %% %s AS node_id", (MAX_NODES,))
+        node_id = cur.fetchone()['node_id']
+        conn.commit()
+    return node_id
+
+
+class OrderNumberGenerator:
+    """
+    Time-ordered, collision-free order numbers: "ORD-" and 13 base32
+    characters encoding milliseconds since 2024, a node id and a counter
+    within the millisecond (41, 10 and 12 bits).
+
+    Numbers from one generator strictly increase, and since they are fixed
+    width they sort the same as text, so new orders are appended at the right
+    edge of the order_number index. Generators with different node ids never
+    collide. Without a fixed node_id one is leased with lease_node_id on first
+    use, and again after a fork. If the clock steps back or the 4096 numbers
+    of a millisecond run out, the generator moves on to the next millisecond
+    instead of waiting.
+    """
+
+    def __init__(self, node_id=None, lease_node_id=lease_node_id, clock=time.time):
+        if node_id is not None and not 0 <= node_id < MAX_NODES:
+            raise ValueError(f'node_id must be in [0, {MAX_NODES})')
+        self.node_id = node_id
+        self._lease_node_id = None if node_id is not None else lease_node_id
+        self._clock = clock
+        self._pid = os.getpid()
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        """The next id as an integer"""
+        with self._lock:
+            if self._lease_node_id and (self.node_id is None or self._pid != os.getpid()):
+                # A forked child must not share its parent's node id
+                self.node_id = self._lease_node_id()
+                self._pid = os.getpid()
+                self._last_ms, self._sequence = -1, 0
+
+            now_ms = int(self._clock() * 1000) - ORDER_EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                self._last_ms, self._sequence = self._last_ms + 1, 0
+
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+    def next(self):
+        return f'ORD-{encode_base32(self.next_id())}'
+
+
+order_numbers = OrderNumberGenerator()
+
 
 def generate_order_number():
-    """Generate unique order number"""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-    return f"ORD-{timestamp}-{random_suffix}"
+    """Generate a unique, time-ordered order number"""
+    return order_numbers.next()
+
 
 def generate_dasher_token():
     """Generate secure token for dasher confirmation"""
@@ -0,0 +1,84 @@
+import json
+
+
+class ResultsStreamParser:
+    """
+    Incremental parser for a model response of the form {"results": [{...}, ...]}.
+
+    Text is fed in arbitrary chunks as it streams in; feed() returns each
+    element of the results array as soon as its closing brace arrives.
+    Anything before the array (code fences, prose) is skipped, and nothing
+    after the array is needed, so a truncated response still yields every
+    item that was completed.
+    """
+
+    def __init__(self, key='results'):
+        self._marker = f'"{key}"'
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'key'  # key -> array -> items -> done
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    @property
+    def done(self):
+        """True once the closing bracket of the results array has been seen"""
+        return self._state == 'done'
+
+    def feed(self, text):
+        """Add a chunk of text; return the list of items it completed"""
+        self._buffer += text
+        items = []
+
+        if self._state == 'key':
+            found = self._buffer.find(self._marker, self._pos)
+            if found < 0:
+                # Keep enough of the tail to match a marker split across chunks
+                self._pos = max(0, len(self._buffer) - len(self._marker))
+                return items
+            self._pos = found + len(self._marker)
+            self._state = 'array'
+
+        if self._state == 'array':
+            found = self._buffer.find('[', self._pos)
+            if found < 0:
+                self._pos = len(self._buffer)
+                return items
+            self._pos = found + 1
+            self._state = 'items'
+
+        while self._state == 'items' and self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # The results array itself has closed
+                    self._state = 'done'
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        items.append(json.loads(self._buffer[self._item_start:self._pos + 1]))
+                        self._item_start = None
+            self._pos += 1
+
+        # Drop text that no pending item needs
+        keep_from = self._pos if self._item_start is None else self._item_start
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        if self._item_start is not None:
+            self._item_start = 0
+        return items
@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the model cannot answer now; callers should degrade gracefully"""
+
+
+class LLMBusyError(LLMUnavailableError):
+    """Every upstream slot is taken"""
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    """The model did not answer before the deadline"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Recent calls kept failing, so the model is not being called for a while"""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed a single trial call is let through;
+    its success closes the circuit again, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go upstream now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def would_allow(self):
+        """Whether allow() would let a call through now, without taking the trial slot"""
+        with self._lock:
+            return (self._opened_at is None
+                    or not self._trial_running and time.monotonic() - self._opened_at >= self.reset_timeout)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release_trial(self):
+        """Give up a trial slot without a verdict, so the next caller may try"""
+        with self._lock:
+            self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half_open' if self._trial_running else 'open'
+
+
+_END_OF_STREAM = object()
+
+
+class _Slot:
+    """
+    An upstream slot shared by a call and its caller. It is given back once
+    both have released it: the call when it returns, the caller once it has
+    told the breaker how the call went. Queued callers therefore see the
+    verdict, and an overrunning call still holds its slot until it returns.
+    """
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._holders = 2
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            self._holders -= 1
+            if self._holders == 0:
+                self._semaphore.release()
+
+
+class LLMClient:
+    """
+    Bounded, deadline-aware wrapper around a text generation function.
+
+    `generate(prompt)` must return the model's text and the optional
+    `generate_stream(prompt)` must return an iterator of text chunks; anything
+    with that shape works, so a local fake can stand in for Gemini. At most
+    `max_concurrency` calls run upstream at once and a call that cannot get a
+    slot within `queue_timeout` seconds is rejected. Callers wait at most
+    `timeout` seconds for an answer (for streams: for each chunk). A call that
+    overruns keeps its slot until it really returns, so a hung upstream cannot
+    pile up threads behind it.
+    """
+
+    def __init__(self, generate, generate_stream=None, max_concurrency=4, timeout=10.0,
+                 queue_timeout=1.0, breaker=None):
+        self.generate = generate
+        self.generate_stream = generate_stream
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm')
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def complete(self, prompt):
+        """Return the model's text for prompt, or raise an LLMUnavailableError"""
+        future, slot = self._submit(self.generate, prompt)
+        try:
+            try:
+                text = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                self._failed()
+                raise LLMTimeoutError(f'Model did not answer within {self.timeout:g}s')
+            except Exception as e:
+                self._failed()
+                raise LLMUnavailableError(f'Model call failed: {e}') from e
+
+            self.breaker.record_success()
+            return text
+        finally:
+            slot.release()
+
+    def stream(self, prompt):
+        """
+        Yield the model's text for prompt chunk by chunk as it is generated.
+        Raises LLMUnavailableError (possibly after some chunks) if the model
+        fails or a chunk does not arrive within the deadline.
+        """
+        if self.generate_stream is None:
+            yield self.complete(prompt)
+            return
+
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for chunk in self.generate_stream(prompt):
+                    if cancelled.is_set():
+                        return
+                    chunks.put(chunk)
+                chunks.put(_END_OF_STREAM)
+            except Exception as e:
+                chunks.put(e)
+
+        _, slot = self._submit(produce)
+        settled = False
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=self.timeout)
+                except queue.Empty:
+                    settled = True
+                    self._failed()
+                    raise LLMTimeoutError(f'Model sent nothing for {self.timeout:g}s')
+                if chunk is _END_OF_STREAM:
+                    break
+                if isinstance(chunk, Exception):
+                    settled = True
+                    self._failed()
+                    raise LLMUnavailableError(f'Model call failed: {chunk}') from chunk
+                yield chunk
+            settled = True
+            self.breaker.record_success()
+        finally:
+            # Stops the producer early if the caller walked away mid-stream
+            cancelled.set()
+            if not settled:
+                self.breaker.release_trial()
+            slot.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'circuit': self.breaker.state
+            }
+
+    def _submit(self, fn, *args):
+        """
+        Run fn upstream once the breaker and the concurrency bound allow it;
+        returns its future and slot, which the caller must release
+        """
+        # Fail fast rather than queue for a slot while the circuit is open
+        if not self.breaker.would_allow():
+            self._count('rejected')
+            raise CircuitOpenError('Model circuit is open')
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('rejected')
+            raise LLMBusyError('Too many model calls in flight')
+        # The circuit may have opened while this call was queued
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count('rejected')
+            raise CircuitOpenError('Model circuit is open')
+
+        self._count('calls')
+        slot = _Slot(self._slots)
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda f: slot.release())
+        return future, slot
+
+    def _failed(self):
+        self.breaker.record_failure()
+        self._count('failures')
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from config import MENU_CACHE_MAX_ENTRIES, MENU_CACHE_REFRESH_INTERVAL
+from utils.database import get_db_connection, listen
+
+MENU_CHANNEL = 'menu_changed'
+
+
+class MenuCache:
+    """
+    Read-through cache of serialized menu responses and other values derived
+    from the menu.
+
+    Entries are keyed by (endpoint, location) and tagged with the menu
+    generation they were built from. The generation is pushed by a LISTEN
+    thread on the menu_changed channel; as a safety net it is also re-read
+    from the database at most once every `refresh_interval` seconds.
+    """
+
+    def __init__(self, max_entries=256, refresh_interval=60.0):
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self._entries = OrderedDict()
+        self._generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listener = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        """
+        Return (body, etag) for key, calling loader() to build the body on a miss.
+        The etag is a content hash of the body, so it is a valid strong validator.
+        """
+        def build():
+            body = loader()
+            return body, hashlib.sha1(body).hexdigest()
+        return self.get_or_build(key, build)
+
+    def get_or_build(self, key, builder):
+        """Return the value cached for key in the current generation, calling builder() on a miss"""
+        generation = self.generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = builder()
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def generation(self):
+        """Return the current menu generation, refreshing it when it is stale"""
+        self._ensure_listener()
+        if self._generation is None or time.monotonic() - self._checked_at > self.refresh_interval:
+            self.set_generation(self._read_generation())
+        return self._generation
+
+    def set_generation(self, generation):
+        """Record a new menu generation, dropping entries built from older ones"""
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+            self._generation = generation
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next lookup to re-read the generation and rebuild entries"""
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'generation': self._generation,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _read_generation(self):
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute('SELECT generation FROM menu_generation')
+            row = cur.fetchone()
+        return row['generation'] if row else 0
+
+    def _ensure_listener(self):
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(
+                        target=self._listen, name='menu-cache-listener', daemon=True
+                    )
+                    self._listener.start()
+
+    def _listen(self):
+        # Anything committed while the listener was disconnected must not be missed
+        listen(
+            MENU_CHANNEL,
+            lambda payload: self.set_generation(int(payload)),
+            on_connect=self.invalidate,
+            poll_interval=self.refresh_interval
+        )
+
+
+menu_cache = MenuCache(
+    max_entries=MENU_CACHE_MAX_ENTRIES,
+    refresh_interval=MENU_CACHE_REFRESH_INTERVAL
+)
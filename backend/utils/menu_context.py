@@ -0,0 +1,86 @@
+import hashlib
+
+from utils.database import get_db_connection
+from utils.menu_cache import menu_cache
+from utils.menu_search import MenuIndex, item_tags
+
+
+def fetch_menu_items(location=None):
+    """Return available menu items, optionally for one location, ordered by station and name"""
+    query = 'SELECT * FROM menu_items WHERE available = true'
+    params = []
+
+    if location:
+        query += ' AND location = %s'
+        params.append(location)
+
+    query += ' ORDER BY category, item_name'
+
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(query, params)
+        return cur.fetchall()
+
+
+def fetch_locations():
+    """Return the locations with items on the current menu, in order"""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute('SELECT DISTINCT location FROM menu_items WHERE available = true ORDER BY location')
+        return [row['location'] for row in cur.fetchall()]
+
+
+def is_known_location(location):
+    """
+    Whether a client-supplied location names a hall on the current menu (None
+    means every hall). Checked before a location becomes part of a cache key,
+    so arbitrary strings cannot fill the cache and evict real entries.
+    """
+    if location is None:
+        return True
+    known = menu_cache.get_or_build(('location_names', None), lambda: frozenset(fetch_locations()))
+    return location in known
+
+
+def encode_menu(items):
+    """
+    Encode the menu for an LLM prompt with as few tokens as possible: a tag
+    legend, then one line per item grouped under location (@) and station (#)
+    headers, with tags given as legend numbers.
+
+        TAGS 1=halal 2=plant based
+        @Worcester Dining Commons
+        #Grill Station
+        Black Bean Burger|1,2
+    """
+    legend = {}
+    lines = []
+    location = station = None
+    for item in sorted(items, key=lambda i: (i.get('location') or '', i.get('category') or '')):
+        if item.get('location') != location:
+            location = item.get('location')
+            station = None
+            lines.append(f'@{location}')
+        if item.get('category') != station:
+            station = item.get('category')
+            lines.append(f'#{station}')
+        codes = sorted(legend.setdefault(tag, len(legend) + 1) for tag in item_tags(item))
+        name = item.get('item_name') or item.get('name')
+        lines.append(f"{name}|{','.join(map(str, codes))}" if codes else name)
+
+    header = 'TAGS ' + ' '.join(f'{code}={tag}' for tag, code in legend.items())
+    return '\n'.join([header] + lines)
+
+
+class MenuContext:
+    """Everything the AI chat needs about one menu: the items, their index and prompt text"""
+
+    def __init__(self, items):
+        self.items = items
+        self.index = MenuIndex(items)
+        self.prompt = encode_menu(self.index.items)
+        # Identifies the menu content, so answers derived from it can be cached
+        self.version = hashlib.sha1(self.prompt.encode('utf-8')).hexdigest()
+
+
+def get_menu_context(location=None):
+    """Return the MenuContext for the current menu generation, building it once per scrape"""
+    return menu_cache.get_or_build(('ai_context', location), lambda: MenuContext(fetch_menu_items(location)))
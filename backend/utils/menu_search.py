@@ -0,0 +1,237 @@
+import re
+
+# Local, deterministic answers for the menu questions the AI chat sees most.
+# It applies the same rules as the chat's system prompt: tag match for dietary
+# preferences, item-name match for ingredients, name exclusion for "no X". It
+# gives up (returns None) on anything it cannot fully parse, and the caller
+# then falls back to the LLM.
+
+MAX_RESULTS = 10
+
+# Query phrases that mean "has one of these tags"
+TAG_SYNONYMS = {
+    ('vegetarian',): {'vegetarian', 'plant based'},
+    ('veggie',): {'vegetarian', 'plant based'},
+    ('vegan',): {'plant based'},
+    ('plant', 'based'): {'plant based'},
+}
+
+# Words that stand for a family of ingredients when excluded ("no nuts")
+INGREDIENT_FAMILIES = {
+    'nut': {'nut', 'peanut', 'almond', 'walnut', 'pecan', 'cashew', 'pistachio', 'hazelnut', 'macadamia'},
+    'shellfish': {'shellfish', 'shrimp', 'crab', 'lobster', 'clam', 'scallop', 'mussel', 'oyster'},
+    'fish': {'fish', 'salmon', 'tuna', 'cod', 'tilapia', 'pollock', 'haddock', 'shellfish'},
+    'pork': {'pork', 'bacon', 'ham', 'sausage', 'kielbasa', 'pepperoni', 'chorizo', 'prosciutto'},
+    'beef': {'beef', 'steak', 'brisket'},
+    'egg': {'egg', 'omelet'},
+}
+
+NEGATIONS = {'no', 'without', 'not', 'exclude', 'excluding', 'avoid', 'except'}
+
+STOPWORDS = {
+    'a', 'an', 'the', 'i', 'im', 'me', 'my', 'we', 'want', 'would', 'like', 'need',
+    'show', 'find', 'give', 'get', 'list', 'any', 'some', 'something', 'anything',
+    'what', 'whats', 'which', 'is', 'are', 'there', 'do', 'does', 'you', 'have', 'has',
+    'food', 'item', 'option', 'dish', 'meal', 'today', 'tonight', 'please', 'for',
+    'to', 'eat', 'with', 'that', 'it', 'its', 'contain', 'containing', 'can', 'could',
+    'serve', 'served', 'serving', 'menu', 'available', 'on', 'in', 'at', 'of',
+    'and', 'or', 'also', 'only', 'just', 'all', 'good', 'thing', 'stuff', 'from'
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens with a naive plural strip, used for both menu and queries"""
+    tokens = []
+    # Apostrophes join rather than split, so "what's" is one word and not "what" and "s"
+    text = re.sub(r"['\u2019]", '', (text or '').lower())
+    for word in re.findall(r'[a-z0-9]+', text):
+        if len(word) > 3 and word.endswith('ies'):
+            word = word[:-3] + 'y'
+        elif len(word) > 3 and word.endswith(('ches', 'shes', 'xes', 'oes')):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def normalize_query(text):
+    """Canonical form of a question, so trivially different phrasings share a cache entry"""
+    return ' '.join(tokenize(text))
+
+
+def normalize_tag(tag):
+    # Scraped tags occasionally carry trailing junk after a carriage return
+    return ' '.join(tokenize((tag or '').split('\r')[0]))
+
+
+def item_tags(item):
+    tags = item.get('tags') or item.get('dietary_info') or []
+    return {normalize_tag(tag) for tag in tags if tag and normalize_tag(tag) not in ('', 'none')}
+
+
+class MenuQuery:
+    """A parsed menu question: required tags, included and excluded terms"""
+
+    def __init__(self):
+        self.tag_groups = []    # each a set of tags, at least one of which must be present
+        self.includes = []      # terms that must appear in the item name, station or location
+        self.excludes = set()   # terms that must not appear in the item name
+        self.match_any = False  # "chicken or beef": includes are alternatives
+
+    def is_empty(self):
+        return not (self.tag_groups or self.includes or self.excludes)
+
+
+class MenuIndex:
+    """Inverted index over menu item tags, names, stations and locations"""
+
+    def __init__(self, items):
+        self.items = []
+        self.by_tag = {}
+        self.by_term = {}
+        self.by_name_term = {}
+
+        seen = set()
+        for item in items:
+            name = item.get('item_name') or item.get('name')
+            if not name:
+                continue
+            key = (name, item.get('category'), item.get('location'))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            index = len(self.items)
+            self.items.append(item)
+            for tag in item_tags(item):
+                self.by_tag.setdefault(tag, set()).add(index)
+            name_terms = set(tokenize(name))
+            for term in name_terms:
+                self.by_name_term.setdefault(term, set()).add(index)
+            for term in name_terms | set(tokenize(item.get('category'))) | set(tokenize(item.get('location'))):
+                self.by_term.setdefault(term, set()).add(index)
+
+        # Menu tags can be asked for by name too ("halal", "whole grain")
+        self.tag_phrases = dict(TAG_SYNONYMS)
+        for tag in self.by_tag:
+            self.tag_phrases.setdefault(tuple(tag.split()), {tag})
+        self._longest_phrase = max((len(phrase) for phrase in self.tag_phrases), default=1)
+
+    def parse(self, text, lenient=False):
+        """
+        Parse a question into a MenuQuery, or return None if any part is not
+        understood. With lenient=True unknown words are skipped instead.
+        """
+        tokens = tokenize(text)
+        query = MenuQuery()
+        i = 0
+        while i < len(tokens):
+            phrase = self._match_tag_phrase(tokens, i)
+            if phrase:
+                tags = self.tag_phrases[phrase]
+                query.tag_groups.append(tags)
+                i += len(phrase)
+                continue
+
+            token = tokens[i]
+            if token in NEGATIONS and i + 1 >= len(tokens):
+                # A trailing "no" / "without" has nothing to exclude
+                if not lenient:
+                    return None
+                i += 1
+            elif token in NEGATIONS or (i + 1 < len(tokens) and tokens[i + 1] == 'free'):
+                # "no nuts", "without pork", "nut free"
+                target = tokens[i + 1] if token in NEGATIONS else token
+                if not self._add_exclusion(query, target) and not lenient:
+                    return None
+                i += 2
+            elif token in STOPWORDS:
+                if token == 'or':
+                    query.match_any = True
+                i += 1
+            elif token in self.by_term:
+                query.includes.append(token)
+                i += 1
+            elif lenient:
+                i += 1
+            else:
+                return None
+
+        return None if query.is_empty() else query
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Return matching items in the AI chat result format"""
+        candidates = set(range(len(self.items)))
+        tag_matches = [set().union(*(self.by_tag.get(tag, set()) for tag in tags)) for tags in query.tag_groups]
+        if tag_matches:
+            # "vegetarian or vegan": any of the groups will do
+            candidates &= set().union(*tag_matches) if query.match_any else set.intersection(*tag_matches)
+        if query.includes:
+            matches = [self.by_term.get(term, set()) for term in query.includes]
+            candidates &= set().union(*matches) if query.match_any else set.intersection(*matches)
+        for term in query.excludes:
+            candidates -= self.by_name_term.get(term, set())
+
+        results = []
+        for index in sorted(candidates)[:limit]:
+            item = self.items[index]
+            results.append({
+                'name': item.get('item_name') or item.get('name'),
+                'station': item.get('category'),
+                'location': item.get('location'),
+                'rationale': self._rationale(item, query)
+            })
+        return results
+
+    def _match_tag_phrase(self, tokens, start):
+        for length in range(min(self._longest_phrase, len(tokens) - start), 0, -1):
+            phrase = tuple(tokens[start:start + length])
+            if phrase in self.tag_phrases:
+                return phrase
+        return None
+
+    def _add_exclusion(self, query, term):
+        family = INGREDIENT_FAMILIES.get(term)
+        if family is None and term not in self.by_name_term:
+            return False
+        query.excludes |= family or {term}
+        return True
+
+    def _rationale(self, item, query):
+        reasons = []
+        tags = item_tags(item)
+        for group in query.tag_groups:
+            matched = sorted(tags & group)
+            if matched:
+                reasons.append(f"Tagged {', '.join(t.title() for t in matched)}")
+        name_terms = set(tokenize(item.get('item_name') or item.get('name')))
+        for term in query.includes:
+            if term in name_terms:
+                reasons.append(f'Name mentions {term}')
+            elif term in tokenize(item.get('category')):
+                reasons.append(f"Served at {item.get('category')}")
+        if query.excludes:
+            reasons.append('No excluded ingredients in the item name')
+        # "vegetarian or vegan" can match the same tag twice
+        return '; '.join(dict.fromkeys(reasons))
+
+
+def answer_menu_query(text, index):
+    """
+    Answer a menu question from a MenuIndex alone. Returns the chat response
+    body, or None when the question needs the LLM.
+    """
+    query = index.parse(text)
+    if query is None:
+        return None
+    return {'results': index.search(query)}
+
+
+def fallback_menu_query(text, index):
+    """
+    Best-effort answer from the index for when the LLM is unavailable: words
+    the parser does not know are ignored rather than making it give up.
+    """
+    query = index.parse(text, lenient=True)
+    return {'results': index.search(query) if query else [], 'fallback': True}
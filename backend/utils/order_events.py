@@ -0,0 +1,91 @@
+import queue
+import threading
+
+from config import ORDER_EVENTS_HEARTBEAT
+from utils.database import listen
+from utils.orders import order_cache, get_order_json
+
+ORDER_CHANNEL = 'order_status'
+
+
+def notify_order_changed(cur, order_number):
+    """Announce an order change in the caller's transaction; subscribers hear it on commit"""
+    cur.execute('SELECT pg_notify(%s, %s)', (ORDER_CHANNEL, order_number))
+
+
+class OrderEventHub:
+    """
+    Per-process fan-out of order status changes to open tracking streams.
+
+    One LISTEN connection per process receives every change, started with
+    the app so that every process drops its cached copy of a changed order
+    even if nobody there is tracking it. For an order with subscribers, the
+    fresh document is fetched once and handed to all of them, so the
+    database cost does not grow with the number of open tabs.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def start(self):
+        """Start listening for order changes, or restart a listener that died"""
+        self._ensure_listener()
+
+    def subscribe(self, order_number):
+        """Register interest in an order; returns a queue of JSON documents"""
+        self._ensure_listener()
+        events = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(order_number, set()).add(events)
+        return events
+
+    def unsubscribe(self, order_number, events):
+        with self._lock:
+            subscribers = self._subscribers.get(order_number)
+            if subscribers is not None:
+                subscribers.discard(events)
+                if not subscribers:
+                    del self._subscribers[order_number]
+
+    def publish(self, order_number):
+        """Push the current document for an order to its subscribers"""
+        order_cache.invalidate(order_number)
+        with self._lock:
+            subscribers = list(self._subscribers.get(order_number, ()))
+        if not subscribers:
+            return
+        body = get_order_json(order_number)
+        if body is None:
+            return
+        for events in subscribers:
+            events.put(body)
+
+    def _ensure_listener(self):
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(
+                        target=listen,
+                        args=(ORDER_CHANNEL, self._on_notify),
+                        # Changes made while disconnected were never heard
+                        kwargs={'on_connect': order_cache.clear, 'poll_interval': ORDER_EVENTS_HEARTBEAT},
+                        name='order-events-listener',
+                        daemon=True
+                    )
+                    self._listener.start()
+
+    def _on_notify(self, order_number):
+        try:
+            self.publish(order_number)
+        except Exception as e:
+            print(f"Error publishing order event for {order_number}: {e}")
+
+
+order_events = OrderEventHub()
+
+
+def start_order_events():
+    """Start invalidating cached orders on changes from any process"""
+    order_events.start()
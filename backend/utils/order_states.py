@@ -0,0 +1,102 @@
+PENDING = 'pending'
+CONFIRMED = 'confirmed'
+PICKED_UP = 'picked_up'
+DELIVERED = 'delivered'
+CANCELLED = 'cancelled'
+
+# Legal edges of the order lifecycle
+TRANSITIONS = {
+    PENDING: {CONFIRMED, CANCELLED},
+    CONFIRMED: {PICKED_UP, CANCELLED},
+    PICKED_UP: {DELIVERED},
+    DELIVERED: set(),
+    CANCELLED: set(),
+}
+
+STATUSES = list(TRANSITIONS)
+
+# Columns stamped when an order enters a status
+STATUS_TIMESTAMPS = {CONFIRMED: 'accepted_at'}
+
+RETURNING_COLUMNS = '''
+    id, order_number, status, customer_name, customer_email, pickup_location,
+    delivery_address, dasher_email, dasher_name, dasher_phone
+'''
+
+
+class TransitionError(Exception):
+    """Raised when an order status change is not applied"""
+    status_code = 400
+
+
+class OrderNotFoundError(TransitionError):
+    """Raised when the order does not exist, or fails the caller's extra conditions"""
+    status_code = 404
+
+
+class TransitionConflictError(TransitionError):
+    """Raised when the order is not in a status the transition can start from"""
+    status_code = 409
+
+    def __init__(self, message, current_status=None):
+        super().__init__(message)
+        self.current_status = current_status
+
+
+def sources(status):
+    """Statuses an order may move to `status` from"""
+    return [source for source, targets in TRANSITIONS.items() if status in targets]
+
+
+def transition(cur, order_number, to_status, expected=None, assignments=(), conditions=(),
+               not_found='Order not found'):
+    """
+    Move an order to `to_status` in the caller's transaction with one
+    conditional UPDATE ... WHERE status = ANY(expected) RETURNING, and return
+    the updated order. `expected` defaults to every status with a legal edge
+    to `to_status`; an admin override can pass the status it saw instead.
+
+    `assignments` and `conditions` are extra (sql, params) pairs for the SET
+    and WHERE clauses, e.g. the dasher the order must belong to. Concurrent
+    transitions of the same order serialize on its row lock and all but one
+    find the status changed.
+
+    Raises OrderNotFoundError (with the `not_found` message) if the order does
+    not exist or fails the conditions, and TransitionConflictError if it is
+    in any other status. Only a failed transition costs a second query.
+    """
+    if to_status not in TRANSITIONS:
+        raise TransitionError(f'Invalid status. Must be one of {STATUSES}')
+    expected = list(expected) if expected is not None else sources(to_status)
+
+    set_sql = ['status = %s', 'updated_at = CURRENT_TIMESTAMP']
+    set_params = [to_status]
+    if to_status in STATUS_TIMESTAMPS:
+        set_sql.append(f'{STATUS_TIMESTAMPS[to_status]} = CURRENT_TIMESTAMP')
+    for sql, params in assignments:
+        set_sql.append(sql)
+        set_params.extend(params)
+
+    condition_sql = ['order_number = %s']
+    condition_params = [order_number]
+    for sql, params in conditions:
+        condition_sql.append(sql)
+        condition_params.extend(params)
+
+    cur.execute(
+        f"UPDATE orders SET {', '.join(set_sql)} "
+        f"WHERE {' AND '.join(condition_sql)} AND status = ANY(%s) RETURNING {RETURNING_COLUMNS}",
+        set_params + condition_params + [expected]
+    )
+    order = cur.fetchone()
+    if order:
+        return order
+
+    # An order that fails the conditions (another dasher's) is reported as not found
+    cur.execute(f"SELECT status FROM orders WHERE {' AND '.join(condition_sql)}", condition_params)
+    current = cur.fetchone()
+    if current is None or current['status'] in expected:
+        raise OrderNotFoundError(not_found)
+    raise TransitionConflictError(
+        f"Cannot change order from {current['status']} to {to_status}", current['status']
+    )
@@ -0,0 +1,111 @@
+from psycopg2.extras import Json
+
+from config import ORDER_CACHE_TTL, ORDER_CACHE_MAX_ENTRIES
+from utils.database import get_db_connection
+from utils.ttl_cache import TTLCache
+
+# Serialized order documents for the tracking page, keyed by order_number.
+# Entries are dropped when the order's status changes in this process, and
+# on NOTIFY from other workers once start_order_events() is listening; the
+# short TTL bounds staleness if a notification is missed.
+order_cache = TTLCache(max_entries=ORDER_CACHE_MAX_ENTRIES, ttl=ORDER_CACHE_TTL)
+
+# Writes the order header and every line item in one statement (one round trip),
+# whatever the cart size. Items arrive as a JSON array so the statement text and
+# parameter count stay fixed.
+INSERT_ORDER_SQL = '''
+    WITH new_order AS (
+        INSERT INTO orders (
+            order_number, customer_name, customer_email, customer_phone,
+            delivery_address, special_instructions, pickup_location,
+            total_amount
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id, order_number, created_at
+    ), new_items AS (
+        INSERT INTO order_items (order_id, item_name, category, quantity, price, special_instructions)
+        SELECT new_order.id, item.name, item.category, item.quantity, item.price, item.special_instructions
+        FROM new_order,
+             jsonb_to_recordset(%s::jsonb) AS item(
+                 name TEXT, category TEXT, quantity INTEGER, price NUMERIC, special_instructions TEXT
+             )
+    )
+    SELECT id, order_number, created_at FROM new_order
+'''
+
+def insert_order(cur, order_number, data, total_amount):
+    """Insert an order and its line items; returns the new order's id, order_number and created_at"""
+    items = [{
+        'name': item['name'],
+        'category': item.get('category'),
+        'quantity': item.get('quantity', 1),
+        'price': item.get('price', 5.0),
+        'special_instructions': item.get('special_instructions')
+    } for item in data['items']]
+
+    cur.execute(INSERT_ORDER_SQL, (
+        order_number, data['customer_name'], data['customer_email'],
+        data['customer_phone'], data['delivery_address'],
+        data.get('special_instructions'), data['pickup_location'],
+        total_amount, Json(items)
+    ))
+    return cur.fetchone()
+
+# Timestamps in the order document use the same RFC 1123 form jsonify gives
+# datetimes ("Mon, 03 Mar 2025 09:30:00 GMT"); the columns store naive times,
+# which jsonify also labels GMT.
+HTTP_DATE = """to_char({}, 'Dy, DD Mon YYYY HH24:MI:SS "GMT"')"""
+
+# The whole order document, items included, is built by Postgres and returned as
+# JSON text that can be sent to the client as-is. Columns are listed explicitly
+# so internal ones (dispatch_wave, next_escalation_at) stay out of the response.
+ORDER_JSON_SQL = f'''
+    SELECT jsonb_build_object(
+        'id', o.id,
+        'order_number', o.order_number,
+        'status', o.status,
+        'customer_name', o.customer_name,
+        'customer_email', o.customer_email,
+        'customer_phone', o.customer_phone,
+        'delivery_address', o.delivery_address,
+        'pickup_location', o.pickup_location,
+        'special_instructions', o.special_instructions,
+        'total_amount', o.total_amount,
+        'dasher_email', o.dasher_email,
+        'dasher_name', o.dasher_name,
+        'dasher_phone', o.dasher_phone,
+        'created_at', {HTTP_DATE.format('o.created_at')},
+        'accepted_at', {HTTP_DATE.format('o.accepted_at')},
+        'updated_at', {HTTP_DATE.format('o.updated_at')},
+        'items', COALESCE(order_items.items, '[]'::jsonb)
+    )::text AS body
+    FROM orders o
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object(
+            'name', i.item_name,
+            'category', i.category,
+            'quantity', i.quantity,
+            'price', i.price,
+            'special_instructions', i.special_instructions
+        ) ORDER BY i.id) AS items
+        FROM order_items i
+        WHERE i.order_id = o.id
+    ) order_items ON true
+    WHERE o.order_number = %s
+'''
+
+def fetch_order_json(cur, order_number):
+    """Return the order with its items as UTF-8 JSON bytes, or None if it does not exist"""
+    cur.execute(ORDER_JSON_SQL, (order_number,))
+    row = cur.fetchone()
+    return row['body'].encode('utf-8') if row else None
+
+def get_order_json(order_number):
+    """Return the order document from the cache, fetching it on a miss; None if it does not exist"""
+    body = order_cache.get(order_number)
+    if body is None:
+        with get_db_connection() as conn, conn.cursor() as cur:
+            body = fetch_order_json(cur, order_number)
+        if body is not None:
+            order_cache.set(order_number, body)
+    return body
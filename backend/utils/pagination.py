@@ -0,0 +1,103 @@
+import base64
+from datetime import datetime
+
+from flask import current_app
+
+from utils.database import get_db_connection
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+
+# Newest first; id breaks ties between orders created in the same instant
+KEYSET_ORDER = ' ORDER BY created_at DESC, id DESC'
+OLDEST_FIRST_ORDER = ' ORDER BY created_at, id'
+
+
+def encode_cursor(row):
+    """Encode a row's (created_at, id) position as an opaque cursor"""
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (created_at, id); raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_datetime(value, name):
+    """Parse an ISO 8601 request arg, raising ValueError that names the arg"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}; expected an ISO 8601 date or datetime')
+
+
+def order_filters(args, clauses=None, params=None):
+    """
+    Translate the status, since and until request args into WHERE clauses
+    and parameters, appended to any the caller already has.
+    """
+    clauses = list(clauses or [])
+    params = list(params or [])
+
+    if args.get('status'):
+        clauses.append('status = %s')
+        params.append(args['status'])
+    if args.get('since'):
+        clauses.append('created_at >= %s')
+        params.append(parse_datetime(args['since'], 'since'))
+    if args.get('until'):
+        clauses.append('created_at < %s')
+        params.append(parse_datetime(args['until'], 'until'))
+
+    return clauses, params
+
+
+def _where(clauses):
+    return ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+
+
+def paginate_orders(cur, select_sql, clauses, params, args, oldest_first=False):
+    """
+    Run select_sql (which must expose created_at and id) one keyset page at a
+    time, newest first unless oldest_first. Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    clauses = list(clauses)
+    params = list(params)
+    if args.get('cursor'):
+        clauses.append('(created_at, id) > (%s, %s)' if oldest_first else '(created_at, id) < (%s, %s)')
+        params.extend(decode_cursor(args['cursor']))
+
+    # Fetch one extra row to learn whether another page exists
+    order_by = OLDEST_FIRST_ORDER if oldest_first else KEYSET_ORDER
+    cur.execute(select_sql + _where(clauses) + order_by + ' LIMIT %s', params + [limit + 1])
+    rows = cur.fetchall()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def stream_orders_ndjson(select_sql, clauses, params):
+    """
+    Yield every matching row as a line of JSON, read from a server-side
+    cursor in chunks so memory use stays flat however many rows match.
+    Must run inside an app context (use stream_with_context).
+    """
+    with get_db_connection() as conn, conn.cursor(name='orders_export') as cur:
+        cur.itersize = EXPORT_CHUNK_SIZE
+        cur.execute(select_sql + _where(clauses) + KEYSET_ORDER, params)
+        for row in cur:
+            yield current_app.json.dumps(row).encode('utf-8') + b'\n'
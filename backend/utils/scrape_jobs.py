@@ -0,0 +1,318 @@
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import Json
+
+from config import SCRAPER_DIR, SCRAPE_SCHEDULE, SCRAPE_TIMEOUT
+from utils.database import get_db_connection
+
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]  # minute hour day month weekday
+
+
+def parse_cron(expression):
+    """
+    Parse a five-field cron expression ("*/15 6-22 * * 1-5") into a list of
+    allowed-value sets. Supports *, lists, ranges and steps; a step after a
+    single value ("5/10") runs to the end of the field. Weekday 0 and 7 are
+    both Sunday.
+    """
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+
+    allowed = []
+    for field, (low, high) in zip(fields, CRON_FIELDS):
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            if spec == '*':
+                start, end = low, high
+            elif '-' in spec:
+                start, end = (int(v) for v in spec.split('-'))
+            else:
+                start = int(spec)
+                end = high if step else start
+            if not low <= start <= end <= high:
+                raise ValueError(f'Cron field out of range: {part!r}')
+            values.update(range(start, end + 1, int(step) if step else 1))
+        allowed.append(values)
+
+    weekdays = allowed[4]
+    if 7 in weekdays:
+        weekdays.discard(7)
+        weekdays.add(0)
+    return allowed
+
+
+def cron_matches(allowed, when):
+    minutes, hours, days, months, weekdays = allowed
+    return (when.minute in minutes and when.hour in hours and when.day in days
+            and when.month in months and (when.weekday() + 1) % 7 in weekdays)
+
+
+JOB_COLUMNS = 'id, status, trigger, force, queued_at, started_at, finished_at, result, error'
+
+# Job states that hold the single active slot
+ACTIVE_STATUSES = ['queued', 'running']
+
+
+class ScrapeJob:
+    """One menu scrape request and its outcome, as stored in scrape_jobs"""
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.status = row['status']
+        self.trigger = row['trigger']
+        self.force = row['force']
+        self.queued_at = row['queued_at']
+        self.started_at = row['started_at']
+        self.finished_at = row['finished_at']
+        self.result = row['result'] or {}
+        self.error = row['error']
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self):
+        duration = None
+        if self.started_at:
+            duration = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+        return {
+            'id': self.id,
+            'status': self.status,
+            'trigger': self.trigger,
+            'force': self.force,
+            'queued_at': self.queued_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_seconds': duration,
+            'items': self.result.get('items'),
+            'changed_halls': self.result.get('changed_halls'),
+            'halls': self.result.get('halls'),
+            'inserted': self.result.get('inserted'),
+            'updated': self.result.get('updated'),
+            'removed': self.result.get('removed'),
+            'purged': self.result.get('purged'),
+            'error': self.error,
+        }
+
+
+class ScrapeJobManager:
+    """
+    Runs menu scrapes one at a time in a single long-lived worker process.
+
+    Jobs live in the scrape_jobs table, so any backend process can report on
+    a job another one queued. submit() is single-flight across processes: a
+    unique index admits one queued or running job, and further requests get
+    that job back instead of starting another. The process that queued a job
+    runs it in its worker (scrapy_folder/scrape_worker.py), which is started
+    on first use and kept for later jobs, and restarted if it dies or a job
+    overruns `timeout`. A job left active by a process that died is marked
+    failed once it is twice `timeout` old.
+
+    With a cron `schedule`, every process runs a scheduler thread, but each
+    tick is stored under its scheduled minute, which is unique, so one tick
+    starts one scrape however many processes see it.
+    """
+
+    def __init__(self, command, cwd, schedule=None, timeout=600.0, history=50):
+        self.command = command
+        self.cwd = cwd
+        self.schedule = schedule
+        self.timeout = timeout
+        self.history = history
+        self._cron = parse_cron(schedule) if schedule else None
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._process = None
+        self._lines = None
+        self._runner = None
+        self._scheduler = None
+
+    def submit(self, trigger='manual', force=False, scheduled_for=None):
+        """Queue a scrape; return (job, created), reusing the active job if there is one"""
+        while True:
+            with get_db_connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE scrape_jobs
+                    SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+                        error = 'Abandoned by the process running it'
+                    WHERE status = ANY(%s)
+                      AND COALESCE(started_at, queued_at) < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+                """, (ACTIVE_STATUSES, self.timeout * 2))
+                # Conflicts with the active job, or with the job for the same cron tick
+                cur.execute(f"""
+                    INSERT INTO scrape_jobs (trigger, force, scheduled_for)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT DO NOTHING
+                    RETURNING {JOB_COLUMNS}
+                """, (trigger, force, scheduled_for))
+                row = cur.fetchone()
+                created = row is not None
+                if created:
+                    cur.execute("""
+                        DELETE FROM scrape_jobs
+                        WHERE id <= (SELECT id FROM scrape_jobs ORDER BY id DESC OFFSET %s LIMIT 1)
+                    """, (self.history,))
+                else:
+                    cur.execute(f"""
+                        SELECT {JOB_COLUMNS} FROM scrape_jobs
+                        WHERE status = ANY(%s) OR scheduled_for = %s
+                        ORDER BY id DESC LIMIT 1
+                    """, (ACTIVE_STATUSES, scheduled_for))
+                    row = cur.fetchone()
+                conn.commit()
+            # No row means the job that blocked the insert finished in between
+            if row is not None:
+                break
+
+        if created:
+            with self._lock:
+                self._ensure_runner()
+            self._pending.put(row['id'])
+        return ScrapeJob(row), created
+
+    def get(self, job_id):
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM scrape_jobs WHERE id = %s", (job_id,))
+            row = cur.fetchone()
+        return ScrapeJob(row).to_dict() if row else None
+
+    def jobs(self):
+        """Recent jobs, newest first"""
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute(f"SELECT {JOB_COLUMNS} FROM scrape_jobs ORDER BY id DESC LIMIT %s", (self.history,))
+            return [ScrapeJob(row).to_dict() for row in cur.fetchall()]
+
+    def start_scheduler(self):
+        """Start submitting jobs on the cron schedule, if one is configured"""
+        if self._cron is None or self._scheduler is not None:
+            return
+        self._scheduler = threading.Thread(target=self._schedule_loop, name='scrape-scheduler', daemon=True)
+        self._scheduler.start()
+
+    def next_run(self, after=None):
+        """Next scheduled run after `after` (default now), or None without a schedule"""
+        if self._cron is None:
+            return None
+        when = (after or datetime.now()).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 24 * 60):
+            if cron_matches(self._cron, when):
+                return when
+            when += timedelta(minutes=1)
+        return None
+
+    def _schedule_loop(self):
+        while True:
+            when = self.next_run()
+            if when is None:
+                return
+            time.sleep(max(0.0, (when - datetime.now()).total_seconds()))
+            try:
+                self.submit(trigger='schedule', scheduled_for=when)
+            except Exception as e:
+                print(f"Scheduled scrape error: {e}")
+
+    def _ensure_runner(self):
+        if self._runner is None or not self._runner.is_alive():
+            self._runner = threading.Thread(target=self._run_jobs, name='scrape-jobs', daemon=True)
+            self._runner.start()
+
+    def _run_jobs(self):
+        while True:
+            job_id = self._pending.get()
+            try:
+                job = self._claim(job_id)
+                if job is not None:
+                    self._run_in_worker(job)
+            except Exception as e:
+                self._finish(job_id, 'failed', error=str(e))
+
+    def _claim(self, job_id):
+        """Mark a queued job running; None if it is no longer queued"""
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE scrape_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND status = 'queued'
+                RETURNING {JOB_COLUMNS}
+            """, (job_id,))
+            row = cur.fetchone()
+            conn.commit()
+        return ScrapeJob(row) if row else None
+
+    def _run_in_worker(self, job):
+        self._ensure_worker()
+        self._process.stdin.write(json.dumps({'id': job.id, 'force': job.force}) + '\n')
+        self._process.stdin.flush()
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                message = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self._stop_worker()
+                self._finish(job.id, 'failed', error=f'Scrape did not finish within {self.timeout:g}s')
+                return
+            if message is None:
+                self._stop_worker()
+                self._finish(job.id, 'failed', error='Scrape worker exited unexpectedly')
+                return
+            if message.get('id') == job.id and message['event'] == 'finished':
+                self._finish(job.id, message['status'], result=message, error=message.get('error'))
+                return
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with get_db_connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                UPDATE scrape_jobs
+                SET status = %s, result = %s, error = %s, finished_at = CURRENT_TIMESTAMP,
+                    started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+                WHERE id = %s
+            """, (status, Json(result or {}), error, job_id))
+            conn.commit()
+
+    def _ensure_worker(self):
+        if self._process is not None and self._process.poll() is None:
+            return
+        self._process = subprocess.Popen(
+            self.command, cwd=self.cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._read_worker, args=(self._process, self._lines),
+            name='scrape-worker-reader', daemon=True
+        ).start()
+
+    def _read_worker(self, process, lines):
+        for line in process.stdout:
+            try:
+                lines.put(json.loads(line))
+            except ValueError:
+                print(f"Scrape worker: {line.rstrip()}")
+        lines.put(None)
+
+    def _stop_worker(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+
+scrape_jobs = ScrapeJobManager(
+    command=[sys.executable, 'scrape_worker.py'],
+    cwd=SCRAPER_DIR,
+    schedule=SCRAPE_SCHEDULE or None,
+    timeout=SCRAPE_TIMEOUT
+)
+
+
+def start_scrape_scheduler():
+    """Start scheduled scrapes if SCRAPE_SCHEDULE is set"""
+    scrape_jobs.start_scheduler()
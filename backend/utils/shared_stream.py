@@ -0,0 +1,77 @@
+import threading
+
+
+class SharedStream:
+    """Events from one producer, replayed in full to every reader, late joiners included"""
+
+    def __init__(self):
+        self._events = []
+        self._finished = False
+        self._changed = threading.Condition()
+
+    def publish(self, event):
+        with self._changed:
+            self._events.append(event)
+            self._changed.notify_all()
+
+    def finish(self):
+        with self._changed:
+            self._finished = True
+            self._changed.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: index < len(self._events) or self._finished)
+                events = self._events[index:]
+                finished = self._finished
+            index += len(events)
+            yield from events
+            if finished and not events:
+                return
+
+
+class StreamCoalescer:
+    """
+    Shares one run of a generator among concurrent callers with the same key.
+
+    The first caller starts produce() on a background thread, so the stream
+    runs to completion even if that caller goes away; everyone who joins
+    while it runs reads the same events from the start. Once it finishes, the
+    next caller starts a new one, so produce() should cache its outcome.
+    """
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    def join(self, key, produce):
+        """Return an iterator over the events of the in-flight stream for key"""
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is not None:
+                self.coalesced += 1
+                return iter(stream)
+            stream = self._streams[key] = SharedStream()
+            self.started += 1
+
+        threading.Thread(target=self._pump, args=(key, stream, produce), daemon=True).start()
+        return iter(stream)
+
+    def _pump(self, key, stream, produce):
+        try:
+            for event in produce():
+                stream.publish(event)
+        except Exception as e:
+            print(f"Shared stream error: {e}")
+        finally:
+            with self._lock:
+                del self._streams[key]
+            stream.finish()
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._streams), 'started': self.started, 'coalesced': self.coalesced}
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { MessageCircle, X, Send, Loader2, Sparkles } from 'lucide-react';
 
-const AIChatbot = ({ menuItems, onFilterResults }) => {
+const AIChatbot = ({ menuItems, location, onFilterResults }) => {
   const [isOpen, setIsOpen] = useState(false);
   const [query, setQuery] = useState('');
   const [messages, setMessages] = useState([
@@ -23,14 +23,15 @@ const AIChatbot = ({ menuItems, onFilterResults }) => {
     setIsLoading(true);
 
     try {
-      const response = await fetch('/api/ai/chat', {
+      const response = await fetch('/api/ai/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
+        // The backend reads the menu itself; only the question is sent
         body: JSON.stringify({
           query: query,
-          menu_data: menuItems
+          location: location
         })
       });
 
@@ -43,38 +44,61 @@ const AIChatbot = ({ menuItems, onFilterResults }) => {
         return;
       }
 
-      const data = await response.json();
-
-      if (data.error) {
-        setMessages(prev => [...prev, {
-          role: 'assistant',
-          content: `Error: ${data.error}`
-        }]);
-      } else if (data.results && data.results.length > 0) {
-        // Format the results as a message
-        let resultMessage = `I found ${data.results.length} items matching your query:\n\n`;
-        
-        data.results.forEach((item, idx) => {
+      // Results arrive one NDJSON line at a time; show each as soon as it lands
+      const results = [];
+      let streamError = null;
+      const showResults = () => {
+        let resultMessage = `I found ${results.length} items matching your query:\n\n`;
+        results.forEach((item, idx) => {
           resultMessage += `${idx + 1}. **${item.name}**\n`;
           resultMessage += `   📍 ${item.station} - ${item.location}\n`;
           resultMessage += `   ✓ ${item.rationale}\n\n`;
         });
+        const message = { role: 'assistant', content: resultMessage, results: [...results], streaming: true };
+        setMessages(prev => prev[prev.length - 1]?.streaming
+          ? [...prev.slice(0, -1), message]
+          : [...prev, message]);
+      };
 
-        setMessages(prev => [...prev, {
-          role: 'assistant',
-          content: resultMessage,
-          results: data.results
-        }]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'result') {
+            results.push(event.item);
+            showResults();
+          } else if (event.type === 'error') {
+            streamError = event.error;
+          }
+        }
+      }
+
+      // Settle the streamed message so later queries append a new one
+      setMessages(prev => prev.map(m => (m.streaming ? { ...m, streaming: false } : m)));
 
+      if (results.length > 0) {
         // Optionally filter the menu to show only these items
         if (onFilterResults) {
           const filteredItems = menuItems.filter(item =>
-            data.results.some(result => 
+            results.some(result => 
               result.name.toLowerCase() === item.item_name.toLowerCase()
             )
           );
           onFilterResults(filteredItems);
         }
+      } else if (streamError) {
+        setMessages(prev => [...prev, {
+          role: 'assistant',
+          content: `Error: ${streamError}`
+        }]);
       } else {
         setMessages(prev => [...prev, {
           role: 'assistant',
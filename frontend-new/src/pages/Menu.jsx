@@ -233,7 +233,11 @@ const Menu = () => {
       </div>
 
       {/* AI Chatbot */}
-      <AIChatbot menuItems={menuItems} onFilterResults={handleAIFilter} />
+      <AIChatbot
+        menuItems={menuItems}
+        location={selectedLocation === 'All' ? undefined : selectedLocation}
+        onFilterResults={handleAIFilter}
+      />
     </div>
   );
 };
@@ -3,7 +3,7 @@
 import { useEffect, useState } from "react"
 import { useNavigate, useParams } from "react-router-dom"
 import { useCart } from "./CartContext"
-import { getOrder } from "../utils/api"
+import { subscribeToOrder } from "../utils/api"
 import { Button } from "./ui/button"
 import { Badge } from "./ui/badge"
 import { Card, CardContent, CardHeader, CardTitle } from "./ui/card"
@@ -16,7 +16,6 @@ export default function OrderStatusPage() {
   const [orderData, setOrderData] = useState<any>(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
-  const [pollCount, setPollCount] = useState(0)
 
   useEffect(() => {
     if (!orderNumber) {
@@ -24,30 +23,31 @@ export default function OrderStatusPage() {
       return
     }
 
-    const fetchOrderStatus = async () => {
-      try {
-        const order = await getOrder(orderNumber)
+    // The backend pushes the order whenever its status changes
+    setLoading(true)
+    let received = false
+    const unsubscribe = subscribeToOrder(
+      orderNumber,
+      (order) => {
+        received = true
         setOrderData(order)
         setError(null)
-
-        // Auto-refresh for pending orders
-        if (order.status === "pending" && pollCount < 60) {
-          const timer = setTimeout(() => {
-            setPollCount((p) => p + 1)
-          }, 5000) // Poll every 5 seconds
-          return () => clearTimeout(timer)
-        }
-      } catch (err) {
-        setError("Failed to load order")
-        console.error("Error fetching order:", err)
-      } finally {
         setLoading(false)
-      }
-    }
-
-    setLoading(true)
-    fetchOrderStatus()
-  }, [orderNumber, navigate, pollCount])
+        if (order.status === "delivered" || order.status === "cancelled") {
+          unsubscribe()
+        }
+      },
+      (err) => {
+        // EventSource reconnects on its own; only surface errors before the first update
+        console.error("Error streaming order:", err)
+        if (!received) {
+          setLoading(false)
+          setError("Failed to load order")
+        }
+      },
+    )
+    return unsubscribe
+  }, [orderNumber, navigate])
 
   const handleNewOrder = () => {
     clearCart()
@@ -118,6 +118,21 @@ export const getOrder = async (orderNumber: string): Promise<Order> => {
   }
 }
 
+// Receive the order document now and again on every status change (Server-Sent Events).
+// Returns a function that closes the stream.
+export const subscribeToOrder = (
+  orderNumber: string,
+  onUpdate: (order: Order) => void,
+  onError?: (event: Event) => void,
+): (() => void) => {
+  const source = new EventSource(`${API_BASE}/orders/${orderNumber}/events`)
+  source.onmessage = (event) => onUpdate(JSON.parse(event.data))
+  if (onError) {
+    source.onerror = onError
+  }
+  return () => source.close()
+}
+
 export const getOrderStatus = async (
   orderNumber: string,
 ): Promise<{ status: string; dasher_name?: string; accepted_at?: string }> => {
@@ -0,0 +1,153 @@
+"""
+Benchmark DiningHallSpider.parse against the previous sibling-walking parser.
+
+Pages are read from fixtures/*.html. Save the live hall pages there first with
+`python benchmark_parse.py --save`; without fixtures, synthetic pages in the
+site's structure are used. For every page both parsers must produce identical
+items, and their throughput in items per second is reported.
+
+Usage:
+    python benchmark_parse.py [--save] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import time
+
+from scrapy.http import HtmlResponse
+from scrapy.utils.project import get_project_settings
+
+from scrapy_folder.items import UmassMenuItem
+from scrapy_folder.spiders.dining_scraper import (
+    DiningHallSpider, MEAL_HEADERS, MEAL_SECTION_IDS, WORCESTER
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_parse(response, hall=WORCESTER):
+    """The previous parser: one following-sibling query per element, per header"""
+    headers = response.css('h2')
+    meal = None
+
+    for header in headers:
+        category_name = header.css('::text').get()
+        if not category_name:
+            continue
+        category_name = category_name.strip()
+        if category_name in MEAL_HEADERS:
+            meal = category_name
+            continue
+        if category_name in ['', 'Nutrition Facts']:
+            continue
+
+        section_id = header.xpath('ancestor::*[contains(@id, "_menu")][1]/@id').get()
+        item_meal = MEAL_SECTION_IDS.get(section_id, meal)
+
+        current = header
+        while True:
+            current = current.xpath('following-sibling::*[1]')
+            if not current:
+                break
+            if current.xpath('self::h2'):
+                break
+            if current.xpath('self::li[contains(@class, "lightbox-nutrition")]'):
+                link = current.css('a')
+                if link:
+                    item_name = link.css('::text').get()
+                    if item_name:
+                        item_name = item_name.strip()
+                        tags_str = link.xpath('@data-clean-diet-str').get()
+                        tags = []
+                        if tags_str:
+                            tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
+                        menu_item = UmassMenuItem()
+                        menu_item['item_name'] = item_name
+                        menu_item['category'] = category_name
+                        menu_item['tags'] = tags
+                        menu_item['location'] = hall['location']
+                        menu_item['hall'] = hall['name']
+                        menu_item['meal'] = item_meal
+                        yield menu_item
+
+
+def synthetic_page(stations, items_per_station):
+    """A menu page shaped like the site's: meal tab panels of h2 stations and li items"""
+    diets = ['Halal', 'Vegetarian', 'Plant Based', 'Local', 'Whole Grain', '']
+    parts = ['<html><body><h2>Nutrition Facts</h2>']
+    for meal_id in ['breakfast_menu', 'lunch_menu', 'dinner_menu']:
+        parts.append(f'<div id="{meal_id}">')
+        for s in range(stations):
+            parts.append(f'<h2 class="menu_category_name">Station {s}</h2>')
+            for i in range(items_per_station):
+                diet = ', '.join(d for d in diets[i % 3:i % 3 + 2] if d)
+                parts.append(
+                    f'<li class="lightbox-nutrition"><a href="#" data-clean-diet-str="{diet}" '
+                    f'data-calories="{100 + i}">{meal_id} item {s}-{i}</a></li>'
+                )
+        parts.append('</div>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def load_pages():
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                yield os.path.basename(path), f.read()
+        return
+    print('No fixtures found; using synthetic pages (run with --save to fetch the live ones).')
+    for stations, items in [(5, 5), (10, 20), (20, 50)]:
+        yield f'synthetic {stations}x{items}', synthetic_page(stations, items).encode('utf-8')
+
+
+def save_fixtures():
+    import requests
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for hall in get_project_settings().getlist('DINING_HALLS'):
+        response = requests.get(hall['url'], timeout=30)
+        response.raise_for_status()
+        path = os.path.join(FIXTURES_DIR, f"{hall['name'].lower()}.html")
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        print(f"Saved {hall['url']} -> {path}")
+
+
+def items_per_second(parse, response, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        items = list(parse(response))
+    elapsed = time.perf_counter() - start
+    return items, len(items) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help='fetch the live hall pages into fixtures/ first')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures()
+
+    spider = DiningHallSpider()
+    identical = True
+    for name, body in load_pages():
+        response = HtmlResponse(url='https://umassdining.com/locations-menus/worcester/menu', body=body, encoding='utf-8')
+        response.selector  # build the DOM once, outside the timings
+        old_items, old_rate = items_per_second(legacy_parse, response, args.repeat)
+        new_items, new_rate = items_per_second(spider.parse, response, args.repeat)
+
+        same = [dict(i) for i in old_items] == [dict(i) for i in new_items]
+        identical = identical and same
+        print(f"{name:>22}: {len(new_items):5d} items | sibling walk {old_rate:9.0f} items/s | "
+              f"single pass {new_rate:9.0f} items/s | {new_rate / old_rate:5.1f}x | "
+              f"{'identical' if same else 'OUTPUT DIFFERS'}")
+
+    if not identical:
+        raise SystemExit('Parsers disagree on at least one page')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,12 @@
 import os
+import sys
 import json
 import datetime
 import psycopg2
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
-from scrapy_folder.spiders.dining_scraper import WorcesterMenuSpider
+from scrapy_folder.spiders.dining_scraper import DiningHallSpider
+from scrapy_folder.menu_loader import reload_menu
 
 # ---------- DATABASE CONFIG ----------
 DB_CONFIG = {
@@ -36,10 +38,22 @@ settings.set('FEEDS', {
 # ---------- RUN SCRAPER ----------
 print("🕷️ Starting scraper...")
 process = CrawlerProcess(settings)
-process.crawl(WorcesterMenuSpider)
+crawler = process.create_crawler(DiningHallSpider)
+# Every hall in DINING_HALLS, concurrently. Pass --force to reload unchanged halls too.
+# The state of changed halls is only saved once they are in the database.
+process.crawl(crawler, force='--force' in sys.argv, save_state=False)
 process.start()
+spider = crawler.spider
 print(f"\n✅ Scraping complete! Data saved to {output_file}")
 
+for hall, entry in sorted(spider.page_state.items()):
+    print(f"  {hall}: menu {entry['result']}")
+
+if not spider.changed_halls:
+    spider.menu_state().save(spider.page_state)
+    print("\n💤 Menu unchanged; nothing to reload.")
+    sys.exit(0)
+
 # ---------- LOAD JSON ----------
 with open(output_file, 'r', encoding='utf-8') as f:
     data = json.load(f)
@@ -72,60 +86,23 @@ def get_hall_id(hall_name: str):
     raise RuntimeError(f"Failed to insert hall: {hall_name}")
 
 
-def clear_today_menu():
-    cursor.execute("DELETE FROM menu_items")
-    conn.commit()
-    print("🗑️ Cleared old menu items.")
-
-
-def insert_menu_item(item):
-    hall_name = item.get('location') or item.get('hall') or "Unknown"
-    # Prepare arrays for Postgres
-    tags = item.get('tags') or []
-    tags = [t.strip() for t in tags if t and t.lower() != 'none']
-
-    dietary_info = item.get('dietary_info') or item.get('dietary') or []
-    dietary_info = [d.strip() for d in dietary_info if d and d.lower() != 'none']
-
-    cursor.execute("""
-        INSERT INTO menu_items (item_name, calories, tags, dietary_info, category, location, hall)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT DO NOTHING
-    """, (
-        item.get('item_name') or item.get('name'),
-        item.get('calories'),
-        tags if tags else None,
-        dietary_info if dietary_info else None,
-        item.get('category', 'Uncategorized'),
-        item.get('location', 'Unknown'),
-        hall_name
-    ))
-    conn.commit()
-
-
-# ---------- CLEAR OLD DATA ----------
-clear_today_menu()
-
-# ---------- INSERT DATA ----------
-print("\n🍽️ Uploading scraped items to database...")
-inserted = 0
-skipped = 0
-
-for item in data:
-    name = item.get('item_name') or item.get('name')
-    if not name or name.strip() == "":
-        print(f"⚠️ Skipping item with missing name: {item}")
-        skipped += 1
-        continue
-    try:
-        insert_menu_item(item)
-        inserted += 1
-    except Exception as e:
-        print(f"⚠️ Error inserting {name}: {e}")
-        conn.rollback()
-
-print(f"✅ Successfully uploaded {inserted} items.")
-print(f"⚠️ Skipped {skipped} items due to missing names.")
+# ---------- RELOAD MENU ----------
+# The scrape is diffed into menu_items in one transaction, so the live menu
+# stays readable throughout and unchanged rows are not rewritten
+print("\n🍽️ Reloading menu from scraped items...")
+try:
+    # Only the changed halls were scraped, so only they can lose items; a
+    # changed hall that now lists nothing loses everything
+    counts = reload_menu(conn, data, locations=spider.changed_locations)
+except Exception as e:
+    print(f"❌ Menu reload failed, current menu kept: {e}")
+    raise
+spider.menu_state().save(spider.page_state)
+
+print(f"✅ Reloaded {counts['staged']} items in {counts['seconds'] * 1000:.0f} ms: "
+      f"{counts['inserted']} new, {counts['updated']} changed, {counts['removed']} no longer served, "
+      f"{counts['purged']} long-unavailable items deleted.")
+print(f"⚠️ Skipped {counts['skipped']} items due to missing names.")
 
 # ---------- DISPLAY SUMMARY ----------
 categories = {}
@@ -0,0 +1,135 @@
+"""
+Long-lived menu scrape worker.
+
+Started once by the backend's scrape job manager and kept running, so each
+scrape reuses the same Python process, Scrapy install and Twisted reactor
+instead of cold-starting them. Jobs arrive on stdin and results leave on
+stdout, one JSON object per line:
+
+    in:  {"id": 7, "force": false}
+    out: {"id": 7, "event": "started"}
+    out: {"id": 7, "event": "finished", "status": "done", "items": 412,
+          "changed_halls": ["Worcester"], "inserted": 12, "updated": 3, "removed": 9, ...}
+
+A failed job finishes with "status": "failed" and an "error", and a job
+whose results another process is already storing finishes with "status":
+"skipped". Logs go to stderr. The worker exits when stdin is closed.
+
+Database settings come from DB_HOST, DB_PORT, DB_NAME, DB_USER and DB_PASSWORD.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+from scrapy import signals
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.log import configure_logging
+from scrapy.utils.project import get_project_settings
+from twisted.internet import defer, reactor, threads
+
+from scrapy_folder.menu_loader import reload_menu
+from scrapy_folder.spiders.dining_scraper import DiningHallSpider
+
+
+# Postgres advisory lock key held while a scrape is stored, shared by every worker
+STORE_LOCK_KEY = 0x5C4A9E
+
+
+def emit(message):
+    sys.stdout.write(json.dumps(message) + '\n')
+    sys.stdout.flush()
+
+
+def store_menu(items, locations):
+    """
+    Diff the scraped items of the changed halls, at `locations`, into
+    menu_items. Returns None without writing if another worker is storing.
+    """
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', '5432')),
+        dbname=os.getenv('DB_NAME', 'umass_dining'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres')
+    )
+    try:
+        # Held until reload_menu commits, so stores from several backends never interleave
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_try_advisory_xact_lock(%s)', (STORE_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return None
+        return reload_menu(conn, items, locations=locations)
+    finally:
+        conn.close()
+
+
+class ScrapeWorker:
+    def __init__(self, settings):
+        self.runner = CrawlerRunner(settings)
+        self.lock = defer.DeferredLock()  # one crawl at a time, in arrival order
+
+    def submit(self, job):
+        self.lock.run(self.run_job, job)
+
+    @defer.inlineCallbacks
+    def run_job(self, job):
+        emit({'id': job['id'], 'event': 'started'})
+        start = time.perf_counter()
+        items = []
+
+        def collect(item, response, spider):
+            items.append(dict(item))
+
+        try:
+            crawler = self.runner.create_crawler(DiningHallSpider)
+            crawler.signals.connect(collect, signal=signals.item_scraped)
+            # Changed halls' state is only saved once they are in the database
+            yield self.runner.crawl(crawler, force=job.get('force', False), save_state=False)
+            spider = crawler.spider
+
+            result = {
+                'items': len(items),
+                'changed_halls': spider.changed_halls,
+                'halls': {hall: entry['result'] for hall, entry in spider.page_state.items()},
+            }
+            if spider.changed_halls:
+                counts = yield threads.deferToThread(store_menu, items, spider.changed_locations)
+                if counts is None:
+                    # The other process saves the state along with its results
+                    emit({'id': job['id'], 'event': 'finished', 'status': 'skipped',
+                          'seconds': time.perf_counter() - start,
+                          'error': 'A scrape is being stored by another process', **result})
+                    return
+                counts.pop('seconds', None)
+                result.update(counts)
+            spider.menu_state().save(spider.page_state)
+
+            emit({'id': job['id'], 'event': 'finished', 'status': 'done',
+                  'seconds': time.perf_counter() - start, **result})
+        except Exception as e:
+            emit({'id': job['id'], 'event': 'finished', 'status': 'failed',
+                  'seconds': time.perf_counter() - start, 'error': str(e)})
+
+
+def read_jobs(worker):
+    for line in sys.stdin:
+        if line.strip():
+            reactor.callFromThread(worker.submit, json.loads(line))
+    reactor.callFromThread(reactor.stop)
+
+
+def main():
+    settings = get_project_settings()
+    settings.set('ITEM_PIPELINES', {})  # items are collected and diffed into menu_items here
+    configure_logging(settings)
+    worker = ScrapeWorker(settings)
+    threading.Thread(target=read_jobs, args=(worker,), daemon=True).start()
+    reactor.run()
+
+
+if __name__ == '__main__':
+    main()
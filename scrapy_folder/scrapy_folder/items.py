@@ -7,4 +7,6 @@ class UmassMenuItem(scrapy.Item):
     item_name = scrapy.Field()
     category = scrapy.Field()
     tags = scrapy.Field() # A list of dietary tags/icons (e.g., 'Vegan', 'Halal')
-    location = scrapy.Field() # E.g., 'Worcester Dining Commons'
\ No newline at end of file
+    location = scrapy.Field() # E.g., 'Worcester Dining Commons'
+    hall = scrapy.Field() # Short hall name from DINING_HALLS, e.g. 'Worcester'
+    meal = scrapy.Field() # Meal period, e.g. 'Lunch'; None if the page has no meal sections
\ No newline at end of file
@@ -0,0 +1,166 @@
+import io
+import time
+
+# Columns that identify a menu row: the same dish at lunch and dinner is two rows
+KEY_COLUMNS = ('location', 'category', 'item_name', 'meal')
+
+# Columns loaded from a scrape, in COPY order
+COLUMNS = KEY_COLUMNS + ('calories', 'tags', 'dietary_info', 'hall')
+
+# Items off the menu for longer than this are deleted; until then a returning
+# item (menus rotate weekly) is switched back on instead of re-inserted
+RETAIN_UNAVAILABLE_DAYS = 30
+
+# How a scraped row is matched to a live one
+KEY_MATCH = """
+    m.location = s.location
+    AND m.category IS NOT DISTINCT FROM s.category
+    AND m.item_name = s.item_name
+    AND m.meal IS NOT DISTINCT FROM s.meal
+"""
+
+
+def _clean_list(values):
+    return [v.strip() for v in values or [] if v and v.strip() and v.strip().lower() != 'none']
+
+
+def menu_row(item):
+    """Turn one scraped item into a tuple in COLUMNS order, or None if it has no name"""
+    name = (item.get('item_name') or item.get('name') or '').strip()
+    if not name:
+        return None
+    location = item.get('location') or 'Unknown'
+    return (
+        location,
+        item.get('category') or 'Uncategorized',
+        name,
+        item.get('meal'),
+        item.get('calories'),
+        _clean_list(item.get('tags')) or None,
+        _clean_list(item.get('dietary_info') or item.get('dietary')) or None,
+        item.get('hall') or location,
+    )
+
+
+def _array_literal(values):
+    """Postgres array literal, e.g. {"Halal","Plant Based"}"""
+    quoted = ('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values)
+    return '{' + ','.join(quoted) + '}'
+
+
+def _copy_field(value):
+    """Encode one value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (list, tuple)):
+        value = _array_literal(value)
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_buffer(rows):
+    """Build a COPY FROM STDIN text-format buffer for rows"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_field(value) for value in row) + '\n')
+    buffer.seek(0)
+    return buffer
+
+
+def reload_menu(conn, items, locations=None, retain_days=RETAIN_UNAVAILABLE_DAYS):
+    """
+    Bring menu_items in line with a fresh scrape in one transaction.
+
+    The scrape is COPYed into a temporary staging table and diffed against
+    the live rows by (location, category, item_name, meal): changed rows
+    are updated, new ones inserted, and rows missing from the scrape are
+    marked unavailable rather than deleted. Readers see either the old menu or the
+    new one, never a partial load. When `locations` is given, only rows at
+    those locations can be marked unavailable, for scrapes that skipped
+    unchanged halls; a location with no scraped items loses all of its rows.
+    Rows that have been unavailable for more than `retain_days` are deleted.
+
+    Returns a dict of counts: staged, inserted, updated, removed, purged,
+    skipped, plus the elapsed seconds.
+    """
+    start = time.perf_counter()
+    rows = {}
+    skipped = 0
+    for item in items:
+        row = menu_row(item)
+        if row is None:
+            skipped += 1
+            continue
+        rows[row[:len(KEY_COLUMNS)]] = row  # a repeated item keeps its last scraped version
+
+    if not rows and not locations:
+        # A failed scrape must not take the whole menu offline
+        raise ValueError('Scrape produced no menu items; keeping the current menu')
+
+    with conn.cursor() as cur:
+        try:
+            # Same column types as the live table, so comparisons need no casts
+            cur.execute(f"""
+                CREATE TEMP TABLE menu_items_staging ON COMMIT DROP AS
+                SELECT {', '.join(COLUMNS)} FROM menu_items WITH NO DATA
+            """)
+            cur.copy_expert(
+                f"COPY menu_items_staging ({', '.join(COLUMNS)}) FROM STDIN",
+                copy_buffer(rows.values())
+            )
+            cur.execute('ANALYZE menu_items_staging')
+
+            # Rows whose data changed, or that are coming back on the menu
+            cur.execute(f"""
+                UPDATE menu_items m
+                SET calories = s.calories, tags = s.tags, dietary_info = s.dietary_info,
+                    hall = s.hall, available = true, scraped_at = CURRENT_TIMESTAMP
+                FROM menu_items_staging s
+                WHERE {KEY_MATCH}
+                  AND (m.available IS NOT TRUE
+                       OR m.calories IS DISTINCT FROM s.calories
+                       OR m.tags IS DISTINCT FROM s.tags
+                       OR m.dietary_info IS DISTINCT FROM s.dietary_info
+                       OR m.hall IS DISTINCT FROM s.hall)
+            """)
+            updated = cur.rowcount
+
+            cur.execute(f"""
+                INSERT INTO menu_items ({', '.join(COLUMNS)})
+                SELECT {', '.join('s.' + c for c in COLUMNS)}
+                FROM menu_items_staging s
+                WHERE NOT EXISTS (SELECT 1 FROM menu_items m WHERE {KEY_MATCH})
+            """)
+            inserted = cur.rowcount
+
+            # Items that are no longer served stay in the table, unavailable;
+            # scraped_at then records when they went off the menu
+            scope = '' if locations is None else 'AND m.location = ANY(%s)'
+            cur.execute(f"""
+                UPDATE menu_items m
+                SET available = false, scraped_at = CURRENT_TIMESTAMP
+                WHERE m.available {scope}
+                  AND NOT EXISTS (SELECT 1 FROM menu_items_staging s WHERE {KEY_MATCH})
+            """, None if locations is None else (sorted(locations),))
+            removed = cur.rowcount
+
+            cur.execute("""
+                DELETE FROM menu_items
+                WHERE available = false AND scraped_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'
+            """, (retain_days,))
+            purged = cur.rowcount
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {
+        'staged': len(rows),
+        'inserted': inserted,
+        'updated': updated,
+        'removed': removed,
+        'purged': purged,
+        'skipped': skipped,
+        'seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,42 @@
+import hashlib
+import json
+import os
+
+
+def menu_hash(items):
+    """Content hash of a hall's parsed menu; page chrome and markup changes do not affect it"""
+    content = [
+        (item['meal'], item['category'], item['item_name'], sorted(item['tags']))
+        for item in items
+    ]
+    return hashlib.sha256(json.dumps(content).encode('utf-8')).hexdigest()
+
+
+class MenuState:
+    """
+    What was last stored for each hall, kept in a JSON file keyed by hall name:
+    the page's ETag and Last-Modified validators, the menu content hash, and
+    the outcome and time of the latest check.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved state, or an empty dict if there is none yet"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self, updates):
+        """Merge per-hall updates into the saved state"""
+        state = self.load()
+        for hall, entry in updates.items():
+            state.setdefault(hall, {}).update(entry)
+        # Write to a temporary file first so a crash never leaves half a file
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -1,4 +1,7 @@
+import time
+
 import psycopg2
+from psycopg2 import extras
 from itemadapter import ItemAdapter
 from scrapy.exceptions import DropItem
 # CORRECTED IMPORT PATH
@@ -7,17 +10,29 @@ from scrapy_folder.items import UmassMenuItem
 class PostgresPipeline:
     """
     Pipeline to store scraped items into a PostgreSQL database.
+
+    Items are buffered and written in batches: the buffer is flushed when it
+    holds POSTGRES_BATCH_SIZE items, when POSTGRES_FLUSH_INTERVAL seconds have
+    passed since the last flush, and when the spider closes. Each batch is one
+    multi-row INSERT and one commit. Throughput is reported in the crawl
+    stats under postgres/*.
     """
 
-    def __init__(self, host, database, user, password, port):
+    def __init__(self, host, database, user, password, port, batch_size=500, flush_interval=5.0, stats=None):
         # Database connection details are loaded from settings.py
         self.host = host
         self.database = database
         self.user = user
         self.password = password
         self.port = port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = stats
         self.conn = None
         self.cur = None
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.write_seconds = 0.0
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -27,7 +42,10 @@ class PostgresPipeline:
             database=crawler.settings.get('POSTGRES_DB'),
             user=crawler.settings.get('POSTGRES_USER'),
             password=crawler.settings.get('POSTGRES_PASSWORD'),
-            port=crawler.settings.get('POSTGRES_PORT')
+            port=crawler.settings.get('POSTGRES_PORT'),
+            batch_size=crawler.settings.getint('POSTGRES_BATCH_SIZE', 500),
+            flush_interval=crawler.settings.getfloat('POSTGRES_FLUSH_INTERVAL', 5.0),
+            stats=crawler.stats
         )
 
     def open_spider(self, spider):
@@ -61,36 +79,63 @@ class PostgresPipeline:
             raise DropItem(f"Database connection failed: {e}")
 
     def close_spider(self, spider):
-        """Closes the database connection."""
+        """Writes any buffered items, then closes the database connection."""
+        if self.conn:
+            self.flush(spider)
+        if self.stats and self.write_seconds > 0:
+            written = self.stats.get_value('postgres/items_written', 0)
+            self.stats.set_value('postgres/write_seconds', round(self.write_seconds, 3))
+            self.stats.set_value('postgres/items_per_second', round(written / self.write_seconds, 1))
         if self.cur:
             self.cur.close()
         if self.conn:
             self.conn.close()
 
     def process_item(self, item, spider):
-        """Inserts the item data into the table."""
+        """Buffers the item, flushing the batch when it is full or due."""
         adapter = ItemAdapter(item)
         
-        # Convert the tags list to a string array format for PostgreSQL
-        tags_list = adapter.get('tags', [])
-        tags_array_string = '{' + ','.join(f'"{tag}"' for tag in tags_list) + '}'
+        # psycopg2 adapts the Python list to a TEXT[] value
+        self.buffer.append((
+            adapter['item_name'],
+            adapter['category'],
+            list(adapter.get('tags') or []),
+            adapter['location']
+        ))
+        
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush(spider)
+        return item
+
+    def flush(self, spider):
+        """Inserts every buffered item with one statement and one commit."""
+        batch, self.buffer = self.buffer, []
+        self.last_flush = time.monotonic()
+        if not batch:
+            return
         
+        start = time.perf_counter()
         try:
-            self.cur.execute(
-                """
-                INSERT INTO umass_menu (item_name, category, tags, location)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (
-                    adapter['item_name'],
-                    adapter['category'],
-                    tags_array_string, # Pass the PostgreSQL array string
-                    adapter['location']
-                )
+            extras.execute_values(
+                self.cur,
+                "INSERT INTO umass_menu (item_name, category, tags, location) VALUES %s",
+                batch,
+                page_size=len(batch)
             )
             self.conn.commit()
-            return item
         except psycopg2.Error as e:
-            spider.logger.error(f"Error inserting item into database: {e}")
+            # The items have already moved on down the pipeline, so the
+            # failure is logged and counted rather than raised
+            spider.logger.error(f"Error inserting batch of {len(batch)} items into database: {e}")
             self.conn.rollback()
-            raise DropItem(f"Database insertion failed for item {adapter['item_name']}: {e}")
\ No newline at end of file
+            self._inc_stat('postgres/items_failed', len(batch))
+            return
+        finally:
+            self.write_seconds += time.perf_counter() - start
+        
+        self._inc_stat('postgres/items_written', len(batch))
+        self._inc_stat('postgres/batches')
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
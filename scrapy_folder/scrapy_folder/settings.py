@@ -21,5 +21,30 @@ POSTGRES_USER = 'postgres'
 POSTGRES_PASSWORD = 'RDF_Dorm_Dasher'
 POSTGRES_PORT = 5432 # Default PostgreSQL port
 
+# Items are written in batches of this size, or after this many seconds
+POSTGRES_BATCH_SIZE = 500
+POSTGRES_FLUSH_INTERVAL = 5.0
+
+# --- Dining halls crawled by the dining_halls spider ---
+# One request per hall; every meal period on the page is scraped.
+DINING_HALLS = [
+    {'name': 'Berkshire', 'location': 'Berkshire Dining Commons',
+     'url': 'https://umassdining.com/locations-menus/berkshire/menu'},
+    {'name': 'Franklin', 'location': 'Franklin Dining Commons',
+     'url': 'https://umassdining.com/locations-menus/franklin/menu'},
+    {'name': 'Hampshire', 'location': 'Hampshire Dining Commons',
+     'url': 'https://umassdining.com/locations-menus/hampshire/menu'},
+    {'name': 'Worcester', 'location': 'Worcester Dining Commons',
+     'url': 'https://umassdining.com/locations-menus/worcester/menu'},
+]
+
+# Validators and content hashes of the last stored scrape, used to skip unchanged halls
+MENU_STATE_FILE = 'menu_state.json'
+
+# Fetch every hall at once, but stay polite to the one domain they share
+CONCURRENT_REQUESTS_PER_DOMAIN = 4
+DOWNLOAD_DELAY = 0.25
+DOWNLOAD_TIMEOUT = 30
+
 # Example User Agent (good practice)
 USER_AGENT = 'UMassDiningScraper (+https://umassdining.com/locations-menus/worcester)'
\ No newline at end of file
@@ -1,69 +1,216 @@
+from datetime import datetime, timezone
+
 import scrapy
 from scrapy_folder.items import UmassMenuItem
+from scrapy_folder.menu_state import MenuState, menu_hash
+
+# h2 headers that name a meal period rather than a station
+MEAL_HEADERS = ['Breakfast', 'Lunch', 'Dinner', 'Late Night', 'Grab N Go']
+
+# Meal sections are sometimes tab panels with ids like "lunch_menu"
+MEAL_SECTION_IDS = {
+    'breakfast_menu': 'Breakfast',
+    'lunch_menu': 'Lunch',
+    'dinner_menu': 'Dinner',
+    'latenight_menu': 'Late Night',
+    'grabngo_menu': 'Grab N Go',
+}
+
+WORCESTER = {
+    'name': 'Worcester',
+    'location': 'Worcester Dining Commons',
+    'url': 'https://umassdining.com/locations-menus/worcester/menu',
+}
+
 
-class WorcesterMenuSpider(scrapy.Spider):
+class DiningHallSpider(scrapy.Spider):
     """
-    Spider to scrape the menu from the UMass Dining Worcester location.
-    
+    Spider to scrape the menus of every dining hall in the DINING_HALLS setting.
+
+    Each hall is one request, so all halls are fetched concurrently within the
+    per-domain limits in settings.py. Items are tagged with the hall and meal
+    period they were listed under. Pass `-a halls=worcester,franklin` to crawl
+    only some halls.
+
+    Pages are fetched conditionally with the ETag/Last-Modified validators
+    saved in MENU_STATE_FILE, and a page whose menu content hash matches the
+    saved one is skipped too: unchanged halls yield no items and are recorded
+    as "unchanged". The state is saved when the crawl finishes unless the
+    spider is created with save_state=False (the caller then saves
+    `page_state` once the items are stored). Pass `-a force=true` to ignore it.
+
     The actual structure of the site:
     - Categories are marked with <h2> tags
     - Menu items are in <li class="lightbox-nutrition"> elements
     - Item names are in <a> tags within the <li>
     - Dietary tags are in the data-clean-diet-str attribute
     """
-    name = 'worcester_menu'
+    name = 'dining_halls'
     allowed_domains = ['umassdining.com']
-    start_urls = ['https://umassdining.com/locations-menus/worcester/menu']
-    location_name = 'Worcester Dining Commons'
-
-    def parse(self, response):
-        # Find all h2 headers which represent categories
-        headers = response.css('h2')
-        
-        for header in headers:
-            category_name = header.css('::text').get()
-            
-            if not category_name:
+    halls = None
+
+    def __init__(self, halls=None, force=False, save_state=True, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if halls:
+            self.halls = halls
+        # Spider arguments given with -a arrive as strings
+        self.force = str(force).lower() in ('true', '1', 'yes')
+        self.save_state = str(save_state).lower() not in ('false', '0', 'no')
+        self.saved_state = {}
+        self.page_state = {}  # hall name -> state recorded by this crawl
+
+    def hall_config(self):
+        """Return the configured halls, restricted to the `halls` argument if given"""
+        configured = self.settings.getlist('DINING_HALLS') or [WORCESTER]
+        if not self.halls:
+            return configured
+        wanted = {name.strip().lower() for name in self.halls.split(',')}
+        return [hall for hall in configured if hall['name'].lower() in wanted]
+
+    def menu_state(self):
+        return MenuState(self.settings.get('MENU_STATE_FILE', 'menu_state.json'))
+
+    @property
+    def changed_halls(self):
+        """Halls whose menu changed in this crawl, and so yielded items"""
+        return [hall for hall, entry in self.page_state.items() if entry['result'] == 'changed']
+
+    @property
+    def changed_locations(self):
+        """Menu locations of the changed halls, including halls that now list no items"""
+        changed = set(self.changed_halls)
+        return {hall['location'] for hall in self.hall_config() if hall['name'] in changed}
+
+    def start_requests(self):
+        self.saved_state = {} if self.force else self.menu_state().load()
+        for hall in self.hall_config():
+            previous = self.saved_state.get(hall['name'], {})
+            headers = {}
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+            yield scrapy.Request(
+                hall['url'],
+                callback=self.parse_hall,
+                cb_kwargs={'hall': hall},
+                headers=headers,
+                meta={'handle_httpstatus_list': [304]},
+                dont_filter=True
+            )
+
+    def parse_hall(self, response, hall):
+        """Yield a hall's items only if its menu changed since the saved state"""
+        previous = self.saved_state.get(hall['name'], {})
+        checked_at = datetime.now(timezone.utc).isoformat()
+
+        if response.status == 304:
+            self.crawler.stats.inc_value('menu/not_modified')
+            self.record(hall, 'unchanged', {'checked_at': checked_at})
+            return
+
+        items = list(self.parse(response, hall))
+        entry = {
+            'etag': response.headers.get('ETag', b'').decode('latin-1') or None,
+            'last_modified': response.headers.get('Last-Modified', b'').decode('latin-1') or None,
+            'hash': menu_hash(items),
+            'checked_at': checked_at,
+        }
+        if entry['hash'] == previous.get('hash'):
+            self.record(hall, 'unchanged', entry)
+            return
+
+        entry['changed_at'] = checked_at
+        entry['items'] = len(items)
+        self.record(hall, 'changed', entry)
+        yield from items
+
+    def record(self, hall, result, entry):
+        entry['result'] = result
+        self.page_state[hall['name']] = entry
+        self.crawler.stats.inc_value(f'menu/halls_{result}')
+        self.logger.info(f"{hall['name']}: menu {result}")
+
+    def closed(self, reason):
+        if self.save_state and reason == 'finished' and self.page_state:
+            self.menu_state().save(self.page_state)
+
+    def parse(self, response, hall=WORCESTER):
+        """
+        Walk the document once, in order, tracking the current category.
+
+        An item belongs to the closest h2 before it among its own siblings, so
+        for each parent element we remember the last h2 seen there; any h2
+        sibling ends the previous category's items, whether or not it is a
+        category itself.
+        """
+        meal = None
+        # parent element -> (category, meal) of its most recent h2 child,
+        # category None when that h2 does not start a menu category
+        sections = {}
+
+        for element in response.selector.root.iter('h2', 'li'):
+            parent = element.getparent()
+
+            if element.tag == 'h2':
+                category_name = next(element.itertext(), None)
+                if category_name:
+                    category_name = category_name.strip()
+
+                # Meal headers start a new meal period
+                if category_name in MEAL_HEADERS:
+                    meal = category_name
+                    category_name = None
+                # Skip non-menu headers
+                elif category_name in ['', 'Nutrition Facts']:
+                    category_name = None
+
+                item_meal = meal
+                if category_name:
+                    # A header inside a meal tab panel belongs to that meal
+                    for ancestor in element.iterancestors():
+                        if '_menu' in (ancestor.get('id') or ''):
+                            item_meal = MEAL_SECTION_IDS.get(ancestor.get('id'), meal)
+                            break
+                sections[parent] = (category_name, item_meal)
                 continue
-            
-            category_name = category_name.strip()
-            
-            # Skip non-menu headers
-            if category_name in ['', 'Lunch', 'Dinner', 'Breakfast', 'Nutrition Facts']:
+
+            # Check if this is a menu item under a category
+            category_name, item_meal = sections.get(parent, (None, None))
+            if not category_name or 'lightbox-nutrition' not in (element.get('class') or ''):
+                continue
+
+            # Extract item information
+            links = list(element.iter('a'))
+            if not links:
                 continue
-            
-            # Find all menu items following this header until the next h2
-            # We need to iterate through siblings
-            current = header
-            while True:
-                current = current.xpath('following-sibling::*[1]')
-                if not current:
-                    break
-                
-                # Stop if we hit another h2
-                if current.xpath('self::h2'):
-                    break
-                
-                # Check if this is a menu item
-                if current.xpath('self::li[contains(@class, "lightbox-nutrition")]'):
-                    # Extract item information
-                    link = current.css('a')
-                    if link:
-                        item_name = link.css('::text').get()
-                        if item_name:
-                            item_name = item_name.strip()
-                            
-                            # Extract dietary tags from data attribute
-                            tags_str = link.xpath('@data-clean-diet-str').get()
-                            tags = []
-                            if tags_str:
-                                tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                            
-                            # Create and yield the menu item
-                            menu_item = UmassMenuItem()
-                            menu_item['item_name'] = item_name
-                            menu_item['category'] = category_name
-                            menu_item['tags'] = tags
-                            menu_item['location'] = self.location_name
-                            
-                            yield menu_item
\ No newline at end of file
+            item_name = next((text for link in links for text in link.itertext()), None)
+            if not item_name:
+                continue
+            item_name = item_name.strip()
+
+            # Extract dietary tags from data attribute
+            tags_str = next((link.get('data-clean-diet-str') for link in links
+                             if link.get('data-clean-diet-str') is not None), None)
+            tags = []
+            if tags_str:
+                tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
+
+            # Create and yield the menu item
+            menu_item = UmassMenuItem()
+            menu_item['item_name'] = item_name
+            menu_item['category'] = category_name
+            menu_item['tags'] = tags
+            menu_item['location'] = hall['location']
+            menu_item['hall'] = hall['name']
+            menu_item['meal'] = item_meal
+
+            yield menu_item
+
+
+class WorcesterMenuSpider(DiningHallSpider):
+    """
+    Spider to scrape the menu from the UMass Dining Worcester location only.
+    """
+    name = 'worcester_menu'
+    halls = 'worcester'
@@ -18,8 +18,9 @@ from itemadapter import ItemAdapter
 
 # IMPORTANT: Adjust these imports if your test file location changes!
 from scrapy_folder.pipeline import PostgresPipeline
-from scrapy_folder.spiders.dining_scraper import WorcesterMenuSpider
+from scrapy_folder.spiders.dining_scraper import DiningHallSpider, WorcesterMenuSpider
 from scrapy_folder.items import UmassMenuItem
+from scrapy_folder.menu_loader import menu_row, copy_buffer, reload_menu
 
 
 # ====================================================================
@@ -110,14 +111,16 @@ class PostgresPipelineTest(unittest.TestCase):
         self.pipeline.cur.close.assert_called_once()
         self.pipeline.conn.close.assert_called_once()
 
-    def test_process_item_insertion_success(self):
-        """Test successful item insertion and data formatting."""
+    def test_process_item_buffers_until_close(self):
+        """Test items are buffered and written in one batch when the spider closes."""
         
         # Manually set up mock connection and cursor (as if open_spider ran)
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         self.pipeline.conn = mock_conn 
         self.pipeline.cur = mock_cursor
+        self.pipeline.stats = MagicMock()
+        mock_psycopg2.extras.execute_values.reset_mock()
         
         # Mock Item object (using a real Item to test ItemAdapter)
         mock_item = UmassMenuItem(
@@ -129,41 +132,62 @@ class PostgresPipelineTest(unittest.TestCase):
 
         result_item = self.pipeline.process_item(mock_item, self.mock_spider)
 
-        # 1. Assert the INSERT query was called exactly once
-        self.assertEqual(mock_cursor.execute.call_count, 1)
+        # 1. Nothing is written until the batch is flushed
+        mock_psycopg2.extras.execute_values.assert_not_called()
+        mock_conn.commit.assert_not_called()
+        self.assertEqual(result_item, mock_item)
 
-        # 2. Extract and assert the execution arguments (Checking array formatting)
-        args, kwargs = mock_cursor.execute.call_args
-        
-        # The third argument in the VALUES tuple must be the PostgreSQL array string: '{"Gluten-Free","Halal"}'
-        expected_sql_values = ('Test Steak', 'Grill', '{"Gluten-Free","Halal"}', 'Worcester')
+        self.pipeline.close_spider(self.mock_spider)
 
-        self.assertEqual(args[1], expected_sql_values) 
+        # 2. One multi-row INSERT, with tags passed as a native list
+        mock_psycopg2.extras.execute_values.assert_called_once()
+        args, kwargs = mock_psycopg2.extras.execute_values.call_args
+        self.assertEqual(args[2], [('Test Steak', 'Grill', ['Gluten-Free', 'Halal'], 'Worcester')])
         
-        # 3. Assert commit was called
+        # 3. One commit for the whole batch, counted in the crawl stats
         mock_conn.commit.assert_called_once()
+        self.pipeline.stats.inc_value.assert_any_call('postgres/items_written', 1)
+
+    def test_process_item_flushes_full_batch(self):
+        """Test a batch is written as soon as it reaches the batch size."""
+        mock_conn = MagicMock()
+        self.pipeline.conn = mock_conn
+        self.pipeline.cur = MagicMock()
+        self.pipeline.batch_size = 2
+        mock_psycopg2.extras.execute_values.reset_mock()
+
+        for i in range(5):
+            self.pipeline.process_item(
+                UmassMenuItem(item_name=f'Item {i}', category='Grill', tags=[], location='Worcester'),
+                self.mock_spider
+            )
+
+        self.assertEqual(mock_psycopg2.extras.execute_values.call_count, 2)
+        self.assertEqual(mock_conn.commit.call_count, 2)
+        self.assertEqual(len(self.pipeline.buffer), 1)
         
-        # 4. Assert the original item was returned
-        self.assertEqual(result_item, mock_item)
-        
-    def test_process_item_insertion_failure(self):
-        """Test database insertion failure raises DropItem and rolls back."""
+    def test_flush_failure_rolls_back(self):
+        """Test a failed batch insert is rolled back, logged and counted."""
         
         mock_conn = MagicMock()
-        mock_cursor = MagicMock()
         self.pipeline.conn = mock_conn 
-        self.pipeline.cur = mock_cursor
+        self.pipeline.cur = MagicMock()
+        self.pipeline.stats = MagicMock()
         
-        # Make the execute call fail
-        mock_cursor.execute.side_effect = Exception("Constraint violation")
+        # Make the batch insert fail
+        mock_psycopg2.extras.execute_values.side_effect = Exception("Constraint violation")
         
-        mock_item = UmassMenuItem(item_name='Bad Item', category='Test', tags=[], location='Test')
-
-        with self.assertRaises(DropItem):
+        try:
+            mock_item = UmassMenuItem(item_name='Bad Item', category='Test', tags=[], location='Test')
             self.pipeline.process_item(mock_item, self.mock_spider)
+            self.pipeline.flush(self.mock_spider)
+        finally:
+            mock_psycopg2.extras.execute_values.side_effect = None
         
         # Assert rollback was called
         mock_conn.rollback.assert_called_once()
+        self.mock_spider.logger.error.assert_called_once()
+        self.pipeline.stats.inc_value.assert_called_once_with('postgres/items_failed', 1)
 
 
 # ====================================================================
@@ -223,6 +247,232 @@ class WorcesterMenuSpiderTest(unittest.TestCase):
         self.assertEqual(items[2]['category'], 'Another Category')
         self.assertEqual(items[2]['tags'], [])
 
+    def test_parse_tags_hall_and_meal(self):
+        """Tests that items are tagged with the hall passed in and their meal period."""
+        mock_html = """
+        <html>
+            <body>
+                <div id="lunch_menu">
+                    <h2>Grill</h2>
+                    <li class="lightbox-nutrition"><a data-clean-diet-str="Halal">Burger</a></li>
+                </div>
+                <h2>Dinner</h2>
+                <h2>Pizza</h2>
+                <li class="lightbox-nutrition"><a data-clean-diet-str="">Cheese Pizza</a></li>
+            </body>
+        </html>
+        """
+        from scrapy.http import HtmlResponse
+        hall = {'name': 'Franklin', 'location': 'Franklin Dining Commons', 'url': 'https://umassdining.com/x'}
+        response = HtmlResponse(url=hall['url'], body=mock_html, encoding='utf-8')
+
+        items = list(DiningHallSpider().parse(response, hall=hall))
+
+        self.assertEqual([(i['item_name'], i['category'], i['meal']) for i in items], [
+            ('Burger', 'Grill', 'Lunch'),
+            ('Cheese Pizza', 'Pizza', 'Dinner'),
+        ])
+        self.assertTrue(all(i['hall'] == 'Franklin' for i in items))
+        self.assertTrue(all(i['location'] == 'Franklin Dining Commons' for i in items))
+
+    def test_parse_any_sibling_header_ends_category(self):
+        """Tests that non-category headers end the previous category and nested lists are separate."""
+        mock_html = """
+        <html>
+            <body>
+                <h2>Grill</h2>
+                <li class="lightbox-nutrition"><a data-clean-diet-str="">Burger</a></li>
+                <h2>Nutrition Facts</h2>
+                <li class="lightbox-nutrition"><a data-clean-diet-str="">Orphan</a></li>
+                <div>
+                    <li class="lightbox-nutrition"><a data-clean-diet-str="">Nested</a></li>
+                </div>
+            </body>
+        </html>
+        """
+        from scrapy.http import HtmlResponse
+        response = HtmlResponse(url='https://umassdining.com/x', body=mock_html, encoding='utf-8')
+
+        items = list(self.spider.parse(response))
+
+        self.assertEqual([i['item_name'] for i in items], ['Burger'])
+
+    def test_start_requests_one_per_hall(self):
+        """Tests that one request is made per configured hall, optionally filtered."""
+        halls = [
+            {'name': 'Berkshire', 'location': 'Berkshire Dining Commons', 'url': 'https://umassdining.com/b'},
+            {'name': 'Worcester', 'location': 'Worcester Dining Commons', 'url': 'https://umassdining.com/w'},
+        ]
+        for spider, expected in [(DiningHallSpider(), ['Berkshire', 'Worcester']),
+                                 (DiningHallSpider(halls='berkshire'), ['Berkshire']),
+                                 (WorcesterMenuSpider(), ['Worcester'])]:
+            spider.settings = Settings({'DINING_HALLS': halls})
+            requests = list(spider.start_requests())
+            self.assertEqual([r.cb_kwargs['hall']['name'] for r in requests], expected)
+
+
+    def test_parse_hall_skips_unchanged_menus(self):
+        """Tests conditional requests and that unchanged menus yield nothing but are recorded."""
+        import os
+        import tempfile
+        from scrapy.http import HtmlResponse
+
+        mock_html = """
+        <html><body>
+            <h2>Grill</h2>
+            <li class="lightbox-nutrition"><a data-clean-diet-str="Halal">Burger</a></li>
+        </body></html>
+        """
+        hall = {'name': 'Worcester', 'location': 'Worcester Dining Commons', 'url': 'https://umassdining.com/w'}
+        state_file = os.path.join(tempfile.mkdtemp(), 'menu_state.json')
+
+        def crawl(status=200, body=mock_html):
+            spider = WorcesterMenuSpider()
+            spider.settings = Settings({'DINING_HALLS': [hall], 'MENU_STATE_FILE': state_file})
+            spider.crawler = MagicMock()
+            request = list(spider.start_requests())[0]
+            response = HtmlResponse(url=hall['url'], status=status, body=body, encoding='utf-8',
+                                    headers={'ETag': '"v1"'}, request=request)
+            items = list(spider.parse_hall(response, hall))
+            spider.closed('finished')
+            return spider, request, items
+
+        # First crawl: no saved state, so the menu counts as changed
+        spider, request, items = crawl()
+        self.assertNotIn(b'If-None-Match', request.headers)
+        self.assertEqual(len(items), 1)
+        self.assertEqual(spider.changed_halls, ['Worcester'])
+
+        # Same content again: the saved ETag is sent and nothing is yielded
+        spider, request, items = crawl()
+        self.assertEqual(request.headers.get('If-None-Match'), b'"v1"')
+        self.assertEqual(items, [])
+        self.assertEqual(spider.page_state['Worcester']['result'], 'unchanged')
+
+        # 304 Not Modified: also unchanged, without parsing
+        spider, request, items = crawl(status=304, body='')
+        self.assertEqual(items, [])
+        self.assertEqual(spider.changed_halls, [])
+
+    def test_changed_locations_include_halls_without_items(self):
+        """Tests that a changed hall listing no items still has its location reloaded."""
+        from scrapy.http import HtmlResponse
+
+        halls = [
+            {'name': 'Berkshire', 'location': 'Berkshire Dining Commons', 'url': 'https://umassdining.com/b'},
+            {'name': 'Worcester', 'location': 'Worcester Dining Commons', 'url': 'https://umassdining.com/w'},
+        ]
+        spider = DiningHallSpider(force=True)
+        spider.settings = Settings({'DINING_HALLS': halls})
+        spider.crawler = MagicMock()
+        spider.saved_state = {'Berkshire': {'hash': 'menu with items'}}
+        response = HtmlResponse(url=halls[0]['url'], body='<html><body></body></html>', encoding='utf-8')
+
+        self.assertEqual(list(spider.parse_hall(response, halls[0])), [])
+        self.assertEqual(spider.changed_halls, ['Berkshire'])
+        self.assertEqual(spider.changed_locations, {'Berkshire Dining Commons'})
+
+
+# ====================================================================
+# TEST SUITE 3: Menu reload Testing
+# ====================================================================
+
+class MenuLoaderTest(unittest.TestCase):
+
+    def test_menu_row_normalizes_item(self):
+        """Tests that scraped items become rows in COPY column order."""
+        row = menu_row({
+            'item_name': ' Black Bean Burger ',
+            'category': 'Grill',
+            'tags': ['Halal', ' None', ''],
+            'location': 'Worcester Dining Commons',
+            'meal': 'Lunch'
+        })
+        self.assertEqual(row, (
+            'Worcester Dining Commons', 'Grill', 'Black Bean Burger', 'Lunch',
+            None, ['Halal'], None, 'Worcester Dining Commons'
+        ))
+        self.assertIsNone(menu_row({'item_name': '  ', 'category': 'Grill'}))
+
+    def test_copy_buffer_escapes_values(self):
+        """Tests COPY text encoding of NULLs, arrays and special characters."""
+        buffer = copy_buffer([('Loc', 'Cat', 'Tab\there', None, None, ['Say "hi"'], None, 'Loc')])
+        # The array literal escapes the quote; COPY then escapes that backslash
+        expected = '\t'.join(['Loc', 'Cat', r'Tab\there', r'\N', r'\N', r'{"Say \\"hi\\""}', r'\N', 'Loc'])
+        self.assertEqual(buffer.getvalue(), expected + '\n')
+
+    def test_reload_menu_single_transaction(self):
+        """Tests that a reload stages with COPY, deletes only long-unavailable rows, and commits once."""
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cursor.rowcount = 1
+
+        counts = reload_menu(mock_conn, [
+            {'item_name': 'Item A', 'category': 'Grill', 'tags': [], 'location': 'Worcester'},
+            {'item_name': 'Item A', 'category': 'Grill', 'tags': ['Halal'], 'location': 'Worcester'},
+            {'item_name': '', 'category': 'Grill', 'tags': [], 'location': 'Worcester'},
+        ])
+
+        mock_cursor.copy_expert.assert_called_once()
+        deletes = [call.args for call in mock_cursor.execute.call_args_list if 'DELETE' in call.args[0]]
+        self.assertEqual(len(deletes), 1)
+        sql, params = deletes[0]
+        self.assertIn('available = false', sql)
+        self.assertEqual(params, (30,))
+        mock_conn.commit.assert_called_once()
+        self.assertEqual(counts['staged'], 1)
+        self.assertEqual(counts['skipped'], 1)
+
+    def test_reload_menu_keeps_each_meal(self):
+        """Tests that the same dish served at two meals is staged as two rows."""
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cursor.rowcount = 0
+
+        counts = reload_menu(mock_conn, [
+            {'item_name': 'Omelet', 'category': 'Grill', 'location': 'Worcester', 'meal': 'Breakfast'},
+            {'item_name': 'Omelet', 'category': 'Grill', 'location': 'Worcester', 'meal': 'Lunch'},
+        ])
+
+        self.assertEqual(counts['staged'], 2)
+        update_sql = mock_cursor.execute.call_args_list[2].args[0]
+        self.assertIn('m.meal IS NOT DISTINCT FROM s.meal', update_sql)
+
+    def test_reload_menu_scopes_removals_to_locations(self):
+        """Tests that only the given locations can lose items when halls were skipped."""
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cursor.rowcount = 0
+
+        reload_menu(mock_conn, [{'item_name': 'Item A', 'category': 'Grill', 'location': 'Worcester'}],
+                    locations={'Worcester'})
+
+        sql, params = mock_cursor.execute.call_args_list[-2].args
+        self.assertIn('m.location = ANY(%s)', sql)
+        self.assertEqual(params, (['Worcester'],))
+
+    def test_reload_menu_empties_locations_without_items(self):
+        """Tests that a scoped reload with no items takes only those locations off the menu."""
+        mock_conn = MagicMock()
+        mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+        mock_cursor.rowcount = 4
+
+        counts = reload_menu(mock_conn, [], locations={'Worcester'})
+
+        sql, params = mock_cursor.execute.call_args_list[-2].args
+        self.assertIn('SET available = false', sql)
+        self.assertEqual(params, (['Worcester'],))
+        mock_conn.commit.assert_called_once()
+        self.assertEqual(counts['staged'], 0)
+        self.assertEqual(counts['removed'], 4)
+
+    def test_reload_menu_rejects_empty_scrape(self):
+        """Tests that an empty scrape leaves the live menu untouched."""
+        mock_conn = MagicMock()
+        with self.assertRaises(ValueError):
+            reload_menu(mock_conn, [{'item_name': '', 'location': 'Worcester'}])
+        mock_conn.cursor.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file